@@ -0,0 +1,99 @@
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def run_benchmark(
+    name: str,
+    function_call: Callable[[], object],
+    *,
+    count_call: int = 100,
+    count_worker: int = 1,
+    count_warmup: int = 5,
+    count_call_memory: int = 10,
+) -> dict:
+    # calls function_call count_call times on count_worker threads and measures the latency of each call
+    # memory is measured in a separate pass because tracemalloc slows down every allocation
+    # failed calls are counted as errors in the timed pass and ignored in the warmup and memory passes
+
+    def call(_=None) -> bool:
+        try:
+            function_call()
+        except Exception:
+            return False
+        return True
+
+    def call_timed(_) -> Optional[float]:
+        time_start = time.perf_counter()
+        if not call():
+            return None
+        return time.perf_counter() - time_start
+
+    for _ in range(count_warmup):
+        call()
+
+    time_start = time.perf_counter()
+    if count_worker == 1:
+        list_time_call = [call_timed(index) for index in range(count_call)]
+    else:
+        with ThreadPoolExecutor(max_workers=count_worker) as executor:
+            list_time_call = list(executor.map(call_timed, range(count_call)))
+    time_total = time.perf_counter() - time_start
+    array_time_call = np.array([time_call for time_call in list_time_call if time_call is not None])
+
+    tracemalloc.start()
+    try:
+        for _ in range(count_call_memory):
+            call()
+        _, memory_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": name,
+        "count_call": count_call,
+        "count_worker": count_worker,
+        "count_error": count_call - len(array_time_call),
+        "count_call_per_second": count_call / time_total,
+        "time_p50": float(np.percentile(array_time_call, 50)) if 0 < len(array_time_call) else None,
+        "time_p99": float(np.percentile(array_time_call, 99)) if 0 < len(array_time_call) else None,
+        "memory_peak": memory_peak,
+    }
+
+
+def compare_result(
+    dict_result_base: dict,
+    dict_result: dict,
+    *,
+    ratio_regression_max: float = 1.5,
+    memory_regression_min: int = 1 << 20,
+) -> List[str]:
+    # regressions of dict_result against dict_result_base, benchmarks missing from either are skipped
+    # the median latency and the peak memory regress when they grow by more than the ratio, throughput when it shrinks
+    # by more than it, memory growth below memory_regression_min bytes is noise, the p99 is too noisy to compare
+    if dict_result_base["config"] != dict_result["config"]:
+        return ["results were measured with different configs and are not comparable"]
+    dict_name_benchmark_base: Dict[str, dict] = {
+        benchmark["name"]: benchmark for benchmark in dict_result_base["list_benchmark"]
+    }
+    list_regression = []
+    for benchmark in dict_result["list_benchmark"]:
+        name = benchmark["name"]
+        benchmark_base = dict_name_benchmark_base.get(name)
+        if benchmark_base is None:
+            continue
+        time_p50_base, time_p50 = benchmark_base["time_p50"], benchmark["time_p50"]
+        if time_p50_base and time_p50 and ratio_regression_max < time_p50 / time_p50_base:
+            list_regression.append(f"{name} time_p50 {time_p50_base:.6g} -> {time_p50:.6g}")
+        rate_base, rate = benchmark_base["count_call_per_second"], benchmark["count_call_per_second"]
+        if ratio_regression_max < rate_base / rate:
+            list_regression.append(f"{name} count_call_per_second {rate_base:.6g} -> {rate:.6g}")
+        memory_base, memory = benchmark_base["memory_peak"], benchmark["memory_peak"]
+        if memory_regression_min < memory - memory_base and ratio_regression_max < memory / max(1, memory_base):
+            list_regression.append(f"{name} memory_peak {memory_base} -> {memory}")
+        if benchmark_base["count_error"] < benchmark["count_error"]:
+            list_regression.append(f"{name} count_error {benchmark_base['count_error']} -> {benchmark['count_error']}")
+    return list_regression
@@ -0,0 +1,152 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+from typing import Dict, List, Optional
+
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+
+from benchmark.benchmark_runner import compare_result, run_benchmark
+from srai_openai import __version__
+from srai_openai.client_openai_audio import ClientOpenaiAudio
+from srai_openai.client_openai_chatgpt import ClientOpenaiChatgpt
+from srai_openai.client_openai_embedding import ClientOpenaiEmbedding
+from srai_openai.mock.server_openai_mock import ServerOpenaiMock
+from srai_openai.model.chatgpt_tool import create_chatgpt_tool
+from srai_openai.model.prompt_config import PromptConfig
+from srai_openai.model.tool_registry import ToolRegistry
+
+# run from the root of the repository:
+# python -m benchmark.run_benchmark --path-file-output result_new.json --path-file-base result_old.json
+
+
+def run_server(dict_option: dict, queue: multiprocessing.Queue) -> None:
+    # the mock server gets its own process so it does not compete with the benchmarks for the gil
+    with ServerOpenaiMock(**dict_option) as server_openai_mock:
+        queue.put(server_openai_mock.base_url)
+        server_openai_mock.thread.join()  # type: ignore
+
+
+def get_weather(location: str) -> str:
+    """Get the current weather in a given location.
+
+    Args:
+        location (str): Location to get the weather for.
+    Returns:
+        str: weather for the location
+    """
+    return f"The weather in {location} is sunny today."
+
+
+def create_prompt_config_long(count_turn: int) -> PromptConfig:
+    prompt_config = PromptConfig.create("gpt-4o-mini", "You are a helpfull assistent")
+    for index in range(count_turn):
+        prompt_config = prompt_config.append_user_message(f"This is question {index}, what is {index} + {index}?")
+        message = ChatCompletionMessage(role="assistant", content=f"The answer to question {index} is {index + index}.")
+        prompt_config = prompt_config.append_assistent_message(message)
+    return prompt_config
+
+
+def run_suite(base_url: str, *, count_call: int, count_worker: int) -> List[dict]:
+    client_chatgpt = ClientOpenaiChatgpt("no key needed", base_url=base_url)
+    client_embedding = ClientOpenaiEmbedding("no key needed", base_url=base_url)
+    client_audio = ClientOpenaiAudio("no key needed", base_url=base_url)
+    tool_registry = ToolRegistry([create_chatgpt_tool(get_weather)])
+    list_text = [f"document number {index} of the benchmark" for index in range(64)]
+    prompt_config_dict_long = create_prompt_config_long(200).to_dict()
+    dict_name_function = {
+        "prompt_default": lambda: client_chatgpt.prompt_default("You are a helpfull assistent", "This is a test"),
+        "prompt_default_stream": lambda: client_chatgpt.prompt_default(
+            "You are a helpfull assistent", "This is a test", callback_delta=lambda delta: None
+        ),
+        "prompt_default_tool": lambda: client_chatgpt.prompt_default_tool(
+            "You are a helpfull assistent", "What is the weather like in New York?", tool_registry
+        ),
+        "embedding_batch": lambda: client_embedding.get_embedding_batch(list_text, count_input_max=16),
+        "text_to_speech": lambda: client_audio.text_to_speech_for_bytes("This is a test of the speech api."),
+    }
+    list_benchmark = []
+    for name, function_call in dict_name_function.items():
+        list_benchmark.append(run_benchmark(name, function_call, count_call=count_call, count_worker=count_worker))
+    # local benchmarks, without the server
+    dict_name_function = {
+        "prompt_config_append_200": lambda: create_prompt_config_long(200),
+        "prompt_config_serialize_200": lambda: PromptConfig.from_dict(json.loads(json.dumps(prompt_config_dict_long))),
+        "prompt_config_token_count_200": lambda: PromptConfig.from_dict(prompt_config_dict_long).token_count(),
+    }
+    for name, function_call in dict_name_function.items():
+        list_benchmark.append(run_benchmark(name, function_call, count_call=count_call))
+    return list_benchmark
+
+
+def main(list_argument: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="benchmarks srai_openai against a local mock of the openai api")
+    parser.add_argument("--path-file-output", default=None, help="json file to write the results to")
+    parser.add_argument("--path-file-base", default=None, help="json results of an earlier run to compare with")
+    parser.add_argument("--count-call", type=int, default=100)
+    parser.add_argument("--count-worker", type=int, default=8)
+    parser.add_argument("--time-latency", type=float, default=0.02)
+    parser.add_argument("--time-latency-jitter", type=float, default=0.01)
+    parser.add_argument("--time-chunk", type=float, default=0.0)
+    parser.add_argument("--rate-error", type=float, default=0.0, help="fraction of requests answered with a 500")
+    parser.add_argument("--ratio-regression-max", type=float, default=1.5)
+    namespace = parser.parse_args(list_argument)
+
+    dict_status_code_rate: Dict[int, float] = {}
+    if 0 < namespace.rate_error:
+        dict_status_code_rate[500] = namespace.rate_error
+    dict_option_server = {
+        "time_latency": namespace.time_latency,
+        "time_latency_jitter": namespace.time_latency_jitter,
+        "time_chunk": namespace.time_chunk,
+        "dict_status_code_rate": dict_status_code_rate,
+    }
+    queue: multiprocessing.Queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_server, args=(dict_option_server, queue), daemon=True)
+    process.start()
+    try:
+        base_url = queue.get(timeout=30)
+        list_benchmark = run_suite(base_url, count_call=namespace.count_call, count_worker=namespace.count_worker)
+    finally:
+        process.terminate()
+
+    # results are only compared when they were measured with the same config
+    dict_result = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "count_call": namespace.count_call,
+            "count_worker": namespace.count_worker,
+            "time_latency": namespace.time_latency,
+            "time_latency_jitter": namespace.time_latency_jitter,
+            "time_chunk": namespace.time_chunk,
+            "rate_error": namespace.rate_error,
+        },
+        "list_benchmark": list_benchmark,
+    }
+    for benchmark in list_benchmark:
+        print(
+            f"{benchmark['name']:32s} {benchmark['count_call_per_second']:10.1f}/s"
+            f" p50 {(benchmark['time_p50'] or 0) * 1000:8.2f} ms p99 {(benchmark['time_p99'] or 0) * 1000:8.2f} ms"
+            f" memory {benchmark['memory_peak'] / 1024:10.1f} KiB errors {benchmark['count_error']}"
+        )
+    if namespace.path_file_output is not None:
+        with open(namespace.path_file_output, "w") as file:
+            json.dump(dict_result, file, indent=4)
+    if namespace.path_file_base is not None:
+        with open(namespace.path_file_base, "r") as file:
+            dict_result_base = json.load(file)
+        list_regression = compare_result(
+            dict_result_base, dict_result, ratio_regression_max=namespace.ratio_regression_max
+        )
+        for regression in list_regression:
+            print(f"regression: {regression}")
+        if 0 < len(list_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+DIR_NAME_SPEECH = "speech"
+DIR_NAME_TRANSCRIPTION = "transcription"
+
+
+class WriterCacheAudio:
+    # writes a streamed speech response to a temporary file, it becomes a cache entry once the stream is complete
+
+    def __init__(self, cache_audio: "CacheAudio", path_file: str) -> None:
+        self.cache_audio = cache_audio
+        self.path_file = path_file
+        self.path_file_temp = f"{path_file}.{uuid.uuid4().hex}.tmp"
+        self.file = open(self.path_file_temp, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.file.write(chunk)
+
+    def finish(self, is_complete: bool) -> None:
+        # an incomplete stream, for example one that failed or was closed early, is dropped
+        self.file.close()
+        if is_complete:
+            os.replace(self.path_file_temp, self.path_file)
+            self.cache_audio.add_path_file(self.path_file)
+        else:
+            os.remove(self.path_file_temp)
+
+
+class CacheAudio:
+    # disk cache for synthesized speech and transcriptions in path_dir
+    # speech is kept as audio files keyed on text, voice, model and format, so a hit can be streamed from the file
+    # transcriptions are kept as json keyed on the hash of the audio content, the model and the options
+    # the least recently used entries are evicted when the files take more than count_byte_max bytes, the last use is
+    # kept as the modification time of the file so it survives restarts
+
+    def __init__(self, path_dir: str, *, count_byte_max: int = 1 << 30) -> None:
+        self.path_dir = path_dir
+        self.count_byte_max = count_byte_max
+        self.lock = Lock()
+        self.dict_path_file_entry: Dict[str, Tuple[int, float]] = {}  # size and time of last use
+        self.count_byte = 0
+        self.count_hit = 0
+        self.count_miss = 0
+        self.count_evict = 0
+        for dir_name in [DIR_NAME_SPEECH, DIR_NAME_TRANSCRIPTION]:
+            path_dir_entry = os.path.join(path_dir, dir_name)
+            os.makedirs(path_dir_entry, exist_ok=True)
+            for dir_entry in os.scandir(path_dir_entry):
+                if dir_entry.name.endswith(".tmp"):
+                    os.remove(dir_entry.path)  # left behind by a process that stopped while writing
+                    continue
+                stat = dir_entry.stat()
+                self.dict_path_file_entry[dir_entry.path] = (stat.st_size, stat.st_mtime)
+                self.count_byte += stat.st_size
+        self.evict()
+
+    @property
+    def rate_hit(self) -> float:
+        count_lookup = self.count_hit + self.count_miss
+        if count_lookup == 0:
+            return 0.0
+        return self.count_hit / count_lookup
+
+    @property
+    def count_entry(self) -> int:
+        return len(self.dict_path_file_entry)
+
+    @staticmethod
+    def create_key(dict_key: dict) -> str:
+        content = json.dumps(dict_key, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get_path_file_speech(self, text: str, voice: str, model_id: str, response_format: str) -> str:
+        key = CacheAudio.create_key({"text": text, "voice": voice, "model_id": model_id})
+        return os.path.join(self.path_dir, DIR_NAME_SPEECH, f"{key}.{response_format}")
+
+    def get_path_file_transcription(self, content: bytes, model_id: str, dict_option: dict) -> str:
+        hash_content = hashlib.sha256(content).hexdigest()
+        key = CacheAudio.create_key({"hash_content": hash_content, "model_id": model_id, "dict_option": dict_option})
+        return os.path.join(self.path_dir, DIR_NAME_TRANSCRIPTION, f"{key}.json")
+
+    def use_path_file(self, path_file: str) -> bool:
+        # counts the lookup and marks a hit as used now
+        with self.lock:
+            entry = self.dict_path_file_entry.get(path_file)
+            if entry is None:
+                self.count_miss += 1
+                return False
+            self.count_hit += 1
+            self.dict_path_file_entry[path_file] = (entry[0], time.time())
+        try:
+            os.utime(path_file)
+        except FileNotFoundError:
+            pass  # evicted by another thread since, the open of the caller falls back to a miss
+        return True
+
+    def add_path_file(self, path_file: str) -> None:
+        count_byte_file = os.path.getsize(path_file)
+        with self.lock:
+            entry = self.dict_path_file_entry.get(path_file)
+            if entry is not None:
+                self.count_byte -= entry[0]
+            self.dict_path_file_entry[path_file] = (count_byte_file, time.time())
+            self.count_byte += count_byte_file
+        self.evict()
+
+    def evict(self) -> None:
+        with self.lock:
+            if self.count_byte <= self.count_byte_max:
+                return
+            list_path_file = sorted(
+                self.dict_path_file_entry, key=lambda path_file: self.dict_path_file_entry[path_file][1]
+            )
+            for path_file in list_path_file:
+                if self.count_byte <= self.count_byte_max:
+                    break
+                count_byte_file, _ = self.dict_path_file_entry.pop(path_file)
+                self.count_byte -= count_byte_file
+                self.count_evict += 1
+                try:
+                    os.remove(path_file)
+                except FileNotFoundError:
+                    pass
+
+    def load_path_file_speech(self, text: str, voice: str, model_id: str, response_format: str) -> Optional[str]:
+        # the path of the cached audio file, None on a miss
+        path_file = self.get_path_file_speech(text, voice, model_id, response_format)
+        if self.use_path_file(path_file):
+            return path_file
+        return None
+
+    def create_writer_speech(self, text: str, voice: str, model_id: str, response_format: str) -> WriterCacheAudio:
+        return WriterCacheAudio(self, self.get_path_file_speech(text, voice, model_id, response_format))
+
+    def load_transcription(self, content: bytes, model_id: str, dict_option: dict) -> Optional[dict]:
+        path_file = self.get_path_file_transcription(content, model_id, dict_option)
+        if not self.use_path_file(path_file):
+            return None
+        try:
+            with open(path_file, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def save_transcription(self, content: bytes, model_id: str, dict_option: dict, transcription: dict) -> None:
+        path_file = self.get_path_file_transcription(content, model_id, dict_option)
+        path_file_temp = f"{path_file}.{uuid.uuid4().hex}.tmp"
+        with open(path_file_temp, "w") as file:
+            json.dump(transcription, file)
+        os.replace(path_file_temp, path_file)
+        self.add_path_file(path_file)
+
+    def clear(self) -> None:
+        with self.lock:
+            for path_file in self.dict_path_file_entry:
+                try:
+                    os.remove(path_file)
+                except FileNotFoundError:
+                    pass
+            self.dict_path_file_entry.clear()
+            self.count_byte = 0
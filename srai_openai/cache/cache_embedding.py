@@ -0,0 +1,121 @@
+import hashlib
+import os
+import sqlite3
+from threading import Lock
+from typing import List, Optional
+
+import numpy as np
+
+from srai_openai.cache.cache_lru import CacheLru
+
+
+class CacheEmbedding:
+    # two tier embedding cache, an in memory lru in front of an optional sqlite file
+    # keys are content addresses so the same text is only ever embedded once per model and dimensions
+
+    def __init__(self, path_file_sqlite: Optional[str] = None, *, count_item_memory_max: int = 100000) -> None:
+        self.cache_lru = CacheLru(count_item_memory_max)
+        self.path_file_sqlite = path_file_sqlite
+        self.connection: Optional[sqlite3.Connection] = None
+        self.lock = Lock()
+        self.count_hit_memory = 0
+        self.count_hit_disk = 0
+        self.count_miss = 0
+        if path_file_sqlite is not None:
+            path_dir = os.path.dirname(path_file_sqlite)
+            if path_dir != "" and not os.path.exists(path_dir):
+                os.makedirs(path_dir)
+            self.connection = sqlite3.connect(path_file_sqlite, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS embedding (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self.connection.commit()
+
+    @property
+    def count_hit(self) -> int:
+        return self.count_hit_memory + self.count_hit_disk
+
+    @property
+    def rate_hit(self) -> float:
+        count_lookup = self.count_hit + self.count_miss
+        if count_lookup == 0:
+            return 0.0
+        return self.count_hit / count_lookup
+
+    @staticmethod
+    def create_key(model_id: str, dimensions: Optional[int], text: str) -> str:
+        hash_text = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_id}:{dimensions}:{hash_text}"
+
+    def load_vector(self, model_id: str, dimensions: Optional[int], text: str) -> Optional[np.ndarray]:
+        return self.load_list_vector(model_id, dimensions, [text])[0]
+
+    def load_list_vector(
+        self, model_id: str, dimensions: Optional[int], list_text: List[str]
+    ) -> List[Optional[np.ndarray]]:
+        list_key = [CacheEmbedding.create_key(model_id, dimensions, text) for text in list_text]
+        list_vector: List[Optional[np.ndarray]] = [self.cache_lru.get(key) for key in list_key]
+        list_index_miss = [index for index, vector in enumerate(list_vector) if vector is None]
+        count_hit_memory = len(list_key) - len(list_index_miss)
+        count_hit_disk = 0
+        if self.connection is not None and 0 < len(list_index_miss):
+            dict_vector_disk = self.load_dict_vector_disk(list({list_key[index] for index in list_index_miss}))
+            for index in list_index_miss:
+                vector = dict_vector_disk.get(list_key[index])
+                if vector is not None:
+                    self.cache_lru.set(list_key[index], vector)
+                    list_vector[index] = vector
+                    count_hit_disk += 1
+        with self.lock:
+            self.count_hit_memory += count_hit_memory
+            self.count_hit_disk += count_hit_disk
+            self.count_miss += len(list_index_miss) - count_hit_disk
+        return list_vector
+
+    def load_dict_vector_disk(self, list_key: List[str]) -> dict:
+        dict_vector = {}
+        with self.lock:
+            for index_start in range(0, len(list_key), 500):
+                list_key_chunk = list_key[index_start : index_start + 500]
+                query = f"SELECT key, vector FROM embedding WHERE key IN ({','.join('?' * len(list_key_chunk))})"
+                for key, vector in self.connection.execute(query, list_key_chunk):  # type: ignore
+                    dict_vector[key] = np.frombuffer(vector, dtype=np.float32)
+        return dict_vector
+
+    def save_vector(self, model_id: str, dimensions: Optional[int], text: str, vector: np.ndarray) -> None:
+        self.save_list_vector(model_id, dimensions, [text], np.asarray(vector, dtype=np.float32).reshape(1, -1))
+
+    def save_list_vector(
+        self, model_id: str, dimensions: Optional[int], list_text: List[str], matrix: np.ndarray
+    ) -> None:
+        if len(list_text) != matrix.shape[0]:
+            raise ValueError(f"got {len(list_text)} texts for {matrix.shape[0]} vectors")
+        matrix = np.asarray(matrix, dtype=np.float32)
+        list_row = []
+        for text, vector in zip(list_text, matrix):
+            key = CacheEmbedding.create_key(model_id, dimensions, text)
+            vector = vector.copy()  # do not keep the whole batch matrix alive through a row view
+            self.cache_lru.set(key, vector)
+            list_row.append((key, vector.tobytes()))
+        if self.connection is not None:
+            with self.lock:
+                self.connection.executemany("INSERT OR REPLACE INTO embedding (key, vector) VALUES (?, ?)", list_row)
+                self.connection.commit()
+
+    def count_vector_disk(self) -> int:
+        if self.connection is None:
+            return 0
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM embedding").fetchone()[0]
+
+    def clear(self) -> None:
+        self.cache_lru.clear()
+        if self.connection is not None:
+            with self.lock:
+                self.connection.execute("DELETE FROM embedding")
+                self.connection.commit()
+
+    def close(self) -> None:
+        if self.connection is not None:
+            with self.lock:
+                self.connection.close()
+                self.connection = None
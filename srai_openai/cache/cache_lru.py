@@ -0,0 +1,49 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional, Tuple
+
+
+class CacheLru:
+    # thread safe least recently used cache with an optional time to live in seconds
+
+    def __init__(self, count_item_max: int, time_to_live: Optional[float] = None) -> None:
+        if count_item_max < 1:
+            raise ValueError("count_item_max must be at least 1")
+        self.count_item_max = count_item_max
+        self.time_to_live = time_to_live
+        self.dict_item: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.dict_item)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, None) is not None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            item = self.dict_item.get(key)
+            if item is None:
+                return default
+            time_created, value = item
+            if self.time_to_live is not None and self.time_to_live < time.monotonic() - time_created:
+                del self.dict_item[key]
+                return default
+            self.dict_item.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self.lock:
+            self.dict_item[key] = (time.monotonic(), value)
+            self.dict_item.move_to_end(key)
+            while self.count_item_max < len(self.dict_item):
+                self.dict_item.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self.lock:
+            self.dict_item.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.dict_item.clear()
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import time
+from threading import Lock
+from typing import Optional, Tuple
+
+from srai_core.store.bytes_store_base import BytesStoreBase
+
+from srai_openai.cache.cache_lru import CacheLru
+from srai_openai.model.prompt_config import PromptConfig
+
+
+class CachePromptConfig:
+    # exact match cache for completions, keyed on the canonical json of the prompt config and request parameters
+    # entries live in an in memory lru and optionally in any srai_core bytes store, time_to_live is in seconds
+
+    def __init__(
+        self,
+        bytes_store: Optional[BytesStoreBase] = None,
+        *,
+        count_item_memory_max: int = 10000,
+        time_to_live: Optional[float] = None,
+    ) -> None:
+        self.cache_lru = CacheLru(count_item_memory_max)
+        self.bytes_store = bytes_store
+        self.time_to_live = time_to_live
+        self.lock = Lock()
+        self.count_hit = 0
+        self.count_miss = 0
+
+    @property
+    def rate_hit(self) -> float:
+        count_lookup = self.count_hit + self.count_miss
+        if count_lookup == 0:
+            return 0.0
+        return self.count_hit / count_lookup
+
+    @staticmethod
+    def create_key(prompt_config: PromptConfig, dict_parameter: Optional[dict] = None) -> str:
+        if dict_parameter is None:
+            dict_parameter = {}
+        content = json.dumps(
+            {"prompt_config": prompt_config.to_dict(), "dict_parameter": dict_parameter},
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def load_response(
+        self, prompt_config: PromptConfig, dict_parameter: Optional[dict] = None
+    ) -> Optional[Tuple[str, dict]]:
+        # returns the finish reason and the message dump of the cached completion choice
+        key = CachePromptConfig.create_key(prompt_config, dict_parameter)
+        response = self.cache_lru.get(key)
+        if response is None and self.bytes_store is not None:
+            response_bytes = self.bytes_store.try_load_bytes(key)
+            if response_bytes is not None:
+                response = json.loads(response_bytes)
+                self.cache_lru.set(key, response)
+        if response is not None and self.is_expired(response):
+            self.cache_lru.delete(key)
+            if self.bytes_store is not None:
+                self.bytes_store.delete_bytes(key)
+            response = None
+        with self.lock:
+            if response is None:
+                self.count_miss += 1
+            else:
+                self.count_hit += 1
+        if response is None:
+            return None
+        return response["finish_reason"], response["message"]
+
+    def is_expired(self, response: dict) -> bool:
+        return self.time_to_live is not None and self.time_to_live < time.time() - response["time_created"]
+
+    def save_response(
+        self, prompt_config: PromptConfig, finish_reason: str, message: dict, dict_parameter: Optional[dict] = None
+    ) -> None:
+        key = CachePromptConfig.create_key(prompt_config, dict_parameter)
+        response = {"time_created": time.time(), "finish_reason": finish_reason, "message": message}
+        self.cache_lru.set(key, response)
+        if self.bytes_store is not None:
+            self.bytes_store.save_bytes(key, json.dumps(response).encode("utf-8"))
+
+    def clear(self) -> None:
+        self.cache_lru.clear()
+        if self.bytes_store is not None:
+            for key in self.bytes_store.load_list_bytes_id():
+                self.bytes_store.delete_bytes(key)
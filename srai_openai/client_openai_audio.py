@@ -1,14 +1,46 @@
-from typing import Literal, Optional
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Literal, Optional
 
-from openai import OpenAI
 from srai_core.tools_env import get_string_from_env
 
+from srai_openai.cache.cache_audio import CacheAudio
+from srai_openai.model.http_client_config import HttpClientConfig
+from srai_openai.model.speech_pipeline import SpeechPipeline
+from srai_openai.model.speech_stream import SpeechResponseFile, SpeechStream
+from srai_openai.tools_audio import (
+    COUNT_BYTE_UPLOAD_MAX,
+    COUNT_CHAR_SPEECH_MAX,
+    create_audio_wav_segment,
+    get_file_name_audio,
+    get_list_segment_for_audio_wav,
+    is_audio_wav,
+    is_split_audio_wav,
+    open_audio_wav,
+    read_audio_bytes,
+    split_text_speech,
+    stitch_transcription,
+    update_header_wav,
+)
+from srai_openai.tools_http import create_client_openai
+
 
 class ClientOpenaiAudio:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        *,
+        http_client_config: Optional[HttpClientConfig] = None,
+        base_url: Optional[str] = None,
+        cache_audio: Optional[CacheAudio] = None,
+    ):
+        # cache_audio keeps synthesized speech and transcriptions on disk, methods can bypass it with bypass_cache
         if api_key is None:
             api_key = get_string_from_env("OPENAI_API_KEY")
-        self.client_openai = OpenAI(api_key=api_key)
+        self.cache_audio = cache_audio
+        self.client_openai = create_client_openai(api_key, http_client_config, base_url=base_url)
 
     def get_default_model_id(self) -> str:
         return "whisper-1"
@@ -16,57 +48,218 @@ class ClientOpenaiAudio:
     def get_default_tts_model_id(self) -> str:
         return "tts-1"
 
-    def transcription(
+    def transcription(self, path_file_audio: str, *, bypass_cache: bool = False) -> dict:
+        with open(path_file_audio, "rb") as file:
+            content = file.read()
+        return self.transcription_for_bytes(content, os.path.basename(path_file_audio), bypass_cache=bypass_cache)
+
+    def transcription_for_bytes(
         self,
-        path_file_audio: str,
+        content: bytes,
+        file_name: str,
+        *,
+        model_id: Optional[str] = None,
+        language: Optional[str] = None,
+        bypass_cache: bool = False,
     ) -> dict:
-        # TODO add script
-        model_id = self.get_default_model_id()
-        with open(path_file_audio, "rb") as file:
-            transcription = self.client_openai.audio.transcriptions.create(
-                model=model_id, file=file, response_format="verbose_json", timestamp_granularities=["word"]
+        # verbose json with word and segment timestamps, the extension of file_name tells the api the format
+        if model_id is None:
+            model_id = self.get_default_model_id()
+        dict_option = {"response_format": "verbose_json", "timestamp_granularities": ["word", "segment"]}
+        if language is not None:
+            dict_option["language"] = language
+        is_cached = self.cache_audio is not None and not bypass_cache
+        if is_cached:
+            transcription = self.cache_audio.load_transcription(content, model_id, dict_option)  # type: ignore
+            if transcription is not None:
+                return transcription
+        transcription = self.client_openai.audio.transcriptions.create(
+            model=model_id, file=(file_name, content), **dict_option  # type: ignore
+        )
+        if is_cached:
+            self.cache_audio.save_transcription(  # type: ignore
+                content, model_id, dict_option, transcription.model_dump()
             )
         return transcription.model_dump()
 
-    def text_to_speech_for_file(
+    def transcription_long(
+        self,
+        source: Any,
+        *,
+        model_id: Optional[str] = None,
+        language: Optional[str] = None,
+        time_segment_max: float = 600.0,
+        time_overlap: float = 1.0,
+        count_worker: int = 4,
+        count_byte_upload_max: int = COUNT_BYTE_UPLOAD_MAX,
+        bypass_cache: bool = False,
+        file_name: Optional[str] = None,
+    ) -> dict:
+        # source is a path, a bytes like buffer, a memory mapped file or a binary file object
+        # file_name names audio that goes in one request, its extension tells the api the format, by default it is the
+        # name of the path or file object and audio.wav or audio.mp3 for buffers
+        # wav audio longer than time_segment_max or over the upload limit is split at silences into overlapping segments
+        # that are transcribed concurrently, the words and segments are stitched back together with their timestamps in
+        # the time of the whole audio
+        # other wav audio goes in one request, as do other formats under the upload limit, which can not be split
+        is_split = False
+        if is_audio_wav(source):
+            with open_audio_wav(source) as wave_read:
+                is_split = is_split_audio_wav(wave_read, time_segment_max, count_byte_upload_max)
+        if not is_split:
+            content = read_audio_bytes(source)
+            if count_byte_upload_max < len(content):
+                raise Exception("only wav audio can be split, convert the audio to wav to transcribe it")
+            return self.transcription_for_bytes(
+                content,
+                get_file_name_audio(source) if file_name is None else file_name,
+                model_id=model_id,
+                language=language,
+                bypass_cache=bypass_cache,
+            )
+        with open_audio_wav(source) as wave_read:
+            list_segment, list_time_cut = get_list_segment_for_audio_wav(
+                wave_read, time_segment_max, time_overlap, count_byte_upload_max
+            )
+            # at most count_worker segments are in memory, reading them from the source is serialized
+            lock = threading.Lock()
+
+            def transcription_segment(index: int) -> dict:
+                with lock:
+                    content = create_audio_wav_segment(wave_read, *list_segment[index])
+                return self.transcription_for_bytes(
+                    content,
+                    f"segment_{index:04d}.wav",
+                    model_id=model_id,
+                    language=language,
+                    bypass_cache=bypass_cache,
+                )
+
+            with ThreadPoolExecutor(max_workers=count_worker) as executor:
+                list_transcription = list(executor.map(transcription_segment, range(len(list_segment))))
+        return stitch_transcription(list_transcription, list_segment, list_time_cut)
+
+    def stream_text_to_speech(
         self,
         text: str,
-        path_file_audio: str,
         *,
         voice: Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"] = "alloy",
-        response_format: Literal["mp3", "opus", "aac", "flac"] = "mp3",
+        response_format: Literal["mp3", "opus", "aac", "flac", "wav", "pcm"] = "mp3",
         model_id: Optional[str] = None,
-    ) -> None:
+        count_byte_chunk: Optional[int] = None,
+        bypass_cache: bool = False,
+    ) -> SpeechStream:
+        # returns once the response headers are in, iterating the stream yields the audio as it is synthesized
+        # without count_byte_chunk chunks are passed on as they arrive from the network
+        # texts over the input limit of the api are split and synthesized by stream_text_to_speech_pipelined
+        if COUNT_CHAR_SPEECH_MAX < len(text):
+            if response_format == "flac":
+                raise ValueError(
+                    f"texts over {COUNT_CHAR_SPEECH_MAX} characters are synthesized in parts that can not be joined as"
+                    " flac, use another response format or split the text"
+                )
+            return self.stream_text_to_speech_pipelined(
+                text,
+                voice=voice,
+                response_format=response_format,
+                model_id=model_id,
+                count_byte_chunk=count_byte_chunk,
+                bypass_cache=bypass_cache,
+            )
         if model_id is None:
             model_id = self.get_default_tts_model_id()
-        speech = self.client_openai.audio.speech.create(
+        time_start = time.perf_counter()
+        is_cached = self.cache_audio is not None and not bypass_cache
+        if is_cached:
+            path_file = self.cache_audio.load_path_file_speech(text, voice, model_id, response_format)  # type: ignore
+            if path_file is not None:
+                try:
+                    speech_response_file = SpeechResponseFile(path_file)
+                    return SpeechStream(speech_response_file, time_start=time_start, count_byte_chunk=count_byte_chunk)
+                except FileNotFoundError:
+                    pass  # evicted since the lookup
+        response_context = self.client_openai.audio.speech.with_streaming_response.create(
             model=model_id,
             voice=voice,
             response_format=response_format,
             input=text,
         )
-        speech.write_to_file(path_file_audio)
+        response = response_context.__enter__()
+        if not is_cached:
+            return SpeechStream(response, time_start=time_start, count_byte_chunk=count_byte_chunk)
+        # the audio goes into the cache as it streams, it is only kept when the stream is read to the end
+        writer_cache_audio = self.cache_audio.create_writer_speech(  # type: ignore
+            text, voice, model_id, response_format
+        )
+        return SpeechStream(
+            response,
+            time_start=time_start,
+            count_byte_chunk=count_byte_chunk,
+            callback_chunk=writer_cache_audio.write,
+            callback_complete=writer_cache_audio.finish,
+        )
+
+    def stream_text_to_speech_pipelined(
+        self,
+        text: str,
+        *,
+        voice: Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"] = "alloy",
+        response_format: Literal["mp3", "opus", "aac", "wav", "pcm"] = "mp3",
+        model_id: Optional[str] = None,
+        count_byte_chunk: Optional[int] = None,
+        count_worker: int = 4,
+        count_char_max: int = COUNT_CHAR_SPEECH_MAX,
+        bypass_cache: bool = False,
+    ) -> SpeechStream:
+        # the text is split at sentences into chunks of at most count_char_max characters that are synthesized
+        # concurrently, the audio of the first sentence is there after one short request and the audio of the others
+        # follows in order, concatenated for response_format, flac can not be concatenated
+        list_text = split_text_speech(text, count_char_max)
+
+        def function_speech(text_chunk: str) -> bytes:
+            return self.text_to_speech_for_bytes(
+                text_chunk, voice=voice, response_format=response_format, model_id=model_id, bypass_cache=bypass_cache
+            )
+
+        time_start = time.perf_counter()
+        speech_pipeline = SpeechPipeline(list_text, function_speech, response_format, count_worker=count_worker)
+        return SpeechStream(speech_pipeline, time_start=time_start, count_byte_chunk=count_byte_chunk)
+
+    def text_to_speech_for_file(
+        self,
+        text: str,
+        path_file_audio: str,
+        *,
+        voice: Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"] = "alloy",
+        response_format: Literal["mp3", "opus", "aac", "flac", "wav", "pcm"] = "mp3",
+        model_id: Optional[str] = None,
+        bypass_cache: bool = False,
+    ) -> SpeechStream:
+        # chunks are written as they arrive, a failed stream leaves no partial file
+        speech_stream = self.stream_text_to_speech(
+            text, voice=voice, response_format=response_format, model_id=model_id, bypass_cache=bypass_cache
+        )
+        try:
+            with open(path_file_audio, "w+b") as file:
+                speech_stream.write_to(file)
+                if response_format == "wav":
+                    update_header_wav(file)
+        except BaseException:
+            if os.path.isfile(path_file_audio):
+                os.remove(path_file_audio)
+            raise
+        return speech_stream
 
     def text_to_speech_for_bytes(
         self,
         text: str,
         *,
         voice: Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"] = "alloy",
-        response_format: Literal["mp3", "opus", "aac", "flac"] = "mp3",
+        response_format: Literal["mp3", "opus", "aac", "flac", "wav", "pcm"] = "mp3",
         model_id: Optional[str] = None,
+        bypass_cache: bool = False,
     ) -> bytes:
-        if model_id is None:
-            model_id = self.get_default_tts_model_id()
-        speech = self.client_openai.audio.speech.create(
-            model=model_id,
-            voice=voice,
-            response_format=response_format,
-            input=text,
+        speech_stream = self.stream_text_to_speech(
+            text, voice=voice, response_format=response_format, model_id=model_id, bypass_cache=bypass_cache
         )
-        from io import BytesIO
-
-        bytes_io = BytesIO()
-        for chunk in speech.iter_bytes():
-            bytes_io.write(chunk)
-        bytes_io.seek(0)
-        return bytes_io.read()
+        return b"".join(speech_stream)
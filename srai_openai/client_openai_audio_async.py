@@ -0,0 +1,254 @@
+import asyncio
+import os
+import time
+from typing import Any, Literal, Optional
+
+from srai_core.tools_env import get_string_from_env
+
+from srai_openai.cache.cache_audio import CacheAudio
+from srai_openai.model.http_client_config import HttpClientConfig
+from srai_openai.model.speech_pipeline import SpeechPipelineAsync
+from srai_openai.model.speech_stream import SpeechResponseFile, SpeechStream
+from srai_openai.tools_audio import (
+    COUNT_BYTE_UPLOAD_MAX,
+    COUNT_CHAR_SPEECH_MAX,
+    create_audio_wav_segment,
+    get_file_name_audio,
+    get_list_segment_for_audio_wav,
+    is_audio_wav,
+    is_split_audio_wav,
+    open_audio_wav,
+    read_audio_bytes,
+    split_text_speech,
+    stitch_transcription,
+    update_header_wav,
+)
+from srai_openai.tools_http import create_client_openai_async
+
+
+class ClientOpenaiAudioAsync:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        *,
+        http_client_config: Optional[HttpClientConfig] = None,
+        base_url: Optional[str] = None,
+        cache_audio: Optional[CacheAudio] = None,
+    ):
+        # cache_audio keeps synthesized speech and transcriptions on disk, methods can bypass it with bypass_cache
+        if api_key is None:
+            api_key = get_string_from_env("OPENAI_API_KEY")
+        self.cache_audio = cache_audio
+        self.client_openai = create_client_openai_async(api_key, http_client_config, base_url=base_url)
+
+    def get_default_model_id(self) -> str:
+        return "whisper-1"
+
+    def get_default_tts_model_id(self) -> str:
+        return "tts-1"
+
+    async def transcription(self, path_file_audio: str, *, bypass_cache: bool = False) -> dict:
+        with open(path_file_audio, "rb") as file:
+            content = file.read()
+        return await self.transcription_for_bytes(content, os.path.basename(path_file_audio), bypass_cache=bypass_cache)
+
+    async def transcription_for_bytes(
+        self,
+        content: bytes,
+        file_name: str,
+        *,
+        model_id: Optional[str] = None,
+        language: Optional[str] = None,
+        bypass_cache: bool = False,
+    ) -> dict:
+        if model_id is None:
+            model_id = self.get_default_model_id()
+        dict_option = {"response_format": "verbose_json", "timestamp_granularities": ["word", "segment"]}
+        if language is not None:
+            dict_option["language"] = language
+        is_cached = self.cache_audio is not None and not bypass_cache
+        if is_cached:
+            transcription = self.cache_audio.load_transcription(content, model_id, dict_option)  # type: ignore
+            if transcription is not None:
+                return transcription
+        transcription = await self.client_openai.audio.transcriptions.create(
+            model=model_id, file=(file_name, content), **dict_option  # type: ignore
+        )
+        if is_cached:
+            self.cache_audio.save_transcription(  # type: ignore
+                content, model_id, dict_option, transcription.model_dump()
+            )
+        return transcription.model_dump()
+
+    async def transcription_long(
+        self,
+        source: Any,
+        *,
+        model_id: Optional[str] = None,
+        language: Optional[str] = None,
+        time_segment_max: float = 600.0,
+        time_overlap: float = 1.0,
+        count_worker: int = 4,
+        count_byte_upload_max: int = COUNT_BYTE_UPLOAD_MAX,
+        bypass_cache: bool = False,
+        file_name: Optional[str] = None,
+    ) -> dict:
+        # as the transcription_long of ClientOpenaiAudio, with the segments transcribed as tasks on the running loop
+        # reading the audio, the energy scan and cutting the segments run in a thread, so they do not block the loop
+        is_split = False
+        if is_audio_wav(source):
+            with open_audio_wav(source) as wave_read:
+                is_split = is_split_audio_wav(wave_read, time_segment_max, count_byte_upload_max)
+        if not is_split:
+            content = await asyncio.to_thread(read_audio_bytes, source)
+            if count_byte_upload_max < len(content):
+                raise Exception("only wav audio can be split, convert the audio to wav to transcribe it")
+            return await self.transcription_for_bytes(
+                content,
+                get_file_name_audio(source) if file_name is None else file_name,
+                model_id=model_id,
+                language=language,
+                bypass_cache=bypass_cache,
+            )
+        with open_audio_wav(source) as wave_read:
+            list_segment, list_time_cut = await asyncio.to_thread(
+                get_list_segment_for_audio_wav, wave_read, time_segment_max, time_overlap, count_byte_upload_max
+            )
+            # reading segments from the source is serialized, they share the position of wave_read
+            semaphore = asyncio.Semaphore(count_worker)
+            lock = asyncio.Lock()
+
+            async def transcription_segment(index: int) -> dict:
+                async with semaphore:
+                    async with lock:
+                        content = await asyncio.to_thread(create_audio_wav_segment, wave_read, *list_segment[index])
+                    return await self.transcription_for_bytes(
+                        content,
+                        f"segment_{index:04d}.wav",
+                        model_id=model_id,
+                        language=language,
+                        bypass_cache=bypass_cache,
+                    )
+
+            list_transcription = await asyncio.gather(
+                *[transcription_segment(index) for index in range(len(list_segment))]
+            )
+        return stitch_transcription(list(list_transcription), list_segment, list_time_cut)
+
+    async def stream_text_to_speech(
+        self,
+        text: str,
+        *,
+        voice: Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"] = "alloy",
+        response_format: Literal["mp3", "opus", "aac", "flac", "wav", "pcm"] = "mp3",
+        model_id: Optional[str] = None,
+        count_byte_chunk: Optional[int] = None,
+        bypass_cache: bool = False,
+    ) -> SpeechStream:
+        if COUNT_CHAR_SPEECH_MAX < len(text):
+            if response_format == "flac":
+                raise ValueError(
+                    f"texts over {COUNT_CHAR_SPEECH_MAX} characters are synthesized in parts that can not be joined as"
+                    " flac, use another response format or split the text"
+                )
+            return await self.stream_text_to_speech_pipelined(
+                text,
+                voice=voice,
+                response_format=response_format,
+                model_id=model_id,
+                count_byte_chunk=count_byte_chunk,
+                bypass_cache=bypass_cache,
+            )
+        if model_id is None:
+            model_id = self.get_default_tts_model_id()
+        time_start = time.perf_counter()
+        is_cached = self.cache_audio is not None and not bypass_cache
+        if is_cached:
+            path_file = self.cache_audio.load_path_file_speech(text, voice, model_id, response_format)  # type: ignore
+            if path_file is not None:
+                try:
+                    speech_response_file = SpeechResponseFile(path_file)
+                    return SpeechStream(speech_response_file, time_start=time_start, count_byte_chunk=count_byte_chunk)
+                except FileNotFoundError:
+                    pass  # evicted since the lookup
+        response_context = self.client_openai.audio.speech.with_streaming_response.create(
+            model=model_id,
+            voice=voice,
+            response_format=response_format,
+            input=text,
+        )
+        response = await response_context.__aenter__()
+        if not is_cached:
+            return SpeechStream(response, time_start=time_start, count_byte_chunk=count_byte_chunk)
+        # the audio goes into the cache as it streams, it is only kept when the stream is read to the end
+        writer_cache_audio = self.cache_audio.create_writer_speech(  # type: ignore
+            text, voice, model_id, response_format
+        )
+        return SpeechStream(
+            response,
+            time_start=time_start,
+            count_byte_chunk=count_byte_chunk,
+            callback_chunk=writer_cache_audio.write,
+            callback_complete=writer_cache_audio.finish,
+        )
+
+    async def stream_text_to_speech_pipelined(
+        self,
+        text: str,
+        *,
+        voice: Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"] = "alloy",
+        response_format: Literal["mp3", "opus", "aac", "wav", "pcm"] = "mp3",
+        model_id: Optional[str] = None,
+        count_byte_chunk: Optional[int] = None,
+        count_worker: int = 4,
+        count_char_max: int = COUNT_CHAR_SPEECH_MAX,
+        bypass_cache: bool = False,
+    ) -> SpeechStream:
+        list_text = split_text_speech(text, count_char_max)
+
+        async def function_speech(text_chunk: str) -> bytes:
+            return await self.text_to_speech_for_bytes(
+                text_chunk, voice=voice, response_format=response_format, model_id=model_id, bypass_cache=bypass_cache
+            )
+
+        time_start = time.perf_counter()
+        speech_pipeline = SpeechPipelineAsync(list_text, function_speech, response_format, count_worker=count_worker)
+        return SpeechStream(speech_pipeline, time_start=time_start, count_byte_chunk=count_byte_chunk)
+
+    async def text_to_speech_for_file(
+        self,
+        text: str,
+        path_file_audio: str,
+        *,
+        voice: Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"] = "alloy",
+        response_format: Literal["mp3", "opus", "aac", "flac", "wav", "pcm"] = "mp3",
+        model_id: Optional[str] = None,
+        bypass_cache: bool = False,
+    ) -> SpeechStream:
+        speech_stream = await self.stream_text_to_speech(
+            text, voice=voice, response_format=response_format, model_id=model_id, bypass_cache=bypass_cache
+        )
+        try:
+            with open(path_file_audio, "w+b") as file:
+                await speech_stream.write_to_async(file)
+                if response_format == "wav":
+                    update_header_wav(file)
+        except BaseException:
+            if os.path.isfile(path_file_audio):
+                os.remove(path_file_audio)
+            raise
+        return speech_stream
+
+    async def text_to_speech_for_bytes(
+        self,
+        text: str,
+        *,
+        voice: Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"] = "alloy",
+        response_format: Literal["mp3", "opus", "aac", "flac", "wav", "pcm"] = "mp3",
+        model_id: Optional[str] = None,
+        bypass_cache: bool = False,
+    ) -> bytes:
+        speech_stream = await self.stream_text_to_speech(
+            text, voice=voice, response_format=response_format, model_id=model_id, bypass_cache=bypass_cache
+        )
+        return b"".join([chunk async for chunk in speech_stream])
@@ -0,0 +1,223 @@
+import base64
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+from srai_core.tools_env import get_string_from_env
+
+from srai_openai.client_openai_chatgpt import append_completion_message
+from srai_openai.model.batch_job import BatchJob, BatchJobPart
+from srai_openai.model.call_event import ENDPOINT_CHAT_COMPLETION, ENDPOINT_EMBEDDING
+from srai_openai.model.http_client_config import HttpClientConfig
+from srai_openai.model.prompt_config import PromptConfig
+from srai_openai.tools_http import create_client_openai
+
+FILE_NAME_PROMPT_CONFIG = "prompt_config.jsonl"
+
+
+class ClientOpenaiBatch:
+    # offline jobs through the batch api, half the price of direct requests with results within the completion window
+    # a job lives in its own directory, running it again with the same directory resumes it
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        *,
+        http_client_config: Optional[HttpClientConfig] = None,
+        base_url: Optional[str] = None,
+        count_line_max: int = 50000,
+        time_poll: float = 30.0,
+        completion_window: str = "24h",
+    ):
+        # base_url points the client at another server, for example the mock server for tests
+        # count_line_max is the number of requests per input file, the batch api accepts at most 50000
+        if api_key is None:
+            api_key = get_string_from_env("OPENAI_API_KEY")
+        self.client_openai = create_client_openai(api_key, http_client_config, base_url=base_url)
+        self.count_line_max = count_line_max
+        self.time_poll = time_poll
+        self.completion_window = completion_window
+
+    @staticmethod
+    def create_body_for_prompt_config(prompt_config: PromptConfig) -> dict:
+        body = {"model": prompt_config.model_id, "messages": prompt_config.messages}
+        if prompt_config.tools is not None:
+            body["tools"] = prompt_config.tools
+        if prompt_config.tool_choice is not None:
+            body["tool_choice"] = prompt_config.tool_choice
+        if prompt_config.response_format is not None:
+            body["response_format"] = prompt_config.response_format
+        return body
+
+    def create_job(self, path_dir: str, endpoint: str, list_body: List[dict]) -> BatchJob:
+        # writes the input files, the custom id of a request is the index of its item
+        os.makedirs(path_dir, exist_ok=True)
+        list_part = []
+        for index_item_start in range(0, len(list_body), self.count_line_max):
+            index_item_end = min(index_item_start + self.count_line_max, len(list_body))
+            list_part.append(BatchJobPart(len(list_part), index_item_start, index_item_end))
+        batch_job = BatchJob(path_dir, endpoint, len(list_body), list_part)
+        for part in list_part:
+            with open(batch_job.get_path_file(part.file_name_input), "w") as file:
+                for index_item in range(part.index_item_start, part.index_item_end):
+                    line = {
+                        "custom_id": str(index_item),
+                        "method": "POST",
+                        "url": endpoint,
+                        "body": list_body[index_item],
+                    }
+                    file.write(json.dumps(line) + "\n")
+        batch_job.save()
+        return batch_job
+
+    def submit(self, batch_job: BatchJob) -> None:
+        # uploads and submits the parts that are not submitted yet
+        for part in batch_job.list_part:
+            if part.file_id_input is None:
+                with open(batch_job.get_path_file(part.file_name_input), "rb") as file:
+                    file_object = self.client_openai.files.create(file=file, purpose="batch")
+                part.file_id_input = file_object.id
+                batch_job.save()
+            if part.batch_id is None:
+                batch = self.client_openai.batches.create(
+                    input_file_id=part.file_id_input,
+                    endpoint=batch_job.endpoint,  # type: ignore
+                    completion_window=self.completion_window,  # type: ignore
+                )
+                part.batch_id = batch.id
+                part.status = batch.status
+                batch_job.save()
+
+    def poll(self, batch_job: BatchJob) -> None:
+        # updates the status of the running parts and downloads the results of the finished ones
+        for part in batch_job.list_part:
+            if part.batch_id is not None and not part.is_done:
+                batch = self.client_openai.batches.retrieve(part.batch_id)
+                part.status = batch.status
+                part.file_id_output = batch.output_file_id
+                part.file_id_error = batch.error_file_id
+                batch_job.save()
+            if part.is_done and not part.is_downloaded:
+                for file_id, file_name in [
+                    (part.file_id_output, part.file_name_output),
+                    (part.file_id_error, part.file_name_error),
+                ]:
+                    if file_id is not None:
+                        content = self.client_openai.files.content(file_id).content
+                        with open(batch_job.get_path_file(file_name), "wb") as file:
+                            file.write(content)
+                part.is_downloaded = True
+                batch_job.save()
+
+    def wait(self, batch_job: BatchJob, *, time_max: Optional[float] = None) -> None:
+        time_start = time.monotonic()
+        self.submit(batch_job)
+        while True:
+            self.poll(batch_job)
+            if batch_job.is_done:
+                return
+            if time_max is not None and time_max < time.monotonic() - time_start + self.time_poll:
+                raise Exception(f"batch job {batch_job.path_dir} not done within {time_max} seconds")
+            time.sleep(self.time_poll)
+
+    def load_dict_index_body(self, batch_job: BatchJob) -> Dict[int, dict]:
+        # response bodies of the requests that succeeded by item index, failed requests are left out
+        dict_index_body = {}
+        for part in batch_job.list_part:
+            path_file = batch_job.get_path_file(part.file_name_output)
+            if not os.path.isfile(path_file):
+                continue
+            with open(path_file, "r") as file:
+                for line in file:
+                    line_dict = json.loads(line)
+                    response = line_dict.get("response")
+                    if response is not None and response["status_code"] == 200:
+                        dict_index_body[int(line_dict["custom_id"])] = response["body"]
+        return dict_index_body
+
+    def load_dict_index_error(self, batch_job: BatchJob) -> Dict[int, dict]:
+        # errors of the requests that failed by item index
+        dict_index_error = {}
+        for part in batch_job.list_part:
+            for file_name in [part.file_name_output, part.file_name_error]:
+                path_file = batch_job.get_path_file(file_name)
+                if not os.path.isfile(path_file):
+                    continue
+                with open(path_file, "r") as file:
+                    for line in file:
+                        line_dict = json.loads(line)
+                        response = line_dict.get("response")
+                        if response is not None and response["status_code"] != 200:
+                            dict_index_error[int(line_dict["custom_id"])] = response["body"]
+                        elif line_dict.get("error") is not None:
+                            dict_index_error[int(line_dict["custom_id"])] = line_dict["error"]
+        return dict_index_error
+
+    def load_or_create_job(self, path_dir: str, endpoint: str, list_body: List[dict]) -> BatchJob:
+        batch_job = BatchJob.load(path_dir)
+        if batch_job is None:
+            return self.create_job(path_dir, endpoint, list_body)
+        if batch_job.endpoint != endpoint or batch_job.count_item != len(list_body):
+            raise Exception(f"directory {path_dir} holds another batch job")
+        return batch_job
+
+    def run_prompt_config(
+        self, path_dir: str, list_prompt_config: List[PromptConfig], *, time_max: Optional[float] = None
+    ) -> List[Optional[PromptConfig]]:
+        # returns each prompt config with its completion appended, or None where the request failed
+        list_body = [self.create_body_for_prompt_config(prompt_config) for prompt_config in list_prompt_config]
+        if BatchJob.load(path_dir) is None:
+            # the inputs are needed to map the results back, they are written before the job exists
+            os.makedirs(path_dir, exist_ok=True)
+            with open(os.path.join(path_dir, FILE_NAME_PROMPT_CONFIG), "w") as file:
+                for prompt_config in list_prompt_config:
+                    file.write(json.dumps(prompt_config.to_dict()) + "\n")
+        batch_job = self.load_or_create_job(path_dir, ENDPOINT_CHAT_COMPLETION, list_body)
+        self.wait(batch_job, time_max=time_max)
+        return self.load_result_prompt_config(batch_job)
+
+    def load_result_prompt_config(self, batch_job: BatchJob) -> List[Optional[PromptConfig]]:
+        with open(batch_job.get_path_file(FILE_NAME_PROMPT_CONFIG), "r") as file:
+            list_prompt_config = [PromptConfig.from_dict(json.loads(line)) for line in file]
+        list_prompt_config_result: List[Optional[PromptConfig]] = [None] * batch_job.count_item
+        for index_item, body in self.load_dict_index_body(batch_job).items():
+            choice = body["choices"][0]
+            message = ChatCompletionMessage.model_validate(choice["message"])
+            list_prompt_config_result[index_item] = append_completion_message(
+                list_prompt_config[index_item], choice["finish_reason"], message
+            )
+        return list_prompt_config_result
+
+    def run_embedding(
+        self,
+        path_dir: str,
+        list_text: List[str],
+        *,
+        model_id: str = "text-embedding-3-small",
+        dimensions: Optional[int] = None,
+        time_max: Optional[float] = None,
+    ) -> np.ndarray:
+        # returns a float32 matrix with one row per text, rows of failed requests are nan
+        list_body = []
+        for text in list_text:
+            body = {"model": model_id, "input": text, "encoding_format": "base64"}
+            if dimensions is not None:
+                body["dimensions"] = dimensions
+            list_body.append(body)
+        batch_job = self.load_or_create_job(path_dir, ENDPOINT_EMBEDDING, list_body)
+        self.wait(batch_job, time_max=time_max)
+        return self.load_result_embedding(batch_job)
+
+    def load_result_embedding(self, batch_job: BatchJob) -> np.ndarray:
+        matrix = None
+        for index_item, body in self.load_dict_index_body(batch_job).items():
+            vector = np.frombuffer(base64.b64decode(body["data"][0]["embedding"]), dtype=np.float32)
+            if matrix is None:
+                matrix = np.full((batch_job.count_item, vector.shape[0]), np.nan, dtype=np.float32)
+            matrix[index_item] = vector
+        if matrix is None:
+            raise Exception(f"batch job {batch_job.path_dir} has no results")
+        return matrix
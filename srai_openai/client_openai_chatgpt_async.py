@@ -0,0 +1,583 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from openai import NOT_GIVEN
+from openai.types.chat.chat_completion import ChatCompletion
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+from srai_core.tools_env import get_string_from_env
+
+from srai_openai.cache.cache_prompt_config import CachePromptConfig
+from srai_openai.client_openai_chatgpt import (
+    append_completion_message,
+    create_tool_call_error,
+    create_tool_call_result,
+    parse_tool_call_request,
+)
+from srai_openai.instrument.instrument import Instrument
+from srai_openai.model.call_event import ENDPOINT_CHAT_COMPLETION, CallEvent
+from srai_openai.model.chatgpt_agent_run import ChatgptAgentRound, ChatgptAgentRun
+from srai_openai.model.chatgpt_stream import ChatgptChunkPrefetched, ChatgptDelta, ChatgptStream
+from srai_openai.model.chatgpt_tool import ChatgptTool
+from srai_openai.model.continuation_ranker import (
+    Continuation,
+    create_list_continuation_for_choice,
+    rank_list_continuation,
+)
+from srai_openai.model.http_client_config import HttpClientConfig
+from srai_openai.model.prompt_config import ChatgptEvent, PromptConfig
+from srai_openai.model.prompt_config_packer import PromptConfigPacker
+from srai_openai.model.tool_registry import ToolRegistry
+from srai_openai.schedule.policy_request import PolicyRequest
+from srai_openai.schedule.scheduler_rate_limit import PRIORITY_DEFAULT, SchedulerRateLimit
+from srai_openai.tools_http import create_client_openai_async
+
+
+class ClientOpenaiChatgptAsync:
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        *,
+        cache_prompt_config: Optional[CachePromptConfig] = None,
+        prompt_config_packer: Optional[PromptConfigPacker] = None,
+        tool_timeout: Optional[float] = None,
+        scheduler_rate_limit: Optional[SchedulerRateLimit] = None,
+        priority: int = PRIORITY_DEFAULT,
+        http_client_config: Optional[HttpClientConfig] = None,
+        base_url: Optional[str] = None,
+        policy_request: Optional[PolicyRequest] = None,
+        instrument: Optional[Instrument] = None,
+    ):
+        if api_key is None:
+            api_key = get_string_from_env("OPENAI_API_KEY")
+        if policy_request is None:
+            self.client_openai = create_client_openai_async(api_key, http_client_config, base_url=base_url)
+        else:
+            self.client_openai = create_client_openai_async(
+                api_key, http_client_config, base_url=base_url, max_retries=0
+            )
+        self.cache_prompt_config = cache_prompt_config
+        self.prompt_config_packer = prompt_config_packer
+        # default timeout in seconds for tools that do not set their own
+        self.tool_timeout = tool_timeout
+        # requests wait for the rate limiter, priority is the class of all requests of this client
+        self.scheduler_rate_limit = scheduler_rate_limit
+        self.priority = priority
+        # hedging and retries, the sdk does not retry on its own when a policy is set
+        self.policy_request = policy_request
+        # calls create events for the sinks of the instrument, without one no events are created
+        self.instrument = instrument
+
+    def get_default_model_id(self) -> str:
+        return "gpt-4o"
+
+    async def list_model_id(self) -> list:
+        model_list = await self.client_openai.models.list()
+        return [model.id for model in model_list.data]
+
+    async def prompt_default(
+        self,
+        system_message_content: str,
+        user_message_content: str,
+        *,
+        model: Optional[str] = None,
+        image_base64: Optional[str] = None,
+        bypass_cache: bool = False,
+        callback_delta: Optional[Callable[[ChatgptDelta], None]] = None,
+    ) -> str:
+        if model is None:
+            model = self.get_default_model_id()
+
+        prompt_config_input = PromptConfig.create(model, system_message_content)
+        prompt_config_input = prompt_config_input.append_user_message(user_message_content, image_base64)
+        prompt_config_result = await self.prompt_for_prompt_config(
+            prompt_config_input, bypass_cache=bypass_cache, callback_delta=callback_delta
+        )
+        return prompt_config_result.last_message_text
+
+    async def prompt_default_json(
+        self,
+        system_message_content: str,
+        user_message_content: str,
+        *,
+        model: Optional[str] = None,
+        image_base64: Optional[str] = None,
+        bypass_cache: bool = False,
+    ) -> dict:
+
+        if model is None:
+            model = self.get_default_model_id()
+
+        prompt_config_input = PromptConfig.create(model, system_message_content)
+        prompt_config_input = prompt_config_input.append_user_message(
+            user_message_content, image_base64, response_format={"type": "json_object"}
+        )
+        prompt_config_result = await self.prompt_for_prompt_config(prompt_config_input, bypass_cache=bypass_cache)
+        return json.loads(prompt_config_result.last_message_text)
+
+    async def complete_tool_call_requests(
+        self,
+        dict_chatgpt_tool: Union[Dict[str, ChatgptTool], ToolRegistry],
+        prompt_config_input: PromptConfig,
+        *,
+        list_tool_offer: Optional[List[dict]] = None,
+        tool_choice: Optional[str] = None,
+    ) -> PromptConfig:
+        # all tool calls of a turn run concurrently, results are appended in the order they were requested
+        # list_tool_offer and tool_choice are offered again with the next completion
+        if prompt_config_input.last_event.event_type != ChatgptEvent.TOOL_CALL_REQUEST:
+            raise Exception("last event is not a tool call request")
+
+        async def call_tool(tool_call_request: dict) -> dict:
+            try:
+                chatgpt_tool, arguments = parse_tool_call_request(dict_chatgpt_tool, tool_call_request)
+                timeout = chatgpt_tool.timeout if chatgpt_tool.timeout is not None else self.tool_timeout
+                result = await asyncio.wait_for(chatgpt_tool.call_async(**arguments), timeout)
+            except Exception as error:
+                result = create_tool_call_error(error)
+            return create_tool_call_result(tool_call_request, result)
+
+        list_tool_call_request = prompt_config_input.last_event.event_message["tool_calls"] or []
+        list_tool_call_result = await asyncio.gather(*[call_tool(request) for request in list_tool_call_request])
+        return prompt_config_input.append_tool_call_result(
+            list(list_tool_call_result), list_tool_offer=list_tool_offer, tool_choice=tool_choice
+        )
+
+    async def prompt_default_tool(
+        self,
+        system_message_content: str,
+        user_message_content: str,
+        list_chatgpt_tool: Union[List[ChatgptTool], ToolRegistry],
+        *,
+        image_base64: Optional[str] = None,
+        tool_choice: Optional[str] = "auto",
+        model: Optional[str] = None,
+        bypass_cache: bool = False,
+        callback_delta: Optional[Callable[[ChatgptDelta], None]] = None,
+        count_round_max: int = 8,
+    ) -> str:
+        if model is None:
+            model = self.get_default_model_id()
+
+        # pass a ToolRegistry to reuse the compiled tool offer between calls
+        tool_registry = list_chatgpt_tool
+        if not isinstance(tool_registry, ToolRegistry):
+            tool_registry = ToolRegistry(tool_registry)
+        prompt_config_input = PromptConfig.create(model, system_message_content)
+        prompt_config_input = prompt_config_input.append_user_message(
+            user_message_content,
+            image_base64=image_base64,
+            list_tool_offer=tool_registry.list_tool_offer,
+            tool_choice=tool_choice,
+        )
+
+        agent_run = await self.run_agent(
+            tool_registry,
+            prompt_config_input,
+            count_round_max=count_round_max,
+            bypass_cache=bypass_cache,
+            callback_delta=callback_delta,
+        )
+        if not agent_run.is_answered:
+            raise Exception(f"no answer after {len(agent_run.list_round)} rounds, stopped on {agent_run.stop_reason}")
+        return agent_run.prompt_config_result.last_message_text
+
+    async def run_agent(
+        self,
+        dict_chatgpt_tool: Union[Dict[str, ChatgptTool], ToolRegistry],
+        prompt_config_input: PromptConfig,
+        *,
+        count_round_max: int = 8,
+        token_count_max: Optional[int] = None,
+        time_max: Optional[float] = None,
+        bypass_cache: bool = False,
+        callback_delta: Optional[Callable[[ChatgptDelta], None]] = None,
+    ) -> ChatgptAgentRun:
+        # alternates completions and tool calls until the model answers or a budget runs out
+        # token_count_max bounds the tokens billed over all rounds, time_max in seconds bounds the whole run
+        time_start = time.perf_counter()
+        agent_run = ChatgptAgentRun(prompt_config_input)
+        prompt_config = prompt_config_input
+        list_tool_offer = prompt_config_input.tools
+        tool_choice = prompt_config_input.tool_choice
+        if list_tool_offer is None:
+            list_tool_offer = [chatgpt_tool.to_tool_dict() for chatgpt_tool in dict_chatgpt_tool.values()]
+        for index_round in range(count_round_max):
+            timeout = None
+            if time_max is not None:
+                timeout = time_max - (time.perf_counter() - time_start)
+                if timeout <= 0:
+                    agent_run.stop_reason = ChatgptAgentRun.STOP_REASON_TIME_BUDGET
+                    break
+            if token_count_max is not None:
+                # the prompt alone would already exceed the budget, checked before any tokens are spent on it
+                if token_count_max < agent_run.token_count_total + prompt_config.token_count():
+                    agent_run.stop_reason = ChatgptAgentRun.STOP_REASON_TOKEN_BUDGET
+                    break
+            agent_round = ChatgptAgentRound(index_round)
+            agent_run.list_round.append(agent_round)
+            # rounds are only streamed for callback_delta, the time to first token is only known for those
+            if callback_delta is None:
+                time_completion_start = time.perf_counter()
+                prompt_config, completion = await self.completion_for_prompt_config(
+                    prompt_config, bypass_cache=bypass_cache, timeout=timeout
+                )
+                agent_round.time_completion = time.perf_counter() - time_completion_start
+                agent_round.is_cached = completion is None
+                if completion is not None and completion.usage is not None:
+                    agent_round.token_count_prompt = completion.usage.prompt_tokens
+                    agent_round.token_count_completion = completion.usage.completion_tokens
+            else:
+                stream = await self.stream_for_prompt_config(prompt_config, bypass_cache=bypass_cache, timeout=timeout)
+                prompt_config = await stream.until_done_async(callback_delta)
+                agent_round.time_completion = stream.time_total  # type: ignore
+                agent_round.time_to_first_token = stream.time_to_first_token
+                agent_round.is_cached = stream.is_replay
+                if stream.usage is not None:
+                    agent_round.token_count_prompt = stream.usage["prompt_tokens"]
+                    agent_round.token_count_completion = stream.usage["completion_tokens"]
+            agent_run.prompt_config_result = prompt_config
+            if prompt_config.last_event.event_type != ChatgptEvent.TOOL_CALL_REQUEST:
+                agent_run.stop_reason = ChatgptAgentRun.STOP_REASON_ANSWER
+                break
+            time_tool_start = time.perf_counter()
+            agent_round.count_tool_call = len(prompt_config.last_event.event_message["tool_calls"])
+            prompt_config = await self.complete_tool_call_requests(
+                dict_chatgpt_tool, prompt_config, list_tool_offer=list_tool_offer, tool_choice=tool_choice
+            )
+            agent_round.time_tool = time.perf_counter() - time_tool_start
+            agent_run.prompt_config_result = prompt_config
+        else:
+            agent_run.stop_reason = ChatgptAgentRun.STOP_REASON_ROUND_BUDGET
+        agent_run.time_total = time.perf_counter() - time_start
+        return agent_run
+
+    def pack_prompt_config(self, prompt_config_input: PromptConfig) -> PromptConfig:
+        # the packed config is what is sent and cached, the completion is appended to the full input
+        if self.prompt_config_packer is None:
+            return prompt_config_input
+        return self.prompt_config_packer.pack(prompt_config_input)
+
+    def create_call_event(self, model_id: str, *, is_stream: bool = False) -> Optional[CallEvent]:
+        # None when the client has no instrument, so that calls without one do not pay for events
+        if self.instrument is None:
+            return None
+        return self.instrument.create_call_event(ENDPOINT_CHAT_COMPLETION, model_id, is_stream=is_stream)
+
+    def emit_call_event(
+        self, call_event: Optional[CallEvent], *, usage: Any = None, error: Optional[BaseException] = None
+    ) -> None:
+        if call_event is not None:
+            self.instrument.emit(call_event, usage=usage, error=error)  # type: ignore
+
+    async def create_chat_completion(
+        self,
+        prompt_config_request: PromptConfig,
+        call_event: Optional[CallEvent] = None,
+        *,
+        count_token: Optional[int] = None,
+        **kwds,
+    ) -> Any:
+        # all completion requests go through here so the request policy, the rate limiter and the instrument see them
+        # the call event is emitted here when the call fails, otherwise by the caller once the usage is known
+        # the rate limiter is charged once per request, hedges and retries of the request do not charge it again
+        # a request already charged by its caller passes its count_token, streams are settled by their caller once
+        # they close
+        try:
+            if count_token is None:
+                count_token = await self.acquire_rate_limit(prompt_config_request, kwds)
+            if self.policy_request is None:
+                completion = await self.create_chat_completion_attempt(prompt_config_request, call_event, **kwds)
+                self.settle_rate_limit(prompt_config_request, count_token, completion)
+                return completion
+            model_id = prompt_config_request.model_id
+            timeout = kwds.pop("timeout", NOT_GIVEN)
+            time_deadline = None if timeout is NOT_GIVEN else timeout
+            is_stream = kwds.get("stream", False)
+
+            async def attempt(timeout: Optional[float]) -> Any:
+                response = await self.create_chat_completion_attempt(
+                    prompt_config_request, call_event, timeout=NOT_GIVEN if timeout is None else timeout, **kwds
+                )
+                if not is_stream:
+                    return response
+                # streams are hedged and retried until their first chunk, which is what their latency is
+                return await ChatgptChunkPrefetched.create_async(response)
+
+            if not is_stream:
+                completion = await self.policy_request.call_async(model_id, attempt, time_deadline=time_deadline)
+                self.settle_rate_limit(prompt_config_request, count_token, completion)
+                return completion
+            return await self.policy_request.call_async(
+                f"{model_id}/stream",
+                attempt,
+                lambda chunk_prefetched: chunk_prefetched.close(),
+                time_deadline=time_deadline,
+            )
+        except Exception as error:
+            self.emit_call_event(call_event, error=error)
+            raise
+
+    async def acquire_rate_limit(self, prompt_config_request: PromptConfig, kwds: dict) -> int:
+        # waits for the rate limiter and returns the tokens the request is estimated to use
+        if self.scheduler_rate_limit is None:
+            return 0
+        count_token = prompt_config_request.token_count()
+        if isinstance(kwds.get("max_tokens"), int):
+            count_token += kwds["max_tokens"]
+        await self.scheduler_rate_limit.acquire_async(prompt_config_request.model_id, count_token, self.priority)
+        return count_token
+
+    def settle_rate_limit(self, prompt_config_request: PromptConfig, count_token: int, completion: Any) -> None:
+        # only the answer that is used settles, attempts that lost a hedge were never charged
+        if self.scheduler_rate_limit is None:
+            return
+        if isinstance(completion, ChatCompletion) and completion.usage is not None:
+            self.scheduler_rate_limit.settle(prompt_config_request.model_id, count_token, completion.usage.total_tokens)
+
+    async def create_chat_completion_attempt(
+        self, prompt_config_request: PromptConfig, call_event: Optional[CallEvent], **kwds
+    ) -> Any:
+        if self.scheduler_rate_limit is None and call_event is None:
+            return await self.client_openai.chat.completions.create(**kwds)
+        if call_event is not None:
+            call_event.count_attempt += 1
+        if kwds.get("stream", False):
+            # a streamed response returns as soon as its headers are in
+            response = await self.client_openai.chat.completions.with_raw_response.create(**kwds)
+            if call_event is not None:
+                call_event.add_response_headers(response.headers)
+            completion = response.parse()
+        else:
+            async with self.client_openai.chat.completions.with_streaming_response.create(**kwds) as response:
+                if call_event is not None:
+                    call_event.add_response_headers(response.headers)
+                completion = await response.parse()
+        if self.scheduler_rate_limit is not None:
+            self.scheduler_rate_limit.update_from_headers(prompt_config_request.model_id, response.headers)
+        return completion
+
+    async def prompt_for_prompt_config(
+        self,
+        prompt_config_input: PromptConfig,
+        *,
+        bypass_cache: bool = False,
+        callback_delta: Optional[Callable[[ChatgptDelta], None]] = None,
+    ) -> PromptConfig:
+        # bypass_cache skips both the lookup and the store, use it for prompts that should not be deterministic
+        # with callback_delta the completion is streamed and every delta is passed to it as it arrives
+        if callback_delta is not None:
+            stream = await self.stream_for_prompt_config(prompt_config_input, bypass_cache=bypass_cache)
+            return await stream.until_done_async(callback_delta)
+        prompt_config_result, _ = await self.completion_for_prompt_config(
+            prompt_config_input, bypass_cache=bypass_cache
+        )
+        return prompt_config_result
+
+    async def completion_for_prompt_config(
+        self, prompt_config_input: PromptConfig, *, bypass_cache: bool = False, timeout: Optional[float] = None
+    ) -> Tuple[PromptConfig, Optional[ChatCompletion]]:
+        # as prompt_for_prompt_config without streaming, also returns the completion, None when it came from the cache
+        prompt_config_request = self.pack_prompt_config(prompt_config_input)
+        call_event = self.create_call_event(prompt_config_request.model_id)
+        is_cached = self.cache_prompt_config is not None and not bypass_cache
+        if is_cached:
+            response = self.cache_prompt_config.load_response(prompt_config_request)  # type: ignore
+            if response is not None:
+                if call_event is not None:
+                    call_event.is_cached = True
+                    self.emit_call_event(call_event)
+                finish_reason, message = response
+                prompt_config_result = append_completion_message(
+                    prompt_config_input, finish_reason, ChatCompletionMessage.model_validate(message)
+                )
+                return prompt_config_result, None
+        completion = await self.create_chat_completion(
+            prompt_config_request,
+            call_event,
+            model=prompt_config_request.model_id,
+            messages=prompt_config_request.messages,  # type: ignore
+            tools=prompt_config_request.tools,  # type: ignore
+            tool_choice=prompt_config_request.tool_choice,  # type: ignore
+            response_format=prompt_config_request.response_format,  # type: ignore
+            timeout=NOT_GIVEN if timeout is None else timeout,
+        )
+        self.emit_call_event(call_event, usage=completion.usage)
+        choice = completion.choices[0]
+        if is_cached:
+            self.cache_prompt_config.save_response(  # type: ignore
+                prompt_config_request, choice.finish_reason, choice.message.model_dump()
+            )
+        return append_completion_message(prompt_config_input, choice.finish_reason, choice.message), completion
+
+    async def stream_for_prompt_config(
+        self, prompt_config_input: PromptConfig, *, bypass_cache: bool = False, timeout: Optional[float] = None
+    ) -> ChatgptStream:
+        # the returned stream yields deltas when iterated with async for, the result is assembled when it ends
+        time_start = time.perf_counter()
+        prompt_config_request = self.pack_prompt_config(prompt_config_input)
+        call_event = self.create_call_event(prompt_config_request.model_id, is_stream=True)
+        is_cached = self.cache_prompt_config is not None and not bypass_cache
+        if is_cached:
+            response = self.cache_prompt_config.load_response(prompt_config_request)  # type: ignore
+            if response is not None:
+                if call_event is not None:
+                    call_event.is_cached = True
+                    self.emit_call_event(call_event)
+                finish_reason, message = response
+                return ChatgptStream.create_for_message(
+                    prompt_config_input, finish_reason, ChatCompletionMessage.model_validate(message)
+                )
+
+        def callback_complete(finish_reason: str, message: ChatCompletionMessage) -> None:
+            if is_cached:
+                self.cache_prompt_config.save_response(  # type: ignore
+                    prompt_config_request, finish_reason, message.model_dump()
+                )
+            self.emit_call_event(call_event, usage=stream.usage)
+
+        def callback_close(stream_closed: ChatgptStream) -> None:
+            # without usage, when the stream failed or was abandoned, every delta counts as a token
+            if self.scheduler_rate_limit is None:
+                return
+            count_token_used = count_token + stream_closed.count_delta
+            if stream_closed.usage is not None:
+                count_token_used = stream_closed.usage["total_tokens"]
+            self.scheduler_rate_limit.settle(prompt_config_request.model_id, count_token, count_token_used)
+
+        count_token = await self.acquire_rate_limit(prompt_config_request, {})
+        iterable_chunk = await self.create_chat_completion(
+            prompt_config_request,
+            call_event,
+            count_token=count_token,
+            model=prompt_config_request.model_id,
+            messages=prompt_config_request.messages,  # type: ignore
+            tools=prompt_config_request.tools,  # type: ignore
+            tool_choice=prompt_config_request.tool_choice,  # type: ignore
+            response_format=prompt_config_request.response_format,  # type: ignore
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=NOT_GIVEN if timeout is None else timeout,
+        )
+        stream = ChatgptStream(
+            prompt_config_input,
+            iterable_chunk,
+            time_start=time_start,
+            callback_complete=callback_complete,
+            callback_close=callback_close,
+        )
+        return stream
+
+    async def continuations_for_prompt_config(
+        self, prompt_config_input: PromptConfig, count_token: Optional[int] = 1
+    ) -> List[Continuation]:
+        # the continuations found in one request of count_token tokens, see create_list_continuation_for_choice
+        call_event = self.create_call_event(prompt_config_input.model_id)
+        completion = await self.create_chat_completion(
+            prompt_config_input,
+            call_event,
+            model=prompt_config_input.model_id,
+            messages=prompt_config_input.messages,  # type: ignore
+            logprobs=True,
+            top_logprobs=20,
+            max_tokens=NOT_GIVEN if count_token is None else count_token,
+        )
+        self.emit_call_event(call_event, usage=completion.usage)
+        return create_list_continuation_for_choice(prompt_config_input, completion.choices[0].model_dump())
+
+    async def options_for_prompt_config(
+        self, prompt_config_input: PromptConfig, max_tokens: Optional[int] = 1
+    ) -> List[Tuple[float, PromptConfig]]:
+        # the top 20 next tokens, with max_tokens over 1 also the top 20 alternatives to every later token of the most
+        # likely continuation, each as the logprob of the continuation and the prompt config it is appended to
+        list_continuation = await self.continuations_for_prompt_config(prompt_config_input, max_tokens)
+        return [(continuation.logprob, continuation.prompt_config) for continuation in list_continuation]
+
+    async def rank_for_prompt_config(
+        self,
+        prompt_config_input: PromptConfig,
+        *,
+        count_result: int = 4,
+        count_token_max: int = 16,
+        logprob_margin: Optional[float] = None,
+        list_text_allowed: Optional[List[str]] = None,
+    ) -> List[Tuple[float, PromptConfig]]:
+        # the count_result best continuations of one request of count_token_max tokens, ranked as in
+        # rank_list_continuation, a text in list_text_allowed is only found when it is at most one token off the most
+        # likely continuation
+        list_continuation = rank_list_continuation(
+            await self.continuations_for_prompt_config(prompt_config_input, count_token_max),
+            count_result=count_result,
+            logprob_margin=logprob_margin,
+            list_text_allowed=list_text_allowed,
+        )
+        return [(continuation.logprob, continuation.prompt_config) for continuation in list_continuation]
+
+    def prompt_config_for_prompt(
+        self, prompt: Union[PromptConfig, Tuple[str, str]], *, model: Optional[str] = None
+    ) -> PromptConfig:
+        if isinstance(prompt, PromptConfig):
+            return prompt
+        if model is None:
+            model = self.get_default_model_id()
+        system_message_content, user_message_content = prompt
+        prompt_config = PromptConfig.create(model, system_message_content)
+        return prompt_config.append_user_message(user_message_content)
+
+    async def prompt_many(
+        self,
+        iterable_prompt: Iterable[Union[PromptConfig, Tuple[str, str]]],
+        *,
+        count_worker: int = 64,
+        model: Optional[str] = None,
+    ) -> AsyncIterator[Tuple[int, Optional[PromptConfig], Optional[BaseException]]]:
+        # yields (index, result, error) in completion order, never more than count_worker prompts in flight
+        if count_worker < 1:
+            raise ValueError("count_worker must be at least 1")
+
+        async def prompt_one(prompt: Union[PromptConfig, Tuple[str, str]]) -> PromptConfig:
+            return await self.prompt_for_prompt_config(self.prompt_config_for_prompt(prompt, model=model))
+
+        iterator_prompt = enumerate(iterable_prompt)
+        dict_task_index: Dict[asyncio.Task, int] = {}
+        try:
+            for index, prompt in iterator_prompt:
+                dict_task_index[asyncio.ensure_future(prompt_one(prompt))] = index
+                if len(dict_task_index) == count_worker:
+                    break
+            while 0 < len(dict_task_index):
+                set_task_done, _ = await asyncio.wait(dict_task_index, return_when=asyncio.FIRST_COMPLETED)
+                for task in set_task_done:
+                    index = dict_task_index.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        yield index, task.result(), None
+                    else:
+                        yield index, None, error
+                for index, prompt in iterator_prompt:
+                    dict_task_index[asyncio.ensure_future(prompt_one(prompt))] = index
+                    if len(dict_task_index) == count_worker:
+                        break
+        finally:
+            for task in dict_task_index:
+                task.cancel()
+
+    async def prompt_many_ordered(
+        self,
+        iterable_prompt: Iterable[Union[PromptConfig, Tuple[str, str]]],
+        *,
+        count_worker: int = 64,
+        model: Optional[str] = None,
+    ) -> List[Tuple[Optional[PromptConfig], Optional[BaseException]]]:
+        dict_result = {}
+        async for index, prompt_config_result, error in self.prompt_many(
+            iterable_prompt, count_worker=count_worker, model=model
+        ):
+            dict_result[index] = (prompt_config_result, error)
+        return [dict_result[index] for index in range(len(dict_result))]
+
+    async def prompt_default_image(self, prompt_config_input: PromptConfig) -> str:
+        prompt_config_result = await self.prompt_for_prompt_config(prompt_config_input)
+        return prompt_config_result.last_message_text
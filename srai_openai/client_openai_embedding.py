@@ -1,14 +1,77 @@
-from typing import List, Optional
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple, Union
 
-from openai import OpenAI
+import numpy as np
+from openai import NOT_GIVEN
+from openai.types.create_embedding_response import CreateEmbeddingResponse
 from srai_core.tools_env import get_string_from_env
 
+from srai_openai.cache.cache_embedding import CacheEmbedding
+from srai_openai.instrument.instrument import Instrument
+from srai_openai.model.call_event import ENDPOINT_EMBEDDING
+from srai_openai.model.http_client_config import HttpClientConfig
+from srai_openai.schedule.scheduler_rate_limit import PRIORITY_DEFAULT, SchedulerRateLimit
+from srai_openai.tools_http import create_client_openai
+from srai_openai.tools_tiktoken import count_token_batch
+
+COUNT_TOKEN_INPUT_MAX = 8191
+
+
+def create_list_batch_range(
+    list_count_token: List[int], *, count_input_max: int, count_token_max: int
+) -> List[Tuple[int, int]]:
+    # greedily packs consecutive inputs into (start, end) ranges that respect both request limits
+    list_batch_range = []
+    index_start = 0
+    count_token_range = 0
+    for index, count_token in enumerate(list_count_token):
+        if count_token_max < count_token:
+            raise ValueError(f"input {index} has {count_token} tokens, more than the {count_token_max} allowed")
+        if index - index_start == count_input_max or count_token_max < count_token_range + count_token:
+            list_batch_range.append((index_start, index))
+            index_start = index
+            count_token_range = 0
+        count_token_range += count_token
+    if index_start < len(list_count_token):
+        list_batch_range.append((index_start, len(list_count_token)))
+    return list_batch_range
+
+
+def decode_embedding_response(list_embedding: list, count_text: int) -> np.ndarray:
+    # embeddings requested with encoding_format base64 are little endian float32 buffers
+    matrix = None
+    for embedding in list_embedding:
+        vector = np.frombuffer(base64.b64decode(embedding.embedding), dtype=np.float32)
+        if matrix is None:
+            matrix = np.empty((count_text, vector.shape[0]), dtype=np.float32)
+        matrix[embedding.index] = vector
+    if matrix is None:
+        raise Exception("embedding response is empty")
+    return matrix
+
 
 class ClientOpenaiEmbedding:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        *,
+        cache_embedding: Optional[CacheEmbedding] = None,
+        scheduler_rate_limit: Optional[SchedulerRateLimit] = None,
+        priority: int = PRIORITY_DEFAULT,
+        http_client_config: Optional[HttpClientConfig] = None,
+        base_url: Optional[str] = None,
+        instrument: Optional[Instrument] = None,
+    ):
         if api_key is None:
             api_key = get_string_from_env("OPENAI_API_KEY")
-        self.client_openai = OpenAI(api_key=api_key)
+        self.client_openai = create_client_openai(api_key, http_client_config, base_url=base_url)
+        self.cache_embedding = cache_embedding
+        # requests wait for the rate limiter, priority is the class of all requests of this client
+        self.scheduler_rate_limit = scheduler_rate_limit
+        self.priority = priority
+        # calls create events for the sinks of the instrument, without one no events are created
+        self.instrument = instrument
 
     def get_default_model_id(self) -> str:
         return "text-embedding-3-small"
@@ -16,13 +79,173 @@ class ClientOpenaiEmbedding:
     def list_model_id(self) -> list:
         return ["text-embedding-3-small", "text-embedding-3-large"]
 
+    def create_embedding(
+        self, list_text: Union[str, List[str]], *, model_id: str, count_token: Optional[int] = None, **kwds
+    ) -> CreateEmbeddingResponse:
+        # all embedding requests go through here so the rate limiter and the instrument see them
+        call_event = None
+        if self.instrument is not None:
+            call_event = self.instrument.create_call_event(ENDPOINT_EMBEDDING, model_id)
+        elif self.scheduler_rate_limit is None:
+            return self.client_openai.embeddings.create(input=list_text, model=model_id, **kwds)
+        try:
+            if self.scheduler_rate_limit is not None:
+                if count_token is None:
+                    if isinstance(list_text, str):
+                        list_text = [list_text]
+                    count_token = sum(count_token_batch(model_id, list_text))
+                self.scheduler_rate_limit.acquire(model_id, count_token, self.priority)
+            with self.client_openai.embeddings.with_streaming_response.create(
+                input=list_text, model=model_id, **kwds
+            ) as response:
+                if call_event is not None:
+                    call_event.count_attempt += 1
+                    call_event.add_response_headers(response.headers)
+                embedding = response.parse()
+            if self.scheduler_rate_limit is not None:
+                self.scheduler_rate_limit.update_from_headers(model_id, response.headers)
+                self.scheduler_rate_limit.settle(model_id, count_token, embedding.usage.prompt_tokens)  # type: ignore
+        except Exception as error:
+            if call_event is not None:
+                self.instrument.emit(call_event, error=error)  # type: ignore
+            raise
+        if call_event is not None:
+            self.instrument.emit(call_event, usage=embedding.usage)  # type: ignore
+        return embedding
+
     def get_embedding(
         self,
         text: str,
         *,
         model_id: Optional[str] = None,
+        dimensions: Optional[int] = None,
     ) -> List[float]:
         if model_id is None:
             model_id = self.get_default_model_id()
-        embedding = self.client_openai.embeddings.create(input=text, model=model_id)
+        if self.cache_embedding is not None:
+            vector = self.cache_embedding.load_vector(model_id, dimensions, text)
+            if vector is not None:
+                return vector.tolist()
+        embedding = self.create_embedding(
+            text,
+            model_id=model_id,
+            dimensions=NOT_GIVEN if dimensions is None else dimensions,
+        )
+        if self.cache_embedding is not None:
+            self.cache_embedding.save_vector(model_id, dimensions, text, np.array(embedding.data[0].embedding))
         return embedding.data[0].embedding
+
+    def get_embedding_matrix(
+        self,
+        list_text: List[str],
+        *,
+        model_id: Optional[str] = None,
+        dimensions: Optional[int] = None,
+        count_token: Optional[int] = None,
+    ) -> np.ndarray:
+        # one request, the caller is responsible for respecting the request limits
+        if model_id is None:
+            model_id = self.get_default_model_id()
+        embedding = self.create_embedding(
+            list_text,
+            model_id=model_id,
+            count_token=count_token,
+            dimensions=NOT_GIVEN if dimensions is None else dimensions,
+            encoding_format="base64",
+        )
+        return decode_embedding_response(embedding.data, len(list_text))
+
+    def get_embedding_batch(
+        self,
+        iterable_text: Iterable[str],
+        *,
+        model_id: Optional[str] = None,
+        dimensions: Optional[int] = None,
+        count_worker: int = 4,
+        count_input_max: int = 2048,
+        count_token_max: int = 300000,
+    ) -> np.ndarray:
+        if model_id is None:
+            model_id = self.get_default_model_id()
+        list_text = list(iterable_text)
+        if self.cache_embedding is None:
+            return self.request_embedding_batch(
+                list_text,
+                model_id=model_id,
+                dimensions=dimensions,
+                count_worker=count_worker,
+                count_input_max=count_input_max,
+                count_token_max=count_token_max,
+            )
+
+        list_vector = self.cache_embedding.load_list_vector(model_id, dimensions, list_text)
+        # repeated texts within one batch are only sent once
+        list_text_miss = list(dict.fromkeys(text for text, vector in zip(list_text, list_vector) if vector is None))
+        dict_index_miss = {text: index for index, text in enumerate(list_text_miss)}
+        matrix_miss = None
+        if 0 < len(list_text_miss):
+            matrix_miss = self.request_embedding_batch(
+                list_text_miss,
+                model_id=model_id,
+                dimensions=dimensions,
+                count_worker=count_worker,
+                count_input_max=count_input_max,
+                count_token_max=count_token_max,
+            )
+            self.cache_embedding.save_list_vector(model_id, dimensions, list_text_miss, matrix_miss)
+        if len(list_text) == 0:
+            return np.empty((0, 0 if dimensions is None else dimensions), dtype=np.float32)
+        if matrix_miss is not None:
+            count_dimension = matrix_miss.shape[1]
+        else:
+            count_dimension = list_vector[0].shape[0]  # type: ignore
+        matrix = np.empty((len(list_text), count_dimension), dtype=np.float32)
+        for index, (text, vector) in enumerate(zip(list_text, list_vector)):
+            if vector is None:
+                matrix[index] = matrix_miss[dict_index_miss[text]]  # type: ignore
+            else:
+                matrix[index] = vector
+        return matrix
+
+    def request_embedding_batch(
+        self,
+        list_text: List[str],
+        *,
+        model_id: str,
+        dimensions: Optional[int] = None,
+        count_worker: int = 4,
+        count_input_max: int = 2048,
+        count_token_max: int = 300000,
+    ) -> np.ndarray:
+        # sends every text to the api, bypassing the cache
+        if len(list_text) == 0:
+            return np.empty((0, 0 if dimensions is None else dimensions), dtype=np.float32)
+
+        list_count_token = []
+        for index_start in range(0, len(list_text), 8192):
+            list_count_token.extend(count_token_batch(model_id, list_text[index_start : index_start + 8192]))
+        for index, count_token in enumerate(list_count_token):
+            if COUNT_TOKEN_INPUT_MAX < count_token:
+                raise ValueError(f"input {index} has {count_token} tokens, more than {COUNT_TOKEN_INPUT_MAX} allowed")
+        list_batch_range = create_list_batch_range(
+            list_count_token, count_input_max=count_input_max, count_token_max=count_token_max
+        )
+
+        def embed_range(batch_range: Tuple[int, int]) -> np.ndarray:
+            index_start, index_end = batch_range
+            return self.get_embedding_matrix(
+                list_text[index_start:index_end],
+                model_id=model_id,
+                dimensions=dimensions,
+                count_token=sum(list_count_token[index_start:index_end]),
+            )
+
+        matrix = None
+        with ThreadPoolExecutor(max_workers=count_worker) as executor:
+            for (index_start, index_end), matrix_batch in zip(
+                list_batch_range, executor.map(embed_range, list_batch_range)
+            ):
+                if matrix is None:
+                    matrix = np.empty((len(list_text), matrix_batch.shape[1]), dtype=np.float32)
+                matrix[index_start:index_end] = matrix_batch
+        return matrix  # type: ignore
@@ -0,0 +1,220 @@
+import asyncio
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+from openai import NOT_GIVEN
+from openai.types.create_embedding_response import CreateEmbeddingResponse
+from srai_core.tools_env import get_string_from_env
+
+from srai_openai.cache.cache_embedding import CacheEmbedding
+from srai_openai.client_openai_embedding import (
+    COUNT_TOKEN_INPUT_MAX,
+    create_list_batch_range,
+    decode_embedding_response,
+)
+from srai_openai.instrument.instrument import Instrument
+from srai_openai.model.call_event import ENDPOINT_EMBEDDING
+from srai_openai.model.http_client_config import HttpClientConfig
+from srai_openai.schedule.scheduler_rate_limit import PRIORITY_DEFAULT, SchedulerRateLimit
+from srai_openai.tools_http import create_client_openai_async
+from srai_openai.tools_tiktoken import count_token_batch
+
+
+class ClientOpenaiEmbeddingAsync:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        *,
+        cache_embedding: Optional[CacheEmbedding] = None,
+        scheduler_rate_limit: Optional[SchedulerRateLimit] = None,
+        priority: int = PRIORITY_DEFAULT,
+        http_client_config: Optional[HttpClientConfig] = None,
+        base_url: Optional[str] = None,
+        instrument: Optional[Instrument] = None,
+    ):
+        if api_key is None:
+            api_key = get_string_from_env("OPENAI_API_KEY")
+        self.client_openai = create_client_openai_async(api_key, http_client_config, base_url=base_url)
+        self.cache_embedding = cache_embedding
+        # requests wait for the rate limiter, priority is the class of all requests of this client
+        self.scheduler_rate_limit = scheduler_rate_limit
+        self.priority = priority
+        # calls create events for the sinks of the instrument, without one no events are created
+        self.instrument = instrument
+
+    def get_default_model_id(self) -> str:
+        return "text-embedding-3-small"
+
+    def list_model_id(self) -> list:
+        return ["text-embedding-3-small", "text-embedding-3-large"]
+
+    async def create_embedding(
+        self, list_text: Union[str, List[str]], *, model_id: str, count_token: Optional[int] = None, **kwds
+    ) -> CreateEmbeddingResponse:
+        # all embedding requests go through here so the rate limiter and the instrument see them
+        call_event = None
+        if self.instrument is not None:
+            call_event = self.instrument.create_call_event(ENDPOINT_EMBEDDING, model_id)
+        elif self.scheduler_rate_limit is None:
+            return await self.client_openai.embeddings.create(input=list_text, model=model_id, **kwds)
+        try:
+            if self.scheduler_rate_limit is not None:
+                if count_token is None:
+                    if isinstance(list_text, str):
+                        list_text = [list_text]
+                    count_token = sum(await asyncio.to_thread(count_token_batch, model_id, list_text))
+                await self.scheduler_rate_limit.acquire_async(model_id, count_token, self.priority)
+            async with self.client_openai.embeddings.with_streaming_response.create(
+                input=list_text, model=model_id, **kwds
+            ) as response:
+                if call_event is not None:
+                    call_event.count_attempt += 1
+                    call_event.add_response_headers(response.headers)
+                embedding = await response.parse()
+            if self.scheduler_rate_limit is not None:
+                self.scheduler_rate_limit.update_from_headers(model_id, response.headers)
+                self.scheduler_rate_limit.settle(model_id, count_token, embedding.usage.prompt_tokens)  # type: ignore
+        except Exception as error:
+            if call_event is not None:
+                self.instrument.emit(call_event, error=error)  # type: ignore
+            raise
+        if call_event is not None:
+            self.instrument.emit(call_event, usage=embedding.usage)  # type: ignore
+        return embedding
+
+    async def get_embedding(
+        self,
+        text: str,
+        *,
+        model_id: Optional[str] = None,
+        dimensions: Optional[int] = None,
+    ) -> List[float]:
+        if model_id is None:
+            model_id = self.get_default_model_id()
+        if self.cache_embedding is not None:
+            vector = self.cache_embedding.load_vector(model_id, dimensions, text)
+            if vector is not None:
+                return vector.tolist()
+        embedding = await self.create_embedding(
+            text,
+            model_id=model_id,
+            dimensions=NOT_GIVEN if dimensions is None else dimensions,
+        )
+        if self.cache_embedding is not None:
+            self.cache_embedding.save_vector(model_id, dimensions, text, np.array(embedding.data[0].embedding))
+        return embedding.data[0].embedding
+
+    async def get_embedding_matrix(
+        self,
+        list_text: List[str],
+        *,
+        model_id: Optional[str] = None,
+        dimensions: Optional[int] = None,
+        count_token: Optional[int] = None,
+    ) -> np.ndarray:
+        if model_id is None:
+            model_id = self.get_default_model_id()
+        embedding = await self.create_embedding(
+            list_text,
+            model_id=model_id,
+            count_token=count_token,
+            dimensions=NOT_GIVEN if dimensions is None else dimensions,
+            encoding_format="base64",
+        )
+        return decode_embedding_response(embedding.data, len(list_text))
+
+    async def get_embedding_batch(
+        self,
+        iterable_text: Iterable[str],
+        *,
+        model_id: Optional[str] = None,
+        dimensions: Optional[int] = None,
+        count_worker: int = 4,
+        count_input_max: int = 2048,
+        count_token_max: int = 300000,
+    ) -> np.ndarray:
+        if model_id is None:
+            model_id = self.get_default_model_id()
+        list_text = list(iterable_text)
+        if self.cache_embedding is None:
+            return await self.request_embedding_batch(
+                list_text,
+                model_id=model_id,
+                dimensions=dimensions,
+                count_worker=count_worker,
+                count_input_max=count_input_max,
+                count_token_max=count_token_max,
+            )
+
+        list_vector = self.cache_embedding.load_list_vector(model_id, dimensions, list_text)
+        # repeated texts within one batch are only sent once
+        list_text_miss = list(dict.fromkeys(text for text, vector in zip(list_text, list_vector) if vector is None))
+        dict_index_miss = {text: index for index, text in enumerate(list_text_miss)}
+        matrix_miss = None
+        if 0 < len(list_text_miss):
+            matrix_miss = await self.request_embedding_batch(
+                list_text_miss,
+                model_id=model_id,
+                dimensions=dimensions,
+                count_worker=count_worker,
+                count_input_max=count_input_max,
+                count_token_max=count_token_max,
+            )
+            self.cache_embedding.save_list_vector(model_id, dimensions, list_text_miss, matrix_miss)
+        if len(list_text) == 0:
+            return np.empty((0, 0 if dimensions is None else dimensions), dtype=np.float32)
+        if matrix_miss is not None:
+            count_dimension = matrix_miss.shape[1]
+        else:
+            count_dimension = list_vector[0].shape[0]  # type: ignore
+        matrix = np.empty((len(list_text), count_dimension), dtype=np.float32)
+        for index, (text, vector) in enumerate(zip(list_text, list_vector)):
+            if vector is None:
+                matrix[index] = matrix_miss[dict_index_miss[text]]  # type: ignore
+            else:
+                matrix[index] = vector
+        return matrix
+
+    async def request_embedding_batch(
+        self,
+        list_text: List[str],
+        *,
+        model_id: str,
+        dimensions: Optional[int] = None,
+        count_worker: int = 4,
+        count_input_max: int = 2048,
+        count_token_max: int = 300000,
+    ) -> np.ndarray:
+        # sends every text to the api, bypassing the cache
+        if len(list_text) == 0:
+            return np.empty((0, 0 if dimensions is None else dimensions), dtype=np.float32)
+
+        list_count_token = []
+        for index_start in range(0, len(list_text), 8192):
+            list_count_token.extend(
+                await asyncio.to_thread(count_token_batch, model_id, list_text[index_start : index_start + 8192])
+            )
+        for index, count_token in enumerate(list_count_token):
+            if COUNT_TOKEN_INPUT_MAX < count_token:
+                raise ValueError(f"input {index} has {count_token} tokens, more than {COUNT_TOKEN_INPUT_MAX} allowed")
+        list_batch_range = create_list_batch_range(
+            list_count_token, count_input_max=count_input_max, count_token_max=count_token_max
+        )
+
+        semaphore = asyncio.Semaphore(count_worker)
+
+        async def embed_range(batch_range: Tuple[int, int]) -> np.ndarray:
+            index_start, index_end = batch_range
+            async with semaphore:
+                return await self.get_embedding_matrix(
+                    list_text[index_start:index_end],
+                    model_id=model_id,
+                    dimensions=dimensions,
+                    count_token=sum(list_count_token[index_start:index_end]),
+                )
+
+        list_matrix_batch = await asyncio.gather(*[embed_range(batch_range) for batch_range in list_batch_range])
+        matrix = np.empty((len(list_text), list_matrix_batch[0].shape[1]), dtype=np.float32)
+        for (index_start, index_end), matrix_batch in zip(list_batch_range, list_matrix_batch):
+            matrix[index_start:index_end] = matrix_batch
+        return matrix
@@ -0,0 +1,294 @@
+import json
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from srai_openai.cache.cache_embedding import CacheEmbedding
+
+if TYPE_CHECKING:
+    from srai_openai.client_openai_embedding import ClientOpenaiEmbedding
+
+
+def normalize_matrix(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.array(matrix, dtype=np.float32, ndmin=2)
+    norm = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norm[norm == 0] = 1
+    matrix /= norm
+    return matrix
+
+
+class IndexEmbedding:
+    # cosine similarity index over a contiguous matrix of normalized float32 rows
+    # deleted rows are masked until the next compact
+    # in ivf mode the rows are kept sorted by cluster so that probing a cluster is a slice, not a copy
+    # rows added after the last sort live in an unsorted tail that is always searched exhaustively
+
+    def __init__(self, count_dimension: int) -> None:
+        self.count_dimension = count_dimension
+        self.matrix = np.empty((0, count_dimension), dtype=np.float32)
+        self.count_row = 0
+        self.list_id: List[str] = []
+        self.dict_id_row: Dict[str, int] = {}
+        self.array_is_deleted = np.empty(0, dtype=bool)
+        self.count_deleted = 0
+        self.matrix_centroid: Optional[np.ndarray] = None
+        self.array_cluster = np.empty(0, dtype=np.int32)
+        self.array_cluster_start = np.empty(0, dtype=np.int64)
+        self.count_row_sorted = 0
+
+    def __len__(self) -> int:
+        return self.count_row - self.count_deleted
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.dict_id_row
+
+    @property
+    def is_ivf(self) -> bool:
+        return self.matrix_centroid is not None
+
+    def reserve(self, count_row: int) -> None:
+        if count_row <= self.matrix.shape[0]:
+            return
+        count_row_capacity = max(count_row, 2 * self.matrix.shape[0], 1024)
+        matrix = np.empty((count_row_capacity, self.count_dimension), dtype=np.float32)
+        matrix[: self.count_row] = self.matrix[: self.count_row]
+        self.matrix = matrix
+        array_is_deleted = np.zeros(count_row_capacity, dtype=bool)
+        array_is_deleted[: self.count_row] = self.array_is_deleted[: self.count_row]
+        self.array_is_deleted = array_is_deleted
+        array_cluster = np.zeros(count_row_capacity, dtype=np.int32)
+        array_cluster[: self.count_row] = self.array_cluster[: self.count_row]
+        self.array_cluster = array_cluster
+
+    def add(self, list_id: List[str], matrix: np.ndarray) -> None:
+        matrix = normalize_matrix(matrix)
+        if len(list_id) != matrix.shape[0]:
+            raise ValueError(f"got {len(list_id)} ids for {matrix.shape[0]} vectors")
+        if matrix.shape[1] != self.count_dimension:
+            raise ValueError(f"vectors have {matrix.shape[1]} dimensions, index has {self.count_dimension}")
+        if len(set(list_id)) != len(list_id):
+            raise ValueError("list_id contains duplicates")
+        self.delete([id for id in list_id if id in self.dict_id_row])
+        row_start = self.count_row
+        self.reserve(self.count_row + len(list_id))
+        self.matrix[row_start : row_start + len(list_id)] = matrix
+        for row, id in enumerate(list_id, start=row_start):
+            self.dict_id_row[id] = row
+        self.list_id.extend(list_id)
+        self.count_row += len(list_id)
+        if self.matrix_centroid is not None:
+            self.array_cluster[row_start : self.count_row] = self.assign_cluster(matrix, self.matrix_centroid)
+            if self.count_row_sorted < 8 * (self.count_row - self.count_row_sorted):
+                self.sort_by_cluster()
+
+    def add_from_client(
+        self,
+        client_embedding: "ClientOpenaiEmbedding",
+        list_id: List[str],
+        list_text: List[str],
+        *,
+        model_id: Optional[str] = None,
+        dimensions: Optional[int] = None,
+    ) -> None:
+        # goes through the embedding cache of the client when it has one
+        self.add(list_id, client_embedding.get_embedding_batch(list_text, model_id=model_id, dimensions=dimensions))
+
+    def add_from_cache(
+        self,
+        cache_embedding: CacheEmbedding,
+        model_id: str,
+        dimensions: Optional[int],
+        list_id: List[str],
+        list_text: List[str],
+    ) -> List[str]:
+        # adds the texts that are already cached and returns the ids of the ones that are not
+        list_vector = cache_embedding.load_list_vector(model_id, dimensions, list_text)
+        list_id_found = [id for id, vector in zip(list_id, list_vector) if vector is not None]
+        if 0 < len(list_id_found):
+            self.add(list_id_found, np.stack([vector for vector in list_vector if vector is not None]))
+        return [id for id, vector in zip(list_id, list_vector) if vector is None]
+
+    def delete(self, list_id: List[str]) -> None:
+        for id in list_id:
+            row = self.dict_id_row.pop(id)
+            self.array_is_deleted[row] = True
+            self.count_deleted += 1
+        if 0 < self.count_deleted and self.count_row < 2 * self.count_deleted:
+            self.compact()
+
+    def compact(self) -> None:
+        array_row_live = np.flatnonzero(~self.array_is_deleted[: self.count_row])
+        self.count_row_sorted = int(np.searchsorted(array_row_live, self.count_row_sorted))
+        self.permute(array_row_live)
+        if self.matrix_centroid is not None:
+            self.update_array_cluster_start()
+
+    def permute(self, array_row: np.ndarray) -> None:
+        self.matrix = np.ascontiguousarray(self.matrix[array_row])
+        self.array_cluster = self.array_cluster[array_row]
+        self.array_is_deleted = self.array_is_deleted[array_row]
+        self.list_id = [self.list_id[row] for row in array_row]
+        self.dict_id_row = {id: row for row, id in enumerate(self.list_id) if not self.array_is_deleted[row]}
+        self.count_row = len(self.list_id)
+        self.count_deleted = int(np.count_nonzero(self.array_is_deleted))
+
+    def get_vector(self, id: str) -> np.ndarray:
+        return self.matrix[self.dict_id_row[id]]
+
+    def build_ivf(self, count_cluster: int, *, count_iteration: int = 10, count_sample_max: int = 262144) -> None:
+        # spherical k-means on a sample of the live rows, then every row is assigned to its nearest centroid
+        array_row_live = np.flatnonzero(~self.array_is_deleted[: self.count_row])
+        if len(array_row_live) < count_cluster:
+            raise ValueError(f"cannot build {count_cluster} clusters from {len(array_row_live)} vectors")
+        generator = np.random.default_rng(0)
+        array_row_sample = array_row_live
+        if count_sample_max < len(array_row_sample):
+            array_row_sample = np.sort(generator.choice(array_row_sample, count_sample_max, replace=False))
+        matrix_sample = self.matrix[array_row_sample]
+        matrix_centroid = matrix_sample[generator.choice(len(matrix_sample), count_cluster, replace=False)].copy()
+        for _ in range(count_iteration):
+            array_assignment = self.assign_cluster(matrix_sample, matrix_centroid)
+            array_order = np.argsort(array_assignment, kind="stable")
+            array_cluster, array_start = np.unique(array_assignment[array_order], return_index=True)
+            matrix_sum = matrix_centroid.copy()  # empty clusters keep their previous centroid
+            matrix_sum[array_cluster] = np.add.reduceat(matrix_sample[array_order], array_start, axis=0)
+            matrix_centroid = normalize_matrix(matrix_sum)
+        self.matrix_centroid = matrix_centroid
+        self.array_cluster[: self.count_row] = self.assign_cluster(self.matrix[: self.count_row], matrix_centroid)
+        self.sort_by_cluster()
+
+    def drop_ivf(self) -> None:
+        self.matrix_centroid = None
+        self.array_cluster_start = np.empty(0, dtype=np.int64)
+        self.count_row_sorted = 0
+
+    def sort_by_cluster(self) -> None:
+        array_row_live = np.flatnonzero(~self.array_is_deleted[: self.count_row])
+        array_order = np.argsort(self.array_cluster[array_row_live], kind="stable")
+        self.permute(array_row_live[array_order])
+        self.count_row_sorted = self.count_row
+        self.update_array_cluster_start()
+
+    def update_array_cluster_start(self) -> None:
+        count_cluster = self.matrix_centroid.shape[0]  # type: ignore
+        self.array_cluster_start = np.searchsorted(
+            self.array_cluster[: self.count_row_sorted], np.arange(count_cluster + 1), side="left"
+        )
+
+    @staticmethod
+    def assign_cluster(matrix: np.ndarray, matrix_centroid: np.ndarray, count_row_chunk: int = 65536) -> np.ndarray:
+        array_assignment = np.empty(matrix.shape[0], dtype=np.int32)
+        for row_start in range(0, matrix.shape[0], count_row_chunk):
+            matrix_chunk = matrix[row_start : row_start + count_row_chunk]
+            array_assignment[row_start : row_start + count_row_chunk] = np.argmax(
+                matrix_chunk @ matrix_centroid.T, axis=1
+            )
+        return array_assignment
+
+    def query(self, vector: np.ndarray, count_result: int = 10, *, count_probe: int = 8) -> List[Tuple[str, float]]:
+        return self.query_batch(np.asarray(vector).reshape(1, -1), count_result, count_probe=count_probe)[0]
+
+    def query_batch(
+        self,
+        matrix_query: np.ndarray,
+        count_result: int = 10,
+        *,
+        count_probe: int = 8,
+        count_score_max: int = 2**24,
+    ) -> List[List[Tuple[str, float]]]:
+        # count_probe is only used in ivf mode, count_score_max bounds the size of the intermediate score matrix
+        matrix_query = normalize_matrix(matrix_query)
+        if matrix_query.shape[1] != self.count_dimension:
+            raise ValueError(f"queries have {matrix_query.shape[1]} dimensions, index has {self.count_dimension}")
+        if len(self) == 0:
+            return [[] for _ in range(matrix_query.shape[0])]
+        if self.matrix_centroid is not None:
+            return [self.query_ivf(query, count_result, count_probe) for query in matrix_query]
+
+        list_result = []
+        count_query_chunk = max(1, count_score_max // self.count_row)
+        matrix = self.matrix[: self.count_row]
+        array_is_deleted = self.array_is_deleted[: self.count_row]
+        for query_start in range(0, matrix_query.shape[0], count_query_chunk):
+            matrix_score = matrix_query[query_start : query_start + count_query_chunk] @ matrix.T
+            if 0 < self.count_deleted:
+                matrix_score[:, array_is_deleted] = -np.inf
+            for array_score in matrix_score:
+                list_result.append(self.select_top(array_score, None, count_result))
+        return list_result
+
+    def query_ivf(self, query: np.ndarray, count_result: int, count_probe: int) -> List[Tuple[str, float]]:
+        array_score_centroid = self.matrix_centroid @ query  # type: ignore
+        count_probe = min(count_probe, len(array_score_centroid))
+        array_cluster_probe = np.argpartition(-array_score_centroid, count_probe - 1)[:count_probe]
+        list_array_score = []
+        list_array_row = []
+        for cluster in array_cluster_probe:
+            row_start = self.array_cluster_start[cluster]
+            row_end = self.array_cluster_start[cluster + 1]
+            if row_start < row_end:
+                list_array_score.append(self.matrix[row_start:row_end] @ query)
+                list_array_row.append(np.arange(row_start, row_end))
+        if self.count_row_sorted < self.count_row:
+            list_array_score.append(self.matrix[self.count_row_sorted : self.count_row] @ query)
+            list_array_row.append(np.arange(self.count_row_sorted, self.count_row))
+        if len(list_array_row) == 0:
+            return []
+        array_score = np.concatenate(list_array_score)
+        array_row = np.concatenate(list_array_row)
+        if 0 < self.count_deleted:
+            array_score[self.array_is_deleted[array_row]] = -np.inf
+        return self.select_top(array_score, array_row, count_result)
+
+    def select_top(
+        self, array_score: np.ndarray, array_row: Optional[np.ndarray], count_result: int
+    ) -> List[Tuple[str, float]]:
+        count_result = min(count_result, len(array_score))
+        if count_result <= 0:
+            return []
+        array_index = np.argpartition(-array_score, count_result - 1)[:count_result]
+        array_index = array_index[np.argsort(-array_score[array_index])]
+        list_result = []
+        for index in array_index:
+            score = float(array_score[index])
+            if score == -np.inf:
+                break
+            row = index if array_row is None else array_row[index]
+            list_result.append((self.list_id[row], score))
+        return list_result
+
+    def save(self, path_dir: str) -> None:
+        if self.matrix_centroid is not None:
+            self.sort_by_cluster()
+        elif 0 < self.count_deleted:
+            self.compact()
+        if not os.path.exists(path_dir):
+            os.makedirs(path_dir)
+        np.save(os.path.join(path_dir, "matrix.npy"), self.matrix[: self.count_row])
+        np.save(os.path.join(path_dir, "cluster.npy"), self.array_cluster[: self.count_row])
+        if self.matrix_centroid is not None:
+            np.save(os.path.join(path_dir, "centroid.npy"), self.matrix_centroid)
+        elif os.path.exists(os.path.join(path_dir, "centroid.npy")):
+            os.remove(os.path.join(path_dir, "centroid.npy"))
+        with open(os.path.join(path_dir, "list_id.json"), "w") as file:
+            json.dump(self.list_id, file)
+
+    @staticmethod
+    def load(path_dir: str, *, is_memory_mapped: bool = True) -> "IndexEmbedding":
+        # a memory mapped index is read only until the first add or compact, which copies it into memory
+        mmap_mode = "r" if is_memory_mapped else None
+        matrix = np.load(os.path.join(path_dir, "matrix.npy"), mmap_mode=mmap_mode)
+        index_embedding = IndexEmbedding(matrix.shape[1])
+        index_embedding.matrix = matrix
+        index_embedding.count_row = matrix.shape[0]
+        index_embedding.array_cluster = np.load(os.path.join(path_dir, "cluster.npy"))
+        index_embedding.array_is_deleted = np.zeros(matrix.shape[0], dtype=bool)
+        with open(os.path.join(path_dir, "list_id.json"), "r") as file:
+            index_embedding.list_id = json.load(file)
+        index_embedding.dict_id_row = {id: row for row, id in enumerate(index_embedding.list_id)}
+        if os.path.exists(os.path.join(path_dir, "centroid.npy")):
+            index_embedding.matrix_centroid = np.load(os.path.join(path_dir, "centroid.npy"))
+            index_embedding.count_row_sorted = index_embedding.count_row
+            index_embedding.update_array_cluster_start()
+        return index_embedding
@@ -0,0 +1,29 @@
+from typing import Any, List, Mapping, Optional, Tuple
+
+from srai_openai.instrument.sink_call_event import SinkCallEvent
+from srai_openai.model.call_event import DICT_MODEL_ID_PREFIX_COST, CallEvent
+
+
+class Instrument:
+    # creates and delivers call events for the clients it is given to, clients without one create no events at all
+    # dict_model_id_prefix_cost overrides the price table used for the cost estimates
+
+    def __init__(
+        self,
+        list_sink: Optional[List[SinkCallEvent]] = None,
+        *,
+        dict_model_id_prefix_cost: Mapping[str, Tuple[float, float, float]] = DICT_MODEL_ID_PREFIX_COST,
+    ) -> None:
+        self.list_sink = list(list_sink or [])
+        self.dict_model_id_prefix_cost = dict_model_id_prefix_cost
+
+    def add_sink(self, sink: SinkCallEvent) -> None:
+        self.list_sink.append(sink)
+
+    def create_call_event(self, endpoint: str, model_id: str, *, is_stream: bool = False) -> CallEvent:
+        return CallEvent(endpoint, model_id, is_stream=is_stream)
+
+    def emit(self, call_event: CallEvent, *, usage: Any = None, error: Optional[BaseException] = None) -> None:
+        call_event.finish(self.dict_model_id_prefix_cost, usage=usage, error=error)
+        for sink in self.list_sink:
+            sink.emit(call_event)
@@ -0,0 +1,21 @@
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from srai_openai.model.call_event import CallEvent
+
+
+class SinkCallEvent(ABC):
+    # receives every finished call event of the clients it is given to, emit is called on the thread of the call
+
+    @abstractmethod
+    def emit(self, call_event: CallEvent) -> None:
+        raise NotImplementedError()
+
+
+class SinkCallEventCallback(SinkCallEvent):
+
+    def __init__(self, callback: Callable[[CallEvent], None]) -> None:
+        self.callback = callback
+
+    def emit(self, call_event: CallEvent) -> None:
+        self.callback(call_event)
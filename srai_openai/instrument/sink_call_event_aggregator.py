@@ -0,0 +1,61 @@
+from threading import Lock
+from typing import Dict
+
+from srai_openai.instrument.sink_call_event import SinkCallEvent
+from srai_openai.model.call_event import CallEvent
+from srai_openai.schedule.histogram_latency import HistogramLatency
+
+LIST_PERCENTILE = [0.5, 0.9, 0.99]
+
+
+class SinkCallEventAggregator(SinkCallEvent):
+    # totals and latency percentiles per endpoint and model, latencies over the last count_sample_max calls
+
+    def __init__(self, *, count_sample_max: int = 1000) -> None:
+        self.histogram_time_wall = HistogramLatency(count_sample_max=count_sample_max)
+        self.histogram_time_to_first_byte = HistogramLatency(count_sample_max=count_sample_max)
+        self.dict_key_total: Dict[str, Dict[str, float]] = {}
+        self.lock = Lock()
+
+    def emit(self, call_event: CallEvent) -> None:
+        key = f"{call_event.endpoint} {call_event.model_id}"
+        with self.lock:
+            if key not in self.dict_key_total:
+                self.dict_key_total[key] = {
+                    "count_call": 0,
+                    "count_error": 0,
+                    "count_cached": 0,
+                    "count_retry": 0,
+                    "token_count_prompt": 0,
+                    "token_count_cached": 0,
+                    "token_count_completion": 0,
+                    "cost": 0.0,
+                }
+            dict_total = self.dict_key_total[key]
+            dict_total["count_call"] += 1
+            dict_total["count_error"] += call_event.error is not None
+            dict_total["count_cached"] += call_event.is_cached
+            dict_total["count_retry"] += call_event.count_retry
+            dict_total["token_count_prompt"] += call_event.token_count_prompt
+            dict_total["token_count_cached"] += call_event.token_count_cached
+            dict_total["token_count_completion"] += call_event.token_count_completion
+            dict_total["cost"] += call_event.cost or 0.0
+        # cache hits and errors would skew the latency of real responses
+        if call_event.is_cached or call_event.error is not None:
+            return
+        self.histogram_time_wall.add(key, call_event.time_wall)  # type: ignore
+        if call_event.time_to_first_byte is not None:
+            self.histogram_time_to_first_byte.add(key, call_event.time_to_first_byte)
+
+    def get_summary(self) -> Dict[str, dict]:
+        # per "endpoint model_id" the totals and the percentiles of wall time and time to first byte
+        with self.lock:
+            dict_key_summary = {key: dict(dict_total) for key, dict_total in self.dict_key_total.items()}
+        for key, dict_summary in dict_key_summary.items():
+            for percentile in LIST_PERCENTILE:
+                name = f"p{round(percentile * 100)}"
+                dict_summary[f"time_wall_{name}"] = self.histogram_time_wall.get_percentile(key, percentile)
+                dict_summary[f"time_to_first_byte_{name}"] = self.histogram_time_to_first_byte.get_percentile(
+                    key, percentile
+                )
+        return dict_key_summary
@@ -0,0 +1,38 @@
+from typing import Any
+
+from srai_openai.instrument.sink_call_event import SinkCallEvent
+from srai_openai.model.call_event import CallEvent
+
+
+class SinkCallEventSpan(SinkCallEvent):
+    # records every call as a finished span, tracer is an opentelemetry tracer (opentelemetry.trace.get_tracer)
+    # or anything with the same start_span interface, so opentelemetry is not a dependency of this package
+    # attributes follow the opentelemetry semantic conventions for generative ai where there is one
+
+    def __init__(self, tracer: Any) -> None:
+        self.tracer = tracer
+
+    def emit(self, call_event: CallEvent) -> None:
+        attributes = {
+            "gen_ai.system": "openai",
+            "gen_ai.operation.name": call_event.endpoint.split("/")[-1],
+            "gen_ai.request.model": call_event.model_id,
+            "gen_ai.usage.input_tokens": call_event.token_count_prompt,
+            "gen_ai.usage.output_tokens": call_event.token_count_completion,
+            "srai_openai.token_count_cached": call_event.token_count_cached,
+            "srai_openai.count_retry": call_event.count_retry,
+            "srai_openai.is_stream": call_event.is_stream,
+            "srai_openai.is_cached": call_event.is_cached,
+        }
+        if call_event.time_to_first_byte is not None:
+            attributes["srai_openai.time_to_first_byte"] = call_event.time_to_first_byte
+        if call_event.cost is not None:
+            attributes["srai_openai.cost"] = call_event.cost
+        if call_event.request_id is not None:
+            attributes["srai_openai.request_id"] = call_event.request_id
+        if call_event.error is not None:
+            attributes["error.type"] = call_event.error
+        time_start = int(call_event.time_start * 1e9)
+        time_end = time_start + int((call_event.time_wall or 0.0) * 1e9)
+        span = self.tracer.start_span(f"openai {call_event.endpoint}", start_time=time_start, attributes=attributes)
+        span.end(end_time=time_end)
@@ -0,0 +1,521 @@
+import base64
+import email.parser
+import email.policy
+import hashlib
+import io
+import itertools
+import json
+import random
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+def get_text_for_message(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content if part.get("type") == "text")
+
+
+def split_token(text: str) -> List[str]:
+    # words with their leading space stand in for tokens
+    return [token for token in text.replace(" ", "\0 ").split("\0") if token != ""]
+
+
+def create_logprob(token: str, logprob: float) -> dict:
+    return {"token": token, "logprob": logprob, "bytes": list(token.encode("utf-8"))}
+
+
+def create_audio_wav(time_audio: float, *, frequency: float = 440.0, sample_rate: int = 24000) -> bytes:
+    # a 16 bit mono sine tone
+    array_time = np.arange(int(time_audio * sample_rate)) / sample_rate
+    array_sample = (8000 * np.sin(2 * np.pi * frequency * array_time)).astype(np.int16)
+    bytes_io = io.BytesIO()
+    with wave.open(bytes_io, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(sample_rate)
+        file.writeframes(array_sample.tobytes())
+    return bytes_io.getvalue()
+
+
+def create_audio_mp3(time_audio: float) -> bytes:
+    # an id3 tag and silent frames, 128 kbps at 44.1 kHz has 417 byte frames of 26 ms
+    frame = b"\xff\xfb\x90\x64" + bytes(413)
+    return b"ID3\x04\x00\x00\x00\x00\x00\x00" + frame * max(1, int(time_audio / 0.026))
+
+
+class ServerOpenaiMock:
+    # a local stand-in for the openai api, for tests and benchmarks without network or costs
+    # serves chat completions, embeddings, files and batches with deterministic answers:
+    # - a chat completion echoes the last message, or calls the first offered tool after a user message
+    # - an embedding is a random unit vector seeded by the text
+    # - a streamed chat completion sends the same answer one word per chunk, with logprobs when asked
+    # - speech is a sine tone for wav and pcm and silent frames for the other formats, about 15 characters a second
+    # - a transcription has a word for every stretch of a wav file that is not silent
+    # - requests for a model id starting with "fail" answer 400
+    # time_latency plus up to time_latency_jitter delays every chat, embedding and audio response, time_chunk delays
+    # every next chunk of a streamed response, a batch completes time_batch seconds after it is created
+    # dict_status_code_rate answers that fraction of the chat, embedding and audio requests with that status code,
+    # for example {429: 0.05, 500: 0.01}
+
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        time_latency: float = 0.0,
+        time_latency_jitter: float = 0.0,
+        time_chunk: float = 0.0,
+        time_batch: float = 0.0,
+        dict_status_code_rate: Optional[Dict[int, float]] = None,
+        seed: int = 0,
+    ) -> None:
+        self.time_latency = time_latency
+        self.time_latency_jitter = time_latency_jitter
+        self.time_chunk = time_chunk
+        self.time_batch = time_batch
+        self.dict_status_code_rate = dict_status_code_rate or {}
+        self.random = random.Random(seed)
+        self.dict_file_id_file: Dict[str, dict] = {}
+        self.dict_file_id_content: Dict[str, bytes] = {}
+        self.dict_batch_id_batch: Dict[str, dict] = {}
+        self.dict_path_count_request: Dict[str, int] = {}
+        self.iterator_id = itertools.count()
+        self.lock = threading.Lock()
+        self.server_http = ThreadingHTTPServer((host, port), create_handler_class(self))
+        self.server_http.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_http.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "ServerOpenaiMock":
+        self.thread = threading.Thread(target=self.server_http.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server_http.shutdown()
+        self.server_http.server_close()
+
+    def __enter__(self) -> "ServerOpenaiMock":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def create_id(self, prefix: str) -> str:
+        return f"{prefix}-{next(self.iterator_id)}"
+
+    def create_message(self, body: dict) -> Tuple[dict, str]:
+        # the answer to a chat completion request and its finish reason
+        list_message = body["messages"]
+        message_last = list_message[-1]
+        if body.get("tools") and message_last["role"] == "user":
+            tool_call = {
+                "id": self.create_id("call"),
+                "type": "function",
+                "function": {"name": body["tools"][0]["function"]["name"], "arguments": "{}"},
+            }
+            return {"role": "assistant", "content": None, "tool_calls": [tool_call]}, "tool_calls"
+        list_token = split_token(f"echo: {get_text_for_message(message_last)}")
+        token_count_max = body.get("max_completion_tokens") or body.get("max_tokens")
+        if token_count_max is not None and token_count_max < len(list_token):
+            return {"role": "assistant", "content": "".join(list_token[:token_count_max])}, "length"
+        return {"role": "assistant", "content": "".join(list_token)}, "stop"
+
+    def create_logprobs(self, body: dict, content: Optional[str]) -> Optional[dict]:
+        # the answered token is the most likely one, followed by top_logprobs - 1 numbered alternatives
+        if not body.get("logprobs"):
+            return None
+        list_logprob = []
+        for token in split_token(content or ""):
+            logprob = create_logprob(token, -0.1)
+            list_top_logprob = [logprob]
+            for index in range(1, body.get("top_logprobs") or 0):
+                list_top_logprob.append(create_logprob(f"{token}_{index}", -0.1 - index))
+            list_logprob.append(dict(logprob, top_logprobs=list_top_logprob))
+        return {"content": list_logprob}
+
+    def create_chat_completion(self, body: dict) -> Tuple[int, dict]:
+        if len(body.get("messages") or []) == 0:
+            return 400, {"error": {"message": "messages is empty", "type": "invalid_request_error"}}
+        message, finish_reason = self.create_message(body)
+        completion = {
+            "id": self.create_id("chatcmpl"),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": finish_reason,
+                    "logprobs": self.create_logprobs(body, message["content"]),
+                }
+            ],
+            "usage": self.create_usage(body["messages"], message),
+        }
+        return 200, completion
+
+    def create_usage(self, list_message: List[dict], message: dict) -> dict:
+        token_count_prompt = sum(len(get_text_for_message(message)) // 4 + 1 for message in list_message)
+        token_count_completion = len(message["content"] or "") // 4 + 1
+        return {
+            "prompt_tokens": token_count_prompt,
+            "completion_tokens": token_count_completion,
+            "total_tokens": token_count_prompt + token_count_completion,
+        }
+
+    def create_chat_completion_chunks(self, body: dict) -> Iterator[dict]:
+        # the chunks of a streamed chat completion, its first chunk carries the role
+        message, finish_reason = self.create_message(body)
+        completion_id = self.create_id("chatcmpl")
+        created = int(time.time())
+
+        def create_chunk(delta: dict, finish_reason: Optional[str] = None, logprobs: Optional[dict] = None) -> dict:
+            choice = {"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": logprobs}
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": body["model"]}
+            return dict(chunk, choices=[choice])
+
+        if message["content"] is None:
+            for index, tool_call in enumerate(message["tool_calls"]):
+                delta_tool_call = dict(tool_call, index=index, function=dict(tool_call["function"], arguments=""))
+                delta = {"tool_calls": [delta_tool_call]}
+                if index == 0:
+                    delta["role"] = "assistant"
+                yield create_chunk(delta)
+                delta_function = {"arguments": tool_call["function"]["arguments"]}
+                yield create_chunk({"tool_calls": [{"index": index, "function": delta_function}]})
+        else:
+            logprobs = self.create_logprobs(body, message["content"])
+            for index, token in enumerate(split_token(message["content"])):
+                delta = {"content": token}
+                if index == 0:
+                    delta["role"] = "assistant"
+                logprobs_token = None if logprobs is None else {"content": [logprobs["content"][index]]}
+                yield create_chunk(delta, logprobs=logprobs_token)
+        yield create_chunk({}, finish_reason)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield dict(create_chunk({}), choices=[], usage=self.create_usage(body["messages"], message))
+
+    def create_embedding(self, body: dict) -> Tuple[int, dict]:
+        list_text = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimensions = body.get("dimensions") or 1536
+        list_data = []
+        for index, text in enumerate(list_text):
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+            vector /= np.linalg.norm(vector)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            list_data.append({"object": "embedding", "index": index, "embedding": embedding})
+        token_count = sum(len(text) // 4 + 1 for text in list_text)
+        embedding_response = {
+            "object": "list",
+            "data": list_data,
+            "model": body["model"],
+            "usage": {"prompt_tokens": token_count, "total_tokens": token_count},
+        }
+        return 200, embedding_response
+
+    def create_speech(self, body: dict) -> bytes:
+        time_audio = max(0.5, len(body["input"]) / 15)
+        response_format = body.get("response_format") or "mp3"
+        if response_format == "wav":
+            return create_audio_wav(time_audio)
+        if response_format == "pcm":
+            return create_audio_wav(time_audio)[44:]
+        if response_format == "mp3":
+            return create_audio_mp3(time_audio)
+        # opus, aac and flac get their format name repeated, enough for transport but not playable
+        return response_format.encode("ascii") * int(time_audio * 1000)
+
+    def create_transcription(self, content: bytes) -> dict:
+        # verbose json with word and segment timestamps, every stretch of a wav file that is not silent is a word
+        # named after its length in hundredths of a second, so the same sound gets the same word wherever it is cut
+        list_word = []
+        time_audio = 0.0
+        if content[:4] == b"RIFF":
+            with wave.open(io.BytesIO(content), "rb") as file:
+                sample_rate = file.getframerate()
+                count_sample = file.getnframes()
+                array_sample = np.frombuffer(file.readframes(count_sample), dtype=np.int16)
+            time_audio = count_sample / sample_rate
+            count_sample_frame = sample_rate // 100
+            count_frame = count_sample // count_sample_frame
+            array_frame = array_sample[: count_frame * count_sample_frame].reshape(count_frame, -1).astype(np.float64)
+            array_is_sound = np.concatenate([[False], 100 < np.sqrt(np.mean(array_frame**2, axis=1)), [False]])
+            array_index_change = np.flatnonzero(array_is_sound[1:] != array_is_sound[:-1])
+            for index_start, index_end in zip(array_index_change[::2], array_index_change[1::2]):
+                word = f"w{index_end - index_start}"
+                list_word.append({"word": word, "start": index_start / 100, "end": index_end / 100})
+        list_segment = [
+            {"id": index, "start": word["start"], "end": word["end"], "text": f" {word['word']}"}
+            for index, word in enumerate(list_word)
+        ]
+        text = " ".join(word["word"] for word in list_word)
+        return {
+            "task": "transcribe",
+            "language": "english",
+            "duration": time_audio,
+            "text": text,
+            "words": list_word,
+            "segments": list_segment,
+        }
+
+    def get_status_code_error(self) -> Optional[int]:
+        # draws the injected error for a request, if any
+        with self.lock:
+            value = self.random.random()
+        for status_code, rate in self.dict_status_code_rate.items():
+            if value < rate:
+                return status_code
+            value -= rate
+        return None
+
+    def get_time_latency(self) -> float:
+        with self.lock:
+            return self.time_latency + self.random.uniform(0, self.time_latency_jitter)
+
+    def create_response(self, path: str, body: dict) -> Tuple[int, dict]:
+        if str(body.get("model", "")).startswith("fail"):
+            return 400, {"error": {"message": f"model {body.get('model')} fails", "type": "invalid_request_error"}}
+        if path == "/v1/chat/completions":
+            return self.create_chat_completion(body)
+        if path == "/v1/embeddings":
+            return self.create_embedding(body)
+        return 404, {"error": {"message": f"unknown url {path}", "type": "invalid_request_error"}}
+
+    def create_file(self, file_name: str, purpose: str, content: bytes) -> dict:
+        with self.lock:
+            return self.save_file(file_name, purpose, content)
+
+    def save_file(self, file_name: str, purpose: str, content: bytes) -> dict:
+        # callers hold the lock
+        file_object = {
+            "id": self.create_id("file"),
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": file_name,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        self.dict_file_id_file[file_object["id"]] = file_object
+        self.dict_file_id_content[file_object["id"]] = content
+        return file_object
+
+    def create_batch(self, body: dict) -> Tuple[int, dict]:
+        if body.get("input_file_id") not in self.dict_file_id_content:
+            return 404, {"error": {"message": "input file not found", "type": "invalid_request_error"}}
+        batch = {
+            "id": self.create_id("batch"),
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "completion_window": body["completion_window"],
+            "status": "in_progress",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self.lock:
+            self.dict_batch_id_batch[batch["id"]] = dict(batch, time_created=time.monotonic())
+        return 200, batch
+
+    def run_batch(self, batch: dict) -> None:
+        # answers all requests of the batch at once, callers hold the lock
+        list_line_output: List[str] = []
+        list_line_error: List[str] = []
+        for line in self.dict_file_id_content[batch["input_file_id"]].decode("utf-8").splitlines():
+            if line.strip() == "":
+                continue
+            line_dict = json.loads(line)
+            status_code, body = self.create_response(line_dict["url"], line_dict["body"])
+            line_output = {
+                "id": self.create_id("batch_req"),
+                "custom_id": line_dict["custom_id"],
+                "response": {"status_code": status_code, "request_id": self.create_id("req"), "body": body},
+                "error": None,
+            }
+            if status_code == 200:
+                list_line_output.append(json.dumps(line_output))
+            else:
+                list_line_error.append(json.dumps(line_output))
+        for list_line, key in [(list_line_output, "output_file_id"), (list_line_error, "error_file_id")]:
+            if 0 < len(list_line):
+                content = ("\n".join(list_line) + "\n").encode("utf-8")
+                file_object = self.save_file(f"{batch['id']}_{key}.jsonl", "batch_output", content)
+                batch[key] = file_object["id"]
+        count_total = len(list_line_output) + len(list_line_error)
+        batch["request_counts"] = {
+            "total": count_total,
+            "completed": len(list_line_output),
+            "failed": len(list_line_error),
+        }
+        batch["status"] = "completed"
+
+    def retrieve_batch(self, batch_id: str) -> Tuple[int, dict]:
+        with self.lock:
+            batch = self.dict_batch_id_batch.get(batch_id)
+            if batch is None:
+                return 404, {"error": {"message": "batch not found", "type": "invalid_request_error"}}
+            if batch["status"] == "in_progress" and self.time_batch <= time.monotonic() - batch["time_created"]:
+                self.run_batch(batch)
+            return 200, {key: value for key, value in batch.items() if key != "time_created"}
+
+
+def parse_multipart(content_type: str, content: bytes) -> Dict[str, Tuple[Optional[str], bytes]]:
+    # field name to file name and value of a multipart/form-data body
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + content
+    )
+    dict_name_field = {}
+    for part in message.iter_parts():  # type: ignore
+        name = part.get_param("name", header="content-disposition")
+        dict_name_field[name] = (part.get_filename(), part.get_payload(decode=True))
+    return dict_name_field
+
+
+def create_handler_class(server_openai_mock: ServerOpenaiMock) -> type:
+
+    class HandlerOpenaiMock(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body are written separately, with nagle the body waits for the ack of the headers
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def send_bytes(self, status_code: int, content: bytes, content_type: str, **dict_header: str) -> None:
+            self.send_response(status_code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(content)))
+            self.send_header("x-request-id", server_openai_mock.create_id("req"))
+            for name, value in dict_header.items():
+                self.send_header(name.replace("_", "-"), value)
+            self.end_headers()
+            self.wfile.write(content)
+
+        def send_json(self, status_code: int, body: dict, **dict_header: str) -> None:
+            self.send_bytes(status_code, json.dumps(body).encode("utf-8"), "application/json", **dict_header)
+
+        def send_error_injected(self, status_code: int) -> None:
+            error = {"message": f"injected error {status_code}", "type": "server_error"}
+            if status_code == 429:
+                self.send_json(429, {"error": dict(error, type="rate_limit_exceeded")}, retry_after="0.1")
+            else:
+                self.send_json(status_code, {"error": error})
+
+        def send_iterable_content(self, iterable_content: Iterator[bytes], content_type: str) -> None:
+            # chunked transfer encoding, every content is sent as soon as it is there
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.send_header("x-request-id", server_openai_mock.create_id("req"))
+            self.end_headers()
+            for index, content in enumerate(iterable_content):
+                if 0 < index and 0 < server_openai_mock.time_chunk:
+                    time.sleep(server_openai_mock.time_chunk)
+                self.wfile.write(f"{len(content):x}\r\n".encode("ascii") + content + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        def send_chat_completion_chunks(self, body: dict) -> None:
+            iterator_chunk = server_openai_mock.create_chat_completion_chunks(body)
+            list_content = [f"data: {json.dumps(chunk)}\n\n".encode("utf-8") for chunk in iterator_chunk]
+            self.send_iterable_content(iter(list_content + [b"data: [DONE]\n\n"]), "text/event-stream")
+
+        def send_speech(self, body: dict) -> None:
+            content = server_openai_mock.create_speech(body)
+            count_byte_chunk = 4096
+            iterable_content = (content[i : i + count_byte_chunk] for i in range(0, len(content), count_byte_chunk))
+            self.send_iterable_content(iterable_content, "application/octet-stream")
+
+        def read_body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def count_request(self, path: str) -> None:
+            with server_openai_mock.lock:
+                dict_path_count_request = server_openai_mock.dict_path_count_request
+                dict_path_count_request[path] = dict_path_count_request.get(path, 0) + 1
+
+        def do_POST(self) -> None:
+            path = self.path.split("?")[0]
+            self.count_request(path)
+            content = self.read_body()
+            if path == "/v1/files":
+                dict_name_field = parse_multipart(self.headers["Content-Type"], content)
+                file_name, content_file = dict_name_field["file"]
+                purpose = dict_name_field["purpose"][1].decode("utf-8")
+                self.send_json(200, server_openai_mock.create_file(file_name or "file", purpose, content_file))
+                return
+            if path == "/v1/batches":
+                self.send_json(*server_openai_mock.create_batch(json.loads(content)))
+                return
+            time_latency = server_openai_mock.get_time_latency()
+            if 0 < time_latency:
+                time.sleep(time_latency)
+            status_code_error = server_openai_mock.get_status_code_error()
+            if status_code_error is not None:
+                self.send_error_injected(status_code_error)
+                return
+            if path == "/v1/audio/transcriptions":
+                dict_name_field = parse_multipart(self.headers["Content-Type"], content)
+                transcription = server_openai_mock.create_transcription(dict_name_field["file"][1])
+                response_format = dict_name_field.get("response_format", (None, b"json"))[1].decode("utf-8")
+                if response_format == "text":
+                    self.send_bytes(200, transcription["text"].encode("utf-8"), "text/plain")
+                elif response_format == "json":
+                    self.send_json(200, {"text": transcription["text"]})
+                else:
+                    self.send_json(200, transcription)
+                return
+            body = json.loads(content)
+            if path == "/v1/audio/speech":
+                self.send_speech(body)
+            elif path == "/v1/chat/completions" and body.get("stream"):
+                # errors are answered before the stream starts, like the api does
+                status_code, response = server_openai_mock.create_response(path, body)
+                if status_code == 200:
+                    self.send_chat_completion_chunks(body)
+                else:
+                    self.send_json(status_code, response)
+            else:
+                self.send_json(*server_openai_mock.create_response(path, body))
+
+        def do_GET(self) -> None:
+            path = self.path.split("?")[0]
+            self.count_request(path)
+            list_part = path.strip("/").split("/")
+            if len(list_part) == 4 and list_part[:2] == ["v1", "files"] and list_part[3] == "content":
+                content = server_openai_mock.dict_file_id_content.get(list_part[2])
+                if content is None:
+                    self.send_json(404, {"error": {"message": "file not found", "type": "invalid_request_error"}})
+                else:
+                    self.send_bytes(200, content, "application/octet-stream")
+                return
+            if len(list_part) == 3 and list_part[:2] == ["v1", "batches"]:
+                self.send_json(*server_openai_mock.retrieve_batch(list_part[2]))
+                return
+            self.send_json(404, {"error": {"message": f"unknown url {path}", "type": "invalid_request_error"}})
+
+    return HandlerOpenaiMock
+
+
+if __name__ == "__main__":
+    with ServerOpenaiMock(port=8765) as server_openai_mock:
+        print(f"serving on {server_openai_mock.base_url}")
+        server_openai_mock.thread.join()  # type: ignore
@@ -0,0 +1,118 @@
+import json
+import os
+from typing import List, Optional
+
+FILE_NAME_BATCH_JOB = "batch_job.json"
+LIST_STATUS_BATCH_DONE = ["completed", "failed", "expired", "cancelled"]
+
+
+class BatchJobPart:
+    # one input file of a job and the batch that runs it, items index_item_start up to index_item_end
+
+    def __init__(
+        self,
+        index_part: int,
+        index_item_start: int,
+        index_item_end: int,
+        *,
+        file_id_input: Optional[str] = None,
+        batch_id: Optional[str] = None,
+        status: Optional[str] = None,
+        file_id_output: Optional[str] = None,
+        file_id_error: Optional[str] = None,
+        is_downloaded: bool = False,
+    ) -> None:
+        self.index_part = index_part
+        self.index_item_start = index_item_start
+        self.index_item_end = index_item_end
+        self.file_id_input = file_id_input
+        self.batch_id = batch_id
+        self.status = status
+        self.file_id_output = file_id_output
+        self.file_id_error = file_id_error
+        self.is_downloaded = is_downloaded
+
+    @property
+    def file_name_input(self) -> str:
+        return f"input_{self.index_part:04d}.jsonl"
+
+    @property
+    def file_name_output(self) -> str:
+        return f"output_{self.index_part:04d}.jsonl"
+
+    @property
+    def file_name_error(self) -> str:
+        return f"error_{self.index_part:04d}.jsonl"
+
+    @property
+    def is_done(self) -> bool:
+        return self.status in LIST_STATUS_BATCH_DONE
+
+    def to_dict(self) -> dict:
+        return {
+            "index_part": self.index_part,
+            "index_item_start": self.index_item_start,
+            "index_item_end": self.index_item_end,
+            "file_id_input": self.file_id_input,
+            "batch_id": self.batch_id,
+            "status": self.status,
+            "file_id_output": self.file_id_output,
+            "file_id_error": self.file_id_error,
+            "is_downloaded": self.is_downloaded,
+        }
+
+    @staticmethod
+    def from_dict(batch_job_part_dict: dict) -> "BatchJobPart":
+        return BatchJobPart(
+            batch_job_part_dict["index_part"],
+            batch_job_part_dict["index_item_start"],
+            batch_job_part_dict["index_item_end"],
+            file_id_input=batch_job_part_dict["file_id_input"],
+            batch_id=batch_job_part_dict["batch_id"],
+            status=batch_job_part_dict["status"],
+            file_id_output=batch_job_part_dict["file_id_output"],
+            file_id_error=batch_job_part_dict["file_id_error"],
+            is_downloaded=batch_job_part_dict["is_downloaded"],
+        )
+
+
+class BatchJob:
+    # state of a batch api job, kept in path_dir next to its input and output files
+    # it is saved after every step so an interrupted job continues where it stopped
+
+    def __init__(self, path_dir: str, endpoint: str, count_item: int, list_part: List[BatchJobPart]) -> None:
+        self.path_dir = path_dir
+        self.endpoint = endpoint
+        self.count_item = count_item
+        self.list_part = list_part
+
+    @property
+    def is_done(self) -> bool:
+        return all(part.is_done and part.is_downloaded for part in self.list_part)
+
+    def get_path_file(self, file_name: str) -> str:
+        return os.path.join(self.path_dir, file_name)
+
+    def to_dict(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "count_item": self.count_item,
+            "list_part": [part.to_dict() for part in self.list_part],
+        }
+
+    def save(self) -> None:
+        # written to a temporary file first so a crash never leaves a half written state
+        path_file = self.get_path_file(FILE_NAME_BATCH_JOB)
+        with open(path_file + ".tmp", "w") as file:
+            json.dump(self.to_dict(), file, indent=4)
+        os.replace(path_file + ".tmp", path_file)
+
+    @staticmethod
+    def load(path_dir: str) -> Optional["BatchJob"]:
+        path_file = os.path.join(path_dir, FILE_NAME_BATCH_JOB)
+        if not os.path.isfile(path_file):
+            return None
+        with open(path_file, "r") as file:
+            batch_job_dict = json.load(file)
+        list_part = [BatchJobPart.from_dict(part_dict) for part_dict in batch_job_dict["list_part"]]
+        return BatchJob(path_dir, batch_job_dict["endpoint"], batch_job_dict["count_item"], list_part)
@@ -0,0 +1,122 @@
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+ENDPOINT_CHAT_COMPLETION = "/v1/chat/completions"
+ENDPOINT_EMBEDDING = "/v1/embeddings"
+
+# usd per million prompt tokens, cached prompt tokens and completion tokens
+DICT_MODEL_ID_PREFIX_COST: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o-mini": (0.15, 0.075, 0.6),
+    "gpt-4o-2024-05-13": (5.0, 5.0, 15.0),
+    "gpt-4o": (2.5, 1.25, 10.0),
+    "gpt-4-turbo": (10.0, 10.0, 30.0),
+    "gpt-4-0125-preview": (10.0, 10.0, 30.0),
+    "gpt-4-1106-preview": (10.0, 10.0, 30.0),
+    "gpt-4-32k": (60.0, 60.0, 120.0),
+    "gpt-4": (30.0, 30.0, 60.0),
+    "gpt-3.5-turbo": (0.5, 0.5, 1.5),
+    "text-embedding-3-small": (0.02, 0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.13, 0.0),
+    "text-embedding-ada-002": (0.1, 0.1, 0.0),
+}
+
+
+def get_cost(
+    model_id: str,
+    token_count_prompt: int,
+    token_count_cached: int,
+    token_count_completion: int,
+    dict_model_id_prefix_cost: Mapping[str, Tuple[float, float, float]] = DICT_MODEL_ID_PREFIX_COST,
+) -> Optional[float]:
+    # estimated cost in usd, None for models without a price, the longest prefix wins
+    for prefix in sorted(dict_model_id_prefix_cost, key=len, reverse=True):
+        if model_id.startswith(prefix):
+            cost_prompt, cost_cached, cost_completion = dict_model_id_prefix_cost[prefix]
+            cost = (token_count_prompt - token_count_cached) * cost_prompt
+            cost += token_count_cached * cost_cached + token_count_completion * cost_completion
+            return cost / 1000000
+    return None
+
+
+class CallEvent:
+    # one api call as seen by the client, times are in seconds from the start of the call
+    # so they include waiting for the rate limiter, retries and hedged duplicates
+
+    def __init__(self, endpoint: str, model_id: str, *, is_stream: bool = False) -> None:
+        self.endpoint = endpoint
+        self.model_id = model_id
+        self.is_stream = is_stream
+        self.time_start = time.time()
+        self.time_start_perf = time.perf_counter()
+        self.time_wall: Optional[float] = None
+        self.time_to_first_byte: Optional[float] = None
+        self.token_count_prompt = 0
+        self.token_count_cached = 0
+        self.token_count_completion = 0
+        self.count_attempt = 0
+        self.is_cached = False
+        self.request_id: Optional[str] = None
+        self.error: Optional[str] = None
+        self.cost: Optional[float] = None
+
+    @property
+    def count_retry(self) -> int:
+        # retries and hedged duplicates
+        return max(0, self.count_attempt - 1)
+
+    def add_response_headers(self, headers: Mapping[str, str]) -> None:
+        # the first attempt to get its response headers sets the time to first byte
+        if self.time_to_first_byte is None:
+            self.time_to_first_byte = time.perf_counter() - self.time_start_perf
+            self.request_id = headers.get("x-request-id")
+
+    def set_usage(self, usage: Any) -> None:
+        # usage is a dict or the usage of an sdk response
+        if usage is None:
+            return
+        if not isinstance(usage, dict):
+            usage = usage.model_dump()
+        self.token_count_prompt = usage.get("prompt_tokens") or 0
+        self.token_count_completion = usage.get("completion_tokens") or 0
+        prompt_tokens_details = usage.get("prompt_tokens_details") or {}
+        self.token_count_cached = prompt_tokens_details.get("cached_tokens") or 0
+
+    def finish(
+        self,
+        dict_model_id_prefix_cost: Mapping[str, Tuple[float, float, float]],
+        *,
+        usage: Any = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        self.time_wall = time.perf_counter() - self.time_start_perf
+        self.set_usage(usage)
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        if self.is_cached:
+            self.cost = 0.0
+        else:
+            self.cost = get_cost(
+                self.model_id,
+                self.token_count_prompt,
+                self.token_count_cached,
+                self.token_count_completion,
+                dict_model_id_prefix_cost,
+            )
+
+    def to_dict(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "model_id": self.model_id,
+            "is_stream": self.is_stream,
+            "time_start": self.time_start,
+            "time_wall": self.time_wall,
+            "time_to_first_byte": self.time_to_first_byte,
+            "token_count_prompt": self.token_count_prompt,
+            "token_count_cached": self.token_count_cached,
+            "token_count_completion": self.token_count_completion,
+            "count_retry": self.count_retry,
+            "is_cached": self.is_cached,
+            "request_id": self.request_id,
+            "error": self.error,
+            "cost": self.cost,
+        }
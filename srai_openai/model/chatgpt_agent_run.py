@@ -0,0 +1,69 @@
+from typing import List, Optional
+
+from srai_openai.model.prompt_config import PromptConfig
+
+
+class ChatgptAgentRound:
+    # one completion of an agent run and the tool calls it requested, times are in seconds
+
+    def __init__(self, index_round: int) -> None:
+        self.index_round = index_round
+        self.time_completion = 0.0
+        self.time_to_first_token: Optional[float] = None
+        self.time_tool = 0.0
+        self.token_count_prompt = 0
+        self.token_count_completion = 0
+        self.count_tool_call = 0
+        self.is_cached = False
+
+    def to_dict(self) -> dict:
+        return {
+            "index_round": self.index_round,
+            "time_completion": self.time_completion,
+            "time_to_first_token": self.time_to_first_token,
+            "time_tool": self.time_tool,
+            "token_count_prompt": self.token_count_prompt,
+            "token_count_completion": self.token_count_completion,
+            "count_tool_call": self.count_tool_call,
+            "is_cached": self.is_cached,
+        }
+
+
+class ChatgptAgentRun:
+    STOP_REASON_ANSWER = "answer"
+    STOP_REASON_ROUND_BUDGET = "round_budget"
+    STOP_REASON_TOKEN_BUDGET = "token_budget"
+    STOP_REASON_TIME_BUDGET = "time_budget"
+
+    def __init__(self, prompt_config_input: PromptConfig) -> None:
+        self.prompt_config_input = prompt_config_input
+        self.prompt_config_result = prompt_config_input
+        self.list_round: List[ChatgptAgentRound] = []
+        self.stop_reason: Optional[str] = None
+        self.time_total = 0.0
+
+    @property
+    def is_answered(self) -> bool:
+        return self.stop_reason == ChatgptAgentRun.STOP_REASON_ANSWER
+
+    @property
+    def token_count_total(self) -> int:
+        return sum(round.token_count_prompt + round.token_count_completion for round in self.list_round)
+
+    @property
+    def time_completion(self) -> float:
+        return sum(round.time_completion for round in self.list_round)
+
+    @property
+    def time_tool(self) -> float:
+        return sum(round.time_tool for round in self.list_round)
+
+    def to_dict(self) -> dict:
+        return {
+            "stop_reason": self.stop_reason,
+            "time_total": self.time_total,
+            "time_completion": self.time_completion,
+            "time_tool": self.time_tool,
+            "token_count_total": self.token_count_total,
+            "list_round": [round.to_dict() for round in self.list_round],
+        }
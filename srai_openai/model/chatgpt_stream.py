@@ -0,0 +1,262 @@
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from openai.types.chat.chat_completion_chunk import ChatCompletionChunk
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+
+from srai_openai.model.prompt_config import PromptConfig
+
+
+class ChatgptDelta:
+    TEXT = "text"
+    TOOL_CALL = "tool_call"
+
+    def __init__(
+        self,
+        delta_type: str,
+        text: str,
+        *,
+        index_tool_call: Optional[int] = None,
+        tool_call_id: Optional[str] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        # for tool calls text is the next fragment of the json arguments, id and name are only set on the first fragment
+        self.delta_type = delta_type
+        self.text = text
+        self.index_tool_call = index_tool_call
+        self.tool_call_id = tool_call_id
+        self.name = name
+
+
+class ChatgptChunkPrefetched:
+    # a chunk stream of which the first chunk was already read, streams are hedged and retried up to their first chunk
+    # close returns what the close of the wrapped stream returns, so it is awaited for async streams
+
+    def __init__(self, chunk_first: Optional[ChatCompletionChunk], iterable_chunk: Any) -> None:
+        self.chunk_first = chunk_first
+        self.iterable_chunk = iterable_chunk
+
+    @staticmethod
+    def create(iterable_chunk: Any) -> "ChatgptChunkPrefetched":
+        try:
+            return ChatgptChunkPrefetched(next(iterable_chunk, None), iterable_chunk)
+        except BaseException:
+            iterable_chunk.close()
+            raise
+
+    @staticmethod
+    async def create_async(iterable_chunk: Any) -> "ChatgptChunkPrefetched":
+        # also closes the stream when the attempt is cancelled while waiting for the first chunk
+        try:
+            chunk_first = await iterable_chunk.__anext__()
+        except StopAsyncIteration:
+            chunk_first = None
+        except BaseException:
+            await iterable_chunk.close()
+            raise
+        return ChatgptChunkPrefetched(chunk_first, iterable_chunk)
+
+    def __iter__(self) -> Iterator[ChatCompletionChunk]:
+        if self.chunk_first is not None:
+            yield self.chunk_first
+        yield from self.iterable_chunk
+
+    async def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]:
+        if self.chunk_first is not None:
+            yield self.chunk_first
+        async for chunk in self.iterable_chunk:
+            yield chunk
+
+    def close(self) -> Any:
+        return self.iterable_chunk.close()
+
+
+class ChatgptStream:
+    # wraps a streamed completion, iterating it (sync or async) yields deltas as they arrive
+    # once the stream is exhausted prompt_config_result holds the input with the assembled completion appended
+    # callback_close gets the stream once it closes, whether it was read to the end, failed or was abandoned
+
+    def __init__(
+        self,
+        prompt_config_input: PromptConfig,
+        iterable_chunk: Any,
+        *,
+        time_start: Optional[float] = None,
+        callback_complete: Optional[Callable[[str, ChatCompletionMessage], None]] = None,
+        callback_close: Optional[Callable[["ChatgptStream"], None]] = None,
+        is_replay: bool = False,
+    ) -> None:
+        if time_start is None:
+            time_start = time.perf_counter()
+        self.prompt_config_input = prompt_config_input
+        self.iterable_chunk = iterable_chunk
+        self.time_start = time_start
+        self.callback_complete = callback_complete
+        self.callback_close = callback_close
+        self.is_replay = is_replay
+        self.list_text: List[str] = []
+        self.dict_index_tool_call: Dict[int, dict] = {}
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[dict] = None
+        self.count_delta = 0
+        self.time_first_token: Optional[float] = None
+        self.time_end: Optional[float] = None
+        self.prompt_config_result: Optional[PromptConfig] = None
+
+    @staticmethod
+    def create_for_message(
+        prompt_config_input: PromptConfig, finish_reason: str, message: ChatCompletionMessage
+    ) -> "ChatgptStream":
+        # replays a complete message, for example a cache hit, as a stream of a single chunk
+        list_tool_call = []
+        for index, tool_call in enumerate(message.tool_calls or []):
+            list_tool_call.append(
+                {
+                    "index": index,
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments},
+                }
+            )
+        delta: Dict[str, Any] = {"role": "assistant", "content": message.content}
+        if 0 < len(list_tool_call):
+            delta["tool_calls"] = list_tool_call
+        chunk = ChatCompletionChunk.model_validate(
+            {
+                "id": "replay",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": prompt_config_input.model_id,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+        )
+        return ChatgptStream(prompt_config_input, [chunk], is_replay=True)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.list_text)
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        if self.time_first_token is None:
+            return None
+        return self.time_first_token - self.time_start
+
+    @property
+    def time_total(self) -> Optional[float]:
+        if self.time_end is None:
+            return None
+        return self.time_end - self.time_start
+
+    def add_chunk(self, chunk: ChatCompletionChunk) -> List[ChatgptDelta]:
+        if chunk.usage is not None:
+            self.usage = chunk.usage.model_dump()
+        if len(chunk.choices) == 0:
+            return []
+        choice = chunk.choices[0]
+        if choice.finish_reason is not None:
+            self.finish_reason = choice.finish_reason
+        list_delta = []
+        if choice.delta.content:
+            self.list_text.append(choice.delta.content)
+            list_delta.append(ChatgptDelta(ChatgptDelta.TEXT, choice.delta.content))
+        for tool_call_delta in choice.delta.tool_calls or []:
+            # tool calls arrive as fragments that share an index, the id and name only on the first one
+            tool_call = self.dict_index_tool_call.setdefault(
+                tool_call_delta.index, {"id": None, "type": "function", "function": {"name": "", "arguments": ""}}
+            )
+            name = None
+            arguments = ""
+            if tool_call_delta.id is not None:
+                tool_call["id"] = tool_call_delta.id
+            if tool_call_delta.function is not None:
+                name = tool_call_delta.function.name
+                arguments = tool_call_delta.function.arguments or ""
+                if name is not None:
+                    tool_call["function"]["name"] += name
+                tool_call["function"]["arguments"] += arguments
+            list_delta.append(
+                ChatgptDelta(
+                    ChatgptDelta.TOOL_CALL,
+                    arguments,
+                    index_tool_call=tool_call_delta.index,
+                    tool_call_id=tool_call_delta.id,
+                    name=name,
+                )
+            )
+        if self.time_first_token is None and 0 < len(list_delta):
+            self.time_first_token = time.perf_counter()
+        self.count_delta += len(list_delta)
+        return list_delta
+
+    def create_message(self) -> ChatCompletionMessage:
+        message: Dict[str, Any] = {"role": "assistant", "content": self.text}
+        if 0 < len(self.dict_index_tool_call):
+            message["tool_calls"] = [self.dict_index_tool_call[index] for index in sorted(self.dict_index_tool_call)]
+            if len(self.list_text) == 0:
+                message["content"] = None
+        return ChatCompletionMessage.model_validate(message)
+
+    def finish(self) -> PromptConfig:
+        self.time_end = time.perf_counter()
+        if self.finish_reason is None:
+            raise Exception("stream ended without a finish reason")
+        message = self.create_message()
+        if self.callback_complete is not None:
+            self.callback_complete(self.finish_reason, message)
+        if self.finish_reason == "tool_calls":
+            self.prompt_config_result = self.prompt_config_input.append_tool_call_request(message)
+        else:
+            self.prompt_config_result = self.prompt_config_input.append_assistent_message(message)
+        return self.prompt_config_result
+
+    def __iter__(self) -> Iterator[ChatgptDelta]:
+        try:
+            for chunk in self.iterable_chunk:
+                yield from self.add_chunk(chunk)
+        finally:
+            if hasattr(self.iterable_chunk, "close"):
+                self.iterable_chunk.close()
+            self.end()
+        self.finish()
+
+    async def __aiter__(self) -> AsyncIterator[ChatgptDelta]:
+        try:
+            if hasattr(self.iterable_chunk, "__aiter__"):
+                async for chunk in self.iterable_chunk:
+                    for delta in self.add_chunk(chunk):
+                        yield delta
+            else:
+                for chunk in self.iterable_chunk:
+                    for delta in self.add_chunk(chunk):
+                        yield delta
+        finally:
+            if hasattr(self.iterable_chunk, "close"):
+                await self.iterable_chunk.close()
+            self.end()
+        self.finish()
+
+    def end(self) -> None:
+        if self.callback_close is not None:
+            callback_close = self.callback_close
+            self.callback_close = None
+            callback_close(self)
+
+    def close(self) -> Any:
+        # for streams that are not read to the end, awaited for async streams
+        self.end()
+        if not hasattr(self.iterable_chunk, "close"):
+            return None
+        return self.iterable_chunk.close()
+
+    def until_done(self, callback_delta: Optional[Callable[[ChatgptDelta], None]] = None) -> PromptConfig:
+        for delta in self:
+            if callback_delta is not None:
+                callback_delta(delta)
+        return self.prompt_config_result  # type: ignore
+
+    async def until_done_async(self, callback_delta: Optional[Callable[[ChatgptDelta], None]] = None) -> PromptConfig:
+        async for delta in self:
+            if callback_delta is not None:
+                callback_delta(delta)
+        return self.prompt_config_result  # type: ignore
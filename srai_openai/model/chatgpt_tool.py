@@ -1,9 +1,19 @@
+import asyncio
+import dataclasses
 import inspect
+import json
+import weakref
+from concurrent.futures import Future
 from enum import Enum
-from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+from threading import Lock
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, Union, get_args, get_origin, get_type_hints
 
 import docstring_parser
 
+from srai_openai.cache.cache_lru import CacheLru
+
+MISSING = object()
+
 
 class ChatgptParameter:
     def __init__(
@@ -13,6 +23,9 @@ class ChatgptParameter:
         is_required: bool,
         description: Optional[str] = None,
         list_enum_value: Optional[List[str]] = None,
+        *,
+        dict_schema: Optional[dict] = None,
+        coerce: Optional[Callable[[Any, str], Any]] = None,
     ) -> None:
         self.name = name
         self.type = type
@@ -20,6 +33,9 @@ class ChatgptParameter:
 
         self.description = description
         self.list_enum_value = list_enum_value
+        # full json schema for nested types and the precompiled validator that converts json values to python values
+        self.dict_schema = dict_schema
+        self.coerce = coerce
 
 
 class ChatgptTool:
@@ -30,20 +46,136 @@ class ChatgptTool:
         name: str,
         description: str,
         list_parameter: List[ChatgptParameter],
+        *,
+        timeout: Optional[float] = None,
+        cache_lru: Optional[CacheLru] = None,
     ) -> None:
         self.callable = callable
         self.name = name
         self.description = description
         self.list_parameter = list_parameter
         self.list_secret_key = []
+        # seconds a single call may take before its result is replaced by an error, None uses the client default
+        self.timeout = timeout
+        self.is_async = inspect.iscoroutinefunction(callable)
+        # memoized results, None disables memoization, the cache can be shared because keys include the tool name
+        self.cache_lru = cache_lru
+        # calls in flight per key, concurrent identical calls wait for the first one instead of running again
+        self.lock = Lock()
+        self.dict_key_future: Dict[str, Future] = {}
+        self.count_hit = 0
+        self.count_miss = 0
+        self.tool_dict: Optional[dict] = None
+        self.tool_json: Optional[str] = None
+        self.dict_parameter = {parameter.name: parameter for parameter in list_parameter}
 
     def __call__(self, *args: Any, **kwds: Any) -> Any:
         return self.call(*args, **kwds)
 
+    def create_key(self, args: tuple, kwds: dict) -> str:
+        content = json.dumps([list(args), kwds], sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return f"{self.name}:{content}"
+
+    def begin_call(self, key: str) -> Tuple[Any, Optional[Future], bool]:
+        # returns the memoized result, or the future of the call in flight and whether this caller has to run it
+        result = self.cache_lru.get(key, MISSING)  # type: ignore
+        with self.lock:
+            if result is not MISSING:
+                self.count_hit += 1
+                return result, None, False
+            future = self.dict_key_future.get(key)
+            if future is not None:
+                self.count_hit += 1
+                return MISSING, future, False
+            self.count_miss += 1
+            future = Future()
+            # a running future can not be cancelled by a waiter that gives up
+            future.set_running_or_notify_cancel()
+            self.dict_key_future[key] = future
+            return MISSING, future, True
+
+    def end_call(self, key: str, future: Future, result: Any, error: Optional[BaseException]) -> None:
+        # errors are passed to the waiters but not memoized
+        if error is None:
+            self.cache_lru.set(key, result)  # type: ignore
+        with self.lock:
+            del self.dict_key_future[key]
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
     def call(self, *args, **kwds) -> Any:
-        return self.callable(*args, **kwds)
+        if self.is_async:
+            return asyncio.run(self.call_async(*args, **kwds))
+        if self.cache_lru is None:
+            return self.callable(*args, **kwds)
+        key = self.create_key(args, kwds)
+        result, future, is_owner = self.begin_call(key)
+        if future is None:
+            return result
+        if not is_owner:
+            return future.result()
+        try:
+            result = self.callable(*args, **kwds)
+        except BaseException as error:
+            self.end_call(key, future, None, error)
+            raise
+        self.end_call(key, future, result, None)
+        return result
+
+    async def call_callable_async(self, *args, **kwds) -> Any:
+        # sync callables run in a worker thread so they do not block the event loop
+        if self.is_async:
+            return await self.callable(*args, **kwds)
+        return await asyncio.to_thread(self.callable, *args, **kwds)
+
+    async def call_async(self, *args, **kwds) -> Any:
+        if self.cache_lru is None:
+            return await self.call_callable_async(*args, **kwds)
+        key = self.create_key(args, kwds)
+        result, future, is_owner = self.begin_call(key)
+        if future is None:
+            return result
+        if not is_owner:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await self.call_callable_async(*args, **kwds)
+        except asyncio.CancelledError:
+            self.end_call(key, future, None, Exception(f"call to tool {self.name} was cancelled"))
+            raise
+        except BaseException as error:
+            self.end_call(key, future, None, error)
+            raise
+        self.end_call(key, future, result, None)
+        return result
+
+    def parse_arguments(self, arguments: str) -> dict:
+        # validates the json arguments from the model against the parameters and converts them to python values
+        dict_argument = json.loads(arguments)
+        if not isinstance(dict_argument, dict):
+            raise ValueError("tool arguments are not a json object")
+        for name in dict_argument:
+            if name not in self.dict_parameter:
+                raise ValueError(f"{name}: unexpected argument")
+        for parameter in self.list_parameter:
+            if parameter.name not in dict_argument:
+                if parameter.is_required:
+                    raise ValueError(f"{parameter.name}: missing required argument")
+                continue
+            if parameter.coerce is not None:
+                dict_argument[parameter.name] = parameter.coerce(dict_argument[parameter.name], parameter.name)
+        return dict_argument
+
+    def to_tool_json(self) -> str:
+        if self.tool_json is None:
+            self.tool_json = json.dumps(self.to_tool_dict())
+        return self.tool_json
 
     def to_tool_dict(self) -> dict:
+        # built once, the returned dict is shared and must not be modified
+        if self.tool_dict is not None:
+            return self.tool_dict
         tool_dict = {
             "type": "function",
             "function": {
@@ -57,15 +189,19 @@ class ChatgptTool:
             },
         }
         for parameter in self.list_parameter:
-            tool_dict["function"]["parameters"]["properties"][parameter.name] = {
-                "type": parameter.type,
-            }
+            if parameter.dict_schema is not None:
+                tool_dict["function"]["parameters"]["properties"][parameter.name] = dict(parameter.dict_schema)
+            else:
+                tool_dict["function"]["parameters"]["properties"][parameter.name] = {
+                    "type": parameter.type,
+                }
             if parameter.description:
                 tool_dict["function"]["parameters"]["properties"][parameter.name]["description"] = parameter.description
             if parameter.list_enum_value:
                 tool_dict["function"]["parameters"]["properties"][parameter.name]["enum"] = parameter.list_enum_value
             if parameter.is_required:
                 tool_dict["function"]["parameters"]["required"].append(parameter.name)
+        self.tool_dict = tool_dict
         return tool_dict
 
 
@@ -84,25 +220,177 @@ def parse_docstring(callable: Callable) -> Tuple[str, Dict[str, str]]:
     return description, dict_parameter_description
 
 
-def get_parameter_type(annotation: type) -> Tuple[str, Optional[List[str]]]:
-    if annotation == str:
-        return "string", None
-    if annotation == int:
-        return "number", None
-    if annotation == float:
-        return "number", None
-    if annotation == bool:
-        return "boolean", None
-    # check in annotation is a literal
-    if hasattr(annotation, "__origin__") and annotation.__origin__ == Literal:
-        return "string", [str(value) for value in annotation.__args__]
-    if issubclass(annotation, Enum):
-        enum_members = [member.value for member in annotation]
-        return "string", enum_members
+def coerce_str(value: Any, path: str) -> str:
+    if not isinstance(value, str):
+        raise ValueError(f"{path}: expected a string")
+    return value
+
+
+def coerce_int(value: Any, path: str) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{path}: expected an integer")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(f"{path}: expected an integer")
+        return int(value)
+    return value
+
+
+def coerce_float(value: Any, path: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{path}: expected a number")
+    return float(value)
+
+
+def coerce_bool(value: Any, path: str) -> bool:
+    if not isinstance(value, bool):
+        raise ValueError(f"{path}: expected a boolean")
+    return value
+
+
+def is_typeddict(annotation: Any) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, dict) and hasattr(annotation, "__total__")
+
+
+def compile_annotation(annotation: Any) -> Tuple[dict, Callable[[Any, str], Any]]:
+    # returns the json schema of a type and a function that validates a json value and converts it to that type
+    # the work of inspecting the type is done once here, the returned function only checks values
+    if annotation is str:
+        return {"type": "string"}, coerce_str
+    if annotation is bool:
+        return {"type": "boolean"}, coerce_bool
+    if annotation is int:
+        return {"type": "integer"}, coerce_int
+    if annotation is float:
+        return {"type": "number"}, coerce_float
+    origin = get_origin(annotation)
+    list_arg = get_args(annotation)
+    if origin is Literal:
+        dict_text_value = {str(value): value for value in list_arg}
+
+        def coerce_literal(value: Any, path: str) -> Any:
+            if not isinstance(value, str) or value not in dict_text_value:
+                raise ValueError(f"{path}: expected one of {list(dict_text_value)}")
+            return dict_text_value[value]
+
+        return {"type": "string", "enum": list(dict_text_value)}, coerce_literal
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        # the value is passed on as it is, not as the member, as tools have always received it
+        list_value = [member.value for member in annotation]
+
+        def coerce_enum(value: Any, path: str) -> Any:
+            if value not in list_value:
+                raise ValueError(f"{path}: expected one of {list_value}")
+            return value
+
+        return {"type": "string", "enum": list_value}, coerce_enum
+    if origin is Union:
+        list_arg_not_none = [arg for arg in list_arg if arg is not type(None)]
+        is_optional = len(list_arg_not_none) < len(list_arg)
+        list_compiled = [compile_annotation(arg) for arg in list_arg_not_none]
+        if len(list_compiled) == 1:
+            dict_schema = dict(list_compiled[0][0])
+        else:
+            dict_schema = {"anyOf": [compiled[0] for compiled in list_compiled]}
+
+        def coerce_union(value: Any, path: str) -> Any:
+            if value is None:
+                if is_optional:
+                    return None
+                raise ValueError(f"{path}: expected a value")
+            list_error = []
+            for _, coerce in list_compiled:
+                try:
+                    return coerce(value, path)
+                except ValueError as error:
+                    list_error.append(str(error))
+            raise ValueError(" or ".join(list_error))
+
+        return dict_schema, coerce_union
+    if annotation is list or origin is list or origin is List:
+        if len(list_arg) == 0:
+            raise ValueError(f"Unsupported parameter type: {annotation}, the item type is required")
+        dict_schema_item, coerce_item = compile_annotation(list_arg[0])
+
+        def coerce_list(value: Any, path: str) -> list:
+            if not isinstance(value, list):
+                raise ValueError(f"{path}: expected an array")
+            return [coerce_item(item, f"{path}[{index}]") for index, item in enumerate(value)]
+
+        return {"type": "array", "items": dict_schema_item}, coerce_list
+    if annotation is dict or origin is dict or origin is Dict:
+        if len(list_arg) == 0 or list_arg[0] is not str:
+            raise ValueError(f"Unsupported parameter type: {annotation}, the keys must be strings")
+        dict_schema_value, coerce_value = compile_annotation(list_arg[1])
+
+        def coerce_dict(value: Any, path: str) -> dict:
+            if not isinstance(value, dict):
+                raise ValueError(f"{path}: expected an object")
+            return {key: coerce_value(item, f"{path}.{key}") for key, item in value.items()}
+
+        return {"type": "object", "additionalProperties": dict_schema_value}, coerce_dict
+    if is_typeddict(annotation) or dataclasses.is_dataclass(annotation):
+        dict_type_hint = get_type_hints(annotation)
+        if is_typeddict(annotation):
+            set_name_required = set(
+                getattr(annotation, "__required_keys__", dict_type_hint if annotation.__total__ else [])
+            )
+        else:
+            set_name_required = {
+                field.name
+                for field in dataclasses.fields(annotation)
+                if field.default is dataclasses.MISSING and field.default_factory is dataclasses.MISSING
+            }
+        dict_name_compiled = {name: compile_annotation(type_hint) for name, type_hint in dict_type_hint.items()}
+        dict_schema = {
+            "type": "object",
+            "properties": {name: compiled[0] for name, compiled in dict_name_compiled.items()},
+            "required": [name for name in dict_name_compiled if name in set_name_required],
+        }
+        is_dataclass = dataclasses.is_dataclass(annotation)
+
+        def coerce_object(value: Any, path: str) -> Any:
+            if not isinstance(value, dict):
+                raise ValueError(f"{path}: expected an object")
+            dict_value = {}
+            for name, item in value.items():
+                if name not in dict_name_compiled:
+                    raise ValueError(f"{path}.{name}: unexpected property")
+                dict_value[name] = dict_name_compiled[name][1](item, f"{path}.{name}")
+            for name in set_name_required:
+                if name not in dict_value:
+                    raise ValueError(f"{path}.{name}: missing required property")
+            if is_dataclass:
+                return annotation(**dict_value)
+            return dict_value
+
+        return dict_schema, coerce_object
     raise ValueError(f"Unsupported parameter type: {annotation}")
 
 
-def create_chatgpt_tool(callable: Callable) -> "ChatgptTool":
+DICT_CALLABLE_COMPILED: "weakref.WeakKeyDictionary[Callable, Tuple[str, str, Tuple[ChatgptParameter, ...]]]" = (
+    weakref.WeakKeyDictionary()
+)
+LOCK_CALLABLE_COMPILED = Lock()
+
+
+def compile_callable(callable: Callable) -> Tuple[str, str, Tuple[ChatgptParameter, ...]]:
+    # parsing the docstring and signature is cached per callable, the parameters are shared between tools
+    # the cache holds the callables weakly so closures made per request are freed with their tools, callables that
+    # can not be referenced weakly are compiled every time
+    try:
+        with LOCK_CALLABLE_COMPILED:
+            compiled = DICT_CALLABLE_COMPILED.get(callable)
+    except TypeError:
+        return compile_callable_uncached(callable)
+    if compiled is None:
+        compiled = compile_callable_uncached(callable)
+        with LOCK_CALLABLE_COMPILED:
+            DICT_CALLABLE_COMPILED[callable] = compiled
+    return compiled
+
+
+def compile_callable_uncached(callable: Callable) -> Tuple[str, str, Tuple[ChatgptParameter, ...]]:
     name = callable.__name__
     signature = inspect.signature(callable)
     if signature.return_annotation == inspect.Signature.empty:
@@ -111,22 +399,40 @@ def create_chatgpt_tool(callable: Callable) -> "ChatgptTool":
         raise ValueError("The return annotation must be a string.")
 
     description, dict_parameter_description = parse_docstring(callable)
+    dict_type_hint = get_type_hints(callable)
     list_parameter: List[ChatgptParameter] = []
     for parameter in signature.parameters.values():
         if parameter.annotation == inspect.Signature.empty:
             raise ValueError("All parameters must have an annotation.")
         parameter_name = parameter.name
-        parameter_type, parameter_list_enum_value = get_parameter_type(parameter.annotation)
+        parameter_dict_schema, parameter_coerce = compile_annotation(dict_type_hint[parameter_name])
         parameter_is_required = parameter.default == inspect.Parameter.empty
         parameter_description = dict_parameter_description.get(parameter_name, None)
 
         list_parameter.append(
             ChatgptParameter(
                 name=parameter_name,
-                type=parameter_type,
+                type=parameter_dict_schema.get("type", "object"),
                 is_required=parameter_is_required,
                 description=parameter_description,
-                list_enum_value=parameter_list_enum_value,
+                list_enum_value=parameter_dict_schema.get("enum"),
+                dict_schema=parameter_dict_schema,
+                coerce=parameter_coerce,
             )
         )
-    return ChatgptTool(callable, name, description, list_parameter)
+    return name, description, tuple(list_parameter)
+
+
+def create_chatgpt_tool(
+    callable: Callable,
+    *,
+    timeout: Optional[float] = None,
+    count_item_memo_max: int = 0,
+    time_to_live_memo: Optional[float] = None,
+) -> "ChatgptTool":
+    # count_item_memo_max above zero memoizes up to that many results, time_to_live_memo is in seconds
+    name, description, tuple_parameter = compile_callable(callable)
+    cache_lru = None
+    if 0 < count_item_memo_max:
+        cache_lru = CacheLru(count_item_memo_max, time_to_live_memo)
+    return ChatgptTool(callable, name, description, list(tuple_parameter), timeout=timeout, cache_lru=cache_lru)
@@ -0,0 +1,82 @@
+from typing import Dict, List, Optional
+
+from srai_openai.model.prompt_config import ChatgptEvent, PromptConfig
+
+
+class Continuation:
+    # a continuation of a prompt config, logprob is the sum of the logprobs of its count_token tokens
+    # continuations share the events of their common history, so a continuation costs one event whatever its length
+
+    def __init__(self, logprob: float, prompt_config: PromptConfig, count_token: int):
+        self.logprob = logprob
+        self.prompt_config = prompt_config
+        self.count_token = count_token
+
+    @property
+    def text(self) -> str:
+        if self.prompt_config.last_event.event_type != ChatgptEvent.ASSISTENT_MESSAGE:
+            return ""
+        return self.prompt_config.last_message_text
+
+
+def create_list_continuation_for_choice(prompt_config: PromptConfig, choice: dict) -> List[Continuation]:
+    # the continuations of prompt_config found in one completion choice with logprobs
+    # every top_logprobs alternative along the answered tokens is a continuation of the answered tokens before it
+    # the answered token is left out as an alternative (its continuations are there) except at the last position
+    # the chat api answers a trailing assistent message with a new turn, so these continuations can not be continued
+    # and an alternative ends at the token where it leaves the answered continuation
+    list_logprob = (choice.get("logprobs") or {}).get("content") or []
+    list_continuation = []
+    logprob_prefix = 0.0
+    prompt_config_prefix = prompt_config
+    for index, logprob in enumerate(list_logprob):
+        is_last = index == len(list_logprob) - 1
+        list_alternative = list(logprob.get("top_logprobs") or [])
+        if is_last and all(alternative["token"] != logprob["token"] for alternative in list_alternative):
+            list_alternative.append(logprob)
+        for alternative in list_alternative:
+            if alternative["token"] == logprob["token"] and not is_last:
+                continue
+            list_continuation.append(
+                Continuation(
+                    logprob_prefix + alternative["logprob"],
+                    prompt_config_prefix.append_assistent_token(alternative["token"]),
+                    index + 1,
+                )
+            )
+        logprob_prefix += logprob["logprob"]
+        prompt_config_prefix = prompt_config_prefix.append_assistent_token(logprob["token"])
+    return list_continuation
+
+
+def rank_list_continuation(
+    list_continuation: List[Continuation],
+    *,
+    count_result: int = 4,
+    logprob_margin: Optional[float] = None,
+    list_text_allowed: Optional[List[str]] = None,
+) -> List[Continuation]:
+    # the count_result best continuations, best first
+    # - a text reached through other tokens keeps its best logprob
+    # - with logprob_margin continuations more than that below the best are dropped
+    # - with list_text_allowed (constrained classification) only continuations whose text, without surrounding
+    #   whitespace, is allowed are kept
+    if count_result < 1:
+        raise ValueError("count_result must be at least 1")
+    dict_text_continuation: Dict[str, Continuation] = {}
+    for continuation in sorted(list_continuation, key=lambda continuation: -continuation.logprob):
+        text = continuation.text
+        if list_text_allowed is not None:
+            text = text.strip()
+            if text not in list_text_allowed:
+                continue
+        if text not in dict_text_continuation:
+            dict_text_continuation[text] = continuation
+    list_result = list(dict_text_continuation.values())[:count_result]
+    if logprob_margin is not None and 0 < len(list_result):
+        list_result = [
+            continuation
+            for continuation in list_result
+            if list_result[0].logprob - logprob_margin <= continuation.logprob
+        ]
+    return list_result
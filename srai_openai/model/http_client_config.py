@@ -0,0 +1,63 @@
+from typing import Tuple
+
+import httpx
+
+
+class HttpClientConfig:
+    # connection pool and timeouts of the http client shared by all clients created with an equal config
+    # the defaults are those of the openai sdk, times are in seconds
+
+    def __init__(
+        self,
+        *,
+        count_connection_max: int = 1000,
+        count_keepalive_max: int = 100,
+        time_keepalive: float = 5.0,
+        is_http2: bool = False,
+        time_timeout_connect: float = 5.0,
+        time_timeout_read: float = 600.0,
+        time_timeout_write: float = 600.0,
+        time_timeout_pool: float = 600.0,
+    ) -> None:
+        # http2 needs the h2 package (pip install httpx[http2])
+        self.count_connection_max = count_connection_max
+        self.count_keepalive_max = count_keepalive_max
+        self.time_keepalive = time_keepalive
+        self.is_http2 = is_http2
+        self.time_timeout_connect = time_timeout_connect
+        self.time_timeout_read = time_timeout_read
+        self.time_timeout_write = time_timeout_write
+        self.time_timeout_pool = time_timeout_pool
+
+    def to_tuple(self) -> Tuple:
+        return (
+            self.count_connection_max,
+            self.count_keepalive_max,
+            self.time_keepalive,
+            self.is_http2,
+            self.time_timeout_connect,
+            self.time_timeout_read,
+            self.time_timeout_write,
+            self.time_timeout_pool,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, HttpClientConfig) and self.to_tuple() == other.to_tuple()
+
+    def __hash__(self) -> int:
+        return hash(self.to_tuple())
+
+    def create_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.count_connection_max,
+            max_keepalive_connections=self.count_keepalive_max,
+            keepalive_expiry=self.time_keepalive,
+        )
+
+    def create_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.time_timeout_connect,
+            read=self.time_timeout_read,
+            write=self.time_timeout_write,
+            pool=self.time_timeout_pool,
+        )
@@ -1,10 +1,29 @@
 import json
-from copy import copy
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
-import tiktoken
 from openai.types.chat.chat_completion_message import ChatCompletionMessage
 
+from srai_openai.tools_tiktoken import (
+    TOKEN_COUNT_PER_MESSAGE,
+    TOKEN_COUNT_PER_NAME,
+    TOKEN_COUNT_PER_TOOL_CALL,
+    TOKEN_COUNT_REPLY_PRIMING,
+    count_token_image_url,
+    get_encoding,
+    get_encoding_name_for_model_id,
+)
+
+DICT_MODEL_ID_PREFIX_TOKEN_COUNT_MAX = {
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4-0125-preview": 128000,
+    "gpt-4-1106-preview": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+
 
 class ChatgptEvent:
     SYSTEM_MESSAGE = "system_message"
@@ -42,6 +61,8 @@ class ChatgptEvent:
         self.list_tool_offer = list_tool_offer
         self.tool_choice = tool_choice
         self.response_format = response_format
+        self.dict_token_count: Dict[str, int] = {}
+        self.dict_token_count_tool_offer: Dict[str, int] = {}
 
     def is_text_message(self) -> bool:
         return self.event_type in [
@@ -70,6 +91,55 @@ class ChatgptEvent:
         else:
             return f"Event Type: {self.event_type}, Event Content: {self.event_message}"
 
+    def get_list_text_token(self) -> Tuple[List[str], int]:
+        # the texts that need encoding and the token count that does not depend on the encoding
+        list_text = []
+        token_count_fixed = TOKEN_COUNT_PER_MESSAGE
+        for key, value in self.event_message.items():
+            if value is None:
+                continue
+            if key == "role":
+                list_text.append(value)
+            elif key == "name":
+                list_text.append(value)
+                token_count_fixed += TOKEN_COUNT_PER_NAME
+            elif key == "content":
+                if isinstance(value, str):
+                    list_text.append(value)
+                    continue
+                for content in value:
+                    if content["type"] == "text":
+                        list_text.append(content["text"])
+                    elif content["type"] == "image_url":
+                        image_url = content["image_url"]
+                        token_count_fixed += count_token_image_url(image_url["url"], image_url.get("detail", "auto"))
+            elif key == "tool_calls":
+                for tool_call in value:
+                    list_text.append(tool_call["function"]["name"])
+                    list_text.append(tool_call["function"]["arguments"])
+                    token_count_fixed += TOKEN_COUNT_PER_TOOL_CALL
+        return list_text, token_count_fixed
+
+    def token_count(self, encoding_name: str) -> int:
+        token_count = self.dict_token_count.get(encoding_name)
+        if token_count is None:
+            list_text, token_count = self.get_list_text_token()
+            encoding = get_encoding(encoding_name)
+            for text in list_text:
+                token_count += len(encoding.encode_ordinary(text))
+            self.dict_token_count[encoding_name] = token_count
+        return token_count
+
+    def token_count_tool_offer(self, encoding_name: str) -> int:
+        # tool definitions are sent with every request that offers them
+        if self.list_tool_offer is None:
+            return 0
+        token_count = self.dict_token_count_tool_offer.get(encoding_name)
+        if token_count is None:
+            token_count = len(get_encoding(encoding_name).encode_ordinary(json.dumps(self.list_tool_offer)))
+            self.dict_token_count_tool_offer[encoding_name] = token_count
+        return token_count
+
     def to_dict(self) -> dict:
         dict_event = {
             "type": self.event_type,
@@ -99,11 +169,106 @@ class ChatgptEvent:
         )
 
 
+class ChatgptEventNode:
+    # immutable link in a conversation, the conversation is the chain from the last node back to the first
+    # prompt configs that share a history share its nodes, so appending an event is constant time
+    # the materialized views are cached on the most recent node that needed them and handed over to descendants, a node
+    # with more than one child (a branch point, like a shared system prompt) keeps its views for the other children
+
+    def __init__(self, event: ChatgptEvent, node_parent: Optional["ChatgptEventNode"] = None) -> None:
+        self.event = event
+        self.node_parent = node_parent
+        self.count_child = 0
+        if node_parent is None:
+            self.count_event = 1
+            node_text_last = None
+        else:
+            node_parent.count_child += 1
+            self.count_event = node_parent.count_event + 1
+            node_text_last = node_parent.node_text_last
+        if event.is_text_message():
+            node_text_last = self
+        self.node_text_last: Optional[ChatgptEventNode] = node_text_last
+        self.tuple_event: Optional[Tuple[ChatgptEvent, ...]] = None
+        self.tuple_message: Optional[Tuple[dict, ...]] = None
+        self.dict_token_count_total: Dict[str, int] = {}
+
+    @staticmethod
+    def create_for_list_event(
+        list_event: Iterable[ChatgptEvent], node_parent: Optional["ChatgptEventNode"] = None
+    ) -> Optional["ChatgptEventNode"]:
+        node = node_parent
+        for event in list_event:
+            node = ChatgptEventNode(event, node)
+        return node
+
+    def get_tuple_event(self) -> Tuple[ChatgptEvent, ...]:
+        tuple_event = self.tuple_event
+        if tuple_event is None:
+            tuple_event, _ = self.materialize()
+        return tuple_event
+
+    def get_tuple_message(self) -> Tuple[dict, ...]:
+        tuple_message = self.tuple_message
+        if tuple_message is None:
+            _, tuple_message = self.materialize()
+        return tuple_message
+
+    def materialize(self) -> Tuple[Tuple[ChatgptEvent, ...], Tuple[dict, ...]]:
+        list_event_new = []
+        node = self
+        node_branch = None
+        tuple_event_parent = None
+        tuple_message_parent = None
+        while node is not None:
+            tuple_event_parent = node.tuple_event
+            tuple_message_parent = node.tuple_message
+            if tuple_event_parent is not None and tuple_message_parent is not None:
+                break
+            if node_branch is None and node is not self and 1 < node.count_child:
+                node_branch = node
+            list_event_new.append(node.event)
+            node = node.node_parent
+        list_event_new.reverse()
+        tuple_event = tuple(list_event_new)
+        tuple_message = tuple(event.event_message for event in list_event_new)
+        if node is not None:
+            tuple_event = tuple_event_parent + tuple_event  # type: ignore
+            tuple_message = tuple_message_parent + tuple_message  # type: ignore
+            if node.count_child == 1:
+                # take over the views of the ancestor so a long chain holds one copy instead of one per node
+                node.tuple_event = None
+                node.tuple_message = None
+        if node_branch is not None:
+            # the branch point walked past keeps views so its other children do not walk the chain again
+            node_branch.tuple_event = tuple_event[: node_branch.count_event]
+            node_branch.tuple_message = tuple_message[: node_branch.count_event]
+        self.tuple_event = tuple_event
+        self.tuple_message = tuple_message
+        return tuple_event, tuple_message
+
+    def token_count_total(self, encoding_name: str) -> int:
+        # running total up to and including this node, only the events after the last counted node are encoded
+        token_count = self.dict_token_count_total.get(encoding_name)
+        if token_count is not None:
+            return token_count
+        list_node = []
+        node: Optional[ChatgptEventNode] = self
+        while node is not None and encoding_name not in node.dict_token_count_total:
+            list_node.append(node)
+            node = node.node_parent
+        token_count = 0 if node is None else node.dict_token_count_total[encoding_name]
+        for node in reversed(list_node):
+            token_count += node.event.token_count(encoding_name)
+            node.dict_token_count_total[encoding_name] = token_count
+        return token_count
+
+
 class PromptConfig:
     def __init__(
         self,
         model_id: str,
-        list_event: List[ChatgptEvent],
+        list_event: Iterable[ChatgptEvent],
         tool_choice: Optional[str] = None,
     ) -> None:
 
@@ -112,11 +277,36 @@ class PromptConfig:
         if list_event is None:
             raise Exception("list_event is None")
         self.model_id = model_id
-        self.list_event = copy(list_event)
+        self.node_event_last = ChatgptEventNode.create_for_list_event(list_event)
+
+    @staticmethod
+    def create_for_node_event(model_id: str, node_event_last: Optional[ChatgptEventNode]) -> "PromptConfig":
+        prompt_config = PromptConfig.__new__(PromptConfig)
+        prompt_config.model_id = model_id
+        prompt_config.node_event_last = node_event_last
+        return prompt_config
+
+    def append_event(self, event: ChatgptEvent) -> "PromptConfig":
+        return PromptConfig.create_for_node_event(self.model_id, ChatgptEventNode(event, self.node_event_last))
+
+    @property
+    def list_event(self) -> Tuple[ChatgptEvent, ...]:
+        # read only view, use the append methods to extend the conversation
+        if self.node_event_last is None:
+            return ()
+        return self.node_event_last.get_tuple_event()
+
+    @property
+    def count_event(self) -> int:
+        if self.node_event_last is None:
+            return 0
+        return self.node_event_last.count_event
 
     @property
     def last_event(self) -> ChatgptEvent:
-        return self.list_event[-1]
+        if self.node_event_last is None:
+            raise IndexError("prompt config has no events")
+        return self.node_event_last.event
 
     @property
     def tools(self) -> Optional[List[dict]]:
@@ -140,23 +330,23 @@ class PromptConfig:
 
     @property
     def last_message_content(self) -> str:
-        return self.messages[-1]["content"]
+        return self.last_event.event_message["content"]
 
     @property
     def last_message_text(self) -> str:
-        return self.list_text_message[-1]["content"][0]["text"]
+        if self.node_event_last is None or self.node_event_last.node_text_last is None:
+            raise IndexError("prompt config has no text messages")
+        return self.node_event_last.node_text_last.event.event_message["content"][0]["text"]
 
     @property
     def list_text_message(self) -> List[dict]:
-        list_message = []
-        for event in self.list_event:
-            if event.is_text_message():
-                list_message.append(event.event_message)
-        return list_message
+        return [event.event_message for event in self.list_event if event.is_text_message()]
 
     @property
     def messages(self) -> List[dict]:
-        return [event.event_message for event in self.list_event]  # type: ignore
+        if self.node_event_last is None:
+            return []
+        return list(self.node_event_last.get_tuple_message())
 
     @staticmethod
     def create_message_text(role: str, message_text: str) -> dict:
@@ -177,9 +367,7 @@ class PromptConfig:
     def append_system_message(self, message_content: str) -> "PromptConfig":
         event_message = PromptConfig.create_message_text("system", message_content)
         event = ChatgptEvent(ChatgptEvent.SYSTEM_MESSAGE, event_message=event_message)
-        prompt_config = PromptConfig(self.model_id, self.list_event)
-        prompt_config.list_event.append(event)
-        return prompt_config
+        return self.append_event(event)
 
     def append_user_message(
         self,
@@ -206,9 +394,7 @@ class PromptConfig:
             list_tool_offer=list_tool_offer,
             tool_choice=tool_choice,
         )
-        prompt_config = PromptConfig(self.model_id, self.list_event)
-        prompt_config.list_event.append(event)
-        return prompt_config
+        return self.append_event(event)
 
     def append_assistent_message(
         self, message: ChatCompletionMessage, list_tool_call_result: List[dict] = []
@@ -221,19 +407,18 @@ class PromptConfig:
         else:
             event_message = PromptConfig.create_message("assistant", message_content)
         event = ChatgptEvent(ChatgptEvent.ASSISTENT_MESSAGE, event_message=event_message)
-        prompt_config = PromptConfig(self.model_id, self.list_event)
-        prompt_config.list_event.append(event)
-        return prompt_config
+        return self.append_event(event)
 
     def append_assistent_token(self, token: str) -> "PromptConfig":
-        if self.list_event[-1].event_type != ChatgptEvent.ASSISTENT_MESSAGE:
-            raise Exception("last event is not an assistent message")
-        event_message_text = self.list_event[-1].event_message["content"][0]["text"]
-        event_message = PromptConfig.create_message("assistant", event_message_text + token)
+        # extends the last assistent message by token, after any other event token starts a new assistent message
+        if self.last_event.event_type != ChatgptEvent.ASSISTENT_MESSAGE:
+            event_message = PromptConfig.create_message_text("assistant", token)
+            return self.append_event(ChatgptEvent(ChatgptEvent.ASSISTENT_MESSAGE, event_message=event_message))
+        event_message_text = self.last_event.event_message["content"][0]["text"]
+        event_message = PromptConfig.create_message_text("assistant", event_message_text + token)
         event = ChatgptEvent(ChatgptEvent.ASSISTENT_MESSAGE, event_message=event_message)
-        prompt_config = PromptConfig(self.model_id, self.list_event[:-1])
-        prompt_config.list_event.append(event)
-        return prompt_config
+        node_event_parent = self.node_event_last.node_parent  # type: ignore
+        return PromptConfig.create_for_node_event(self.model_id, ChatgptEventNode(event, node_event_parent))
 
     def append_tool_call_request(
         self,
@@ -243,51 +428,76 @@ class PromptConfig:
             ChatgptEvent.TOOL_CALL_REQUEST,
             event_message=message.model_dump(),
         )
-        prompt_config = PromptConfig(self.model_id, self.list_event)
-        prompt_config.list_event.append(event)
-        return prompt_config
+        return self.append_event(event)
 
-    def append_tool_call_result(self, list_tool_call_result: List[dict]) -> "PromptConfig":
+    def append_tool_call_result(
+        self,
+        list_tool_call_result: List[dict],
+        *,
+        list_tool_offer: Optional[List[dict]] = None,
+        tool_choice: Optional[str] = None,
+    ) -> "PromptConfig":
+        # tools offered here are offered again with the next completion so the model can keep calling them
         list_event: List[ChatgptEvent] = []
-        for tool_call_result in list_tool_call_result:
+        for index, tool_call_result in enumerate(list_tool_call_result):
             message = {
                 "role": "tool",
                 "tool_call_id": tool_call_result["id"],
                 "name": tool_call_result["name"],
                 "content": tool_call_result["result"],
             }
-            list_event.append(ChatgptEvent(ChatgptEvent.TOOL_CALL_RESULT, event_message=message))
-        prompt_config = PromptConfig(self.model_id, self.list_event)
-        prompt_config.list_event.extend(list_event)
-        return prompt_config
+            if index == len(list_tool_call_result) - 1:
+                event = ChatgptEvent(
+                    ChatgptEvent.TOOL_CALL_RESULT,
+                    event_message=message,
+                    list_tool_offer=list_tool_offer,
+                    tool_choice=tool_choice,
+                )
+            else:
+                event = ChatgptEvent(ChatgptEvent.TOOL_CALL_RESULT, event_message=message)
+            list_event.append(event)
+        node_event_last = ChatgptEventNode.create_for_list_event(list_event, self.node_event_last)
+        return PromptConfig.create_for_node_event(self.model_id, node_event_last)
 
     def token_count(self) -> int:
-        content = ""
-        for message in self.messages:
-            content += message["content"]
-        if self.model_id == "gpt-4o":
-            encoding_name = "cl100k_base"
-        elif self.model_id == "gpt-4":
-            encoding_name = "cl100k_base"
-        elif self.model_id == "gpt-4-turbo-preview":
-            encoding_name = "cl100k_base"
-        elif self.model_id == "gpt-3.5-turbo":
-            encoding_name = "cl100k_base"
-        else:
-            raise Exception(f"model {self.model_id} not supported")
-        encoding = tiktoken.get_encoding(encoding_name)
-        num_tokens = len(encoding.encode(content))
-        return num_tokens
+        if self.node_event_last is None:
+            return 0
+        encoding_name = get_encoding_name_for_model_id(self.model_id)
+        token_count = self.node_event_last.token_count_total(encoding_name) + TOKEN_COUNT_REPLY_PRIMING
+        return token_count + self.last_event.token_count_tool_offer(encoding_name)
+
+    @staticmethod
+    def token_count_batch(list_prompt_config: List["PromptConfig"], *, count_thread: int = 8) -> List[int]:
+        # encodes every event that is not counted yet with one multi threaded encode_batch call per encoding
+        dict_encoding_name_dict_event: Dict[str, Dict[int, ChatgptEvent]] = {}
+        for prompt_config in list_prompt_config:
+            encoding_name = get_encoding_name_for_model_id(prompt_config.model_id)
+            dict_event = dict_encoding_name_dict_event.setdefault(encoding_name, {})
+            node = prompt_config.node_event_last
+            while node is not None and encoding_name not in node.dict_token_count_total:
+                if encoding_name not in node.event.dict_token_count:
+                    dict_event[id(node.event)] = node.event
+                node = node.node_parent
+        for encoding_name, dict_event in dict_encoding_name_dict_event.items():
+            list_event = list(dict_event.values())
+            list_list_text_token = [event.get_list_text_token() for event in list_event]
+            list_text = [text for list_text_event, _ in list_list_text_token for text in list_text_event]
+            list_list_token = get_encoding(encoding_name).encode_ordinary_batch(list_text, num_threads=count_thread)
+            index_text = 0
+            for event, (list_text_event, token_count_fixed) in zip(list_event, list_list_text_token):
+                token_count = token_count_fixed
+                for list_token in list_list_token[index_text : index_text + len(list_text_event)]:
+                    token_count += len(list_token)
+                index_text += len(list_text_event)
+                event.dict_token_count[encoding_name] = token_count
+        return [prompt_config.token_count() for prompt_config in list_prompt_config]
 
     def token_count_max(self) -> int:
-        if self.model_id == "gpt-4":
-            return 128000
-        elif self.model_id == "gpt-4-turbo-preview":
-            return 128000
-        elif self.model_id == "gpt-3.5-turbo":
-            return 16385
-        else:
-            raise Exception(f"model {self.model_id} not supported")
+        # longest prefix wins so that dated snapshots resolve to their family
+        for prefix in sorted(DICT_MODEL_ID_PREFIX_TOKEN_COUNT_MAX, key=len, reverse=True):
+            if self.model_id.startswith(prefix):
+                return DICT_MODEL_ID_PREFIX_TOKEN_COUNT_MAX[prefix]
+        raise Exception(f"model {self.model_id} not supported")
 
     @staticmethod
     def create(
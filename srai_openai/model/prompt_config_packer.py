@@ -0,0 +1,115 @@
+from typing import Callable, List, Optional
+
+from srai_openai.model.prompt_config import ChatgptEvent, PromptConfig
+from srai_openai.tools_tiktoken import TOKEN_COUNT_REPLY_PRIMING, get_encoding_name_for_model_id
+
+
+class PromptConfigPacker:
+    # fits a prompt config into the context window before it is sent
+    # stale tool call results are stubbed first, then the oldest non system events are dropped or summarized
+    # a tool call request and its results are kept or dropped together so the conversation stays valid
+
+    def __init__(
+        self,
+        *,
+        token_count_completion_reserved: int = 4096,
+        count_tool_round_kept: int = 1,
+        summarize: Optional[Callable[[List[ChatgptEvent]], str]] = None,
+        token_count_summary_max: int = 512,
+        text_tool_result_omitted: str = "(tool result omitted)",
+    ) -> None:
+        self.token_count_completion_reserved = token_count_completion_reserved
+        self.count_tool_round_kept = count_tool_round_kept
+        self.summarize = summarize
+        self.token_count_summary_max = token_count_summary_max
+        self.text_tool_result_omitted = text_tool_result_omitted
+
+    def get_token_count_budget(self, prompt_config: PromptConfig) -> int:
+        return prompt_config.token_count_max() - self.token_count_completion_reserved
+
+    @staticmethod
+    def create_list_unit(list_event: List[ChatgptEvent]) -> List[List[ChatgptEvent]]:
+        list_unit: List[List[ChatgptEvent]] = []
+        for event in list_event:
+            if event.event_type == ChatgptEvent.TOOL_CALL_RESULT and 0 < len(list_unit):
+                if list_unit[-1][0].event_type == ChatgptEvent.TOOL_CALL_REQUEST:
+                    list_unit[-1].append(event)
+                    continue
+            list_unit.append([event])
+        return list_unit
+
+    def stub_tool_result(self, event: ChatgptEvent) -> ChatgptEvent:
+        event_message = dict(event.event_message)
+        event_message["content"] = self.text_tool_result_omitted
+        return ChatgptEvent(
+            ChatgptEvent.TOOL_CALL_RESULT,
+            event_message,
+            list_tool_offer=event.list_tool_offer,
+            tool_choice=event.tool_choice,
+        )
+
+    def pack(self, prompt_config: PromptConfig, token_count_budget: Optional[int] = None) -> PromptConfig:
+        if token_count_budget is None:
+            token_count_budget = self.get_token_count_budget(prompt_config)
+        if prompt_config.token_count() <= token_count_budget:
+            return prompt_config
+
+        encoding_name = get_encoding_name_for_model_id(prompt_config.model_id)
+        list_unit = PromptConfigPacker.create_list_unit(list(prompt_config.list_event))
+        # everything that is not an event: reply priming and the tool definitions on the last event
+        token_count_overhead = TOKEN_COUNT_REPLY_PRIMING + prompt_config.last_event.token_count_tool_offer(
+            encoding_name
+        )
+
+        def token_count_unit(unit: List[ChatgptEvent]) -> int:
+            return sum(event.token_count(encoding_name) for event in unit)
+
+        list_index_tool_round = [
+            index for index, unit in enumerate(list_unit) if unit[0].event_type == ChatgptEvent.TOOL_CALL_REQUEST
+        ]
+        if 0 < self.count_tool_round_kept:
+            list_index_tool_round = list_index_tool_round[: -self.count_tool_round_kept]
+        for index in list_index_tool_round:
+            if index == len(list_unit) - 1:
+                continue
+            unit = list_unit[index]
+            list_unit[index] = [unit[0]] + [self.stub_tool_result(event) for event in unit[1:]]
+
+        list_token_count_unit = [token_count_unit(unit) for unit in list_unit]
+        token_count = token_count_overhead + sum(list_token_count_unit)
+        if token_count <= token_count_budget:
+            return PromptConfig(prompt_config.model_id, [event for unit in list_unit for event in unit])
+
+        if self.summarize is not None:
+            token_count_budget -= self.token_count_summary_max
+        # the last unit carries the request settings and is never dropped, neither are system messages
+        list_is_dropped = [False] * len(list_unit)
+        for index, unit in enumerate(list_unit[:-1]):
+            if token_count <= token_count_budget:
+                break
+            if unit[0].event_type == ChatgptEvent.SYSTEM_MESSAGE:
+                continue
+            list_is_dropped[index] = True
+            token_count -= list_token_count_unit[index]
+        if token_count_budget < token_count:
+            raise Exception(f"prompt config needs at least {token_count} tokens, the budget is {token_count_budget}")
+
+        list_event = []
+        list_event_dropped = []
+        for unit, is_dropped in zip(list_unit, list_is_dropped):
+            if is_dropped:
+                list_event_dropped.extend(unit)
+            else:
+                list_event.extend(unit)
+        if self.summarize is not None and 0 < len(list_event_dropped):
+            event_message = PromptConfig.create_message_text("system", self.summarize(list_event_dropped))
+            event_summary = ChatgptEvent(ChatgptEvent.SYSTEM_MESSAGE, event_message)
+            if self.token_count_summary_max < event_summary.token_count(encoding_name):
+                raise Exception(f"summary is longer than {self.token_count_summary_max} tokens")
+            index_insert = 0
+            while index_insert < len(list_event) - 1:
+                if list_event[index_insert].event_type != ChatgptEvent.SYSTEM_MESSAGE:
+                    break
+                index_insert += 1
+            list_event.insert(index_insert, event_summary)
+        return PromptConfig(prompt_config.model_id, list_event)
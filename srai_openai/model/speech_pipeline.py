@@ -0,0 +1,104 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from srai_openai.tools_audio import get_audio_segment_for_concatenation
+
+
+def iterate_chunk(content: bytes, count_byte_chunk: Optional[int]) -> Iterator[bytes]:
+    if count_byte_chunk is None:
+        yield content
+        return
+    for index in range(0, len(content), count_byte_chunk):
+        yield content[index : index + count_byte_chunk]
+
+
+class SpeechPipeline:
+    # synthesizes the texts concurrently, at most count_worker ahead of the one that is being read
+    # iter_bytes yields the audio of every text as soon as it and all texts before it are done, concatenated for
+    # response_format, so it can be wrapped in a SpeechStream like a streamed response
+
+    def __init__(
+        self,
+        list_text: List[str],
+        function_speech: Callable[[str], bytes],
+        response_format: str,
+        *,
+        count_worker: int = 4,
+    ) -> None:
+        if count_worker < 1:
+            raise ValueError("count_worker must be at least 1")
+        if response_format == "flac":
+            raise ValueError("flac segments can not be concatenated, use another response format")
+        self.list_text = list_text
+        self.function_speech = function_speech
+        self.response_format = response_format
+        self.count_worker = count_worker
+        self.executor = ThreadPoolExecutor(max_workers=count_worker)
+        self.dict_index_future: Dict[int, Future] = {}
+        self.index_submit = 0
+        self.submit()
+
+    def submit(self) -> None:
+        while self.index_submit < len(self.list_text) and len(self.dict_index_future) < self.count_worker:
+            self.dict_index_future[self.index_submit] = self.executor.submit(
+                self.function_speech, self.list_text[self.index_submit]
+            )
+            self.index_submit += 1
+
+    def iter_bytes(self, count_byte_chunk: Optional[int] = None) -> Iterator[bytes]:
+        for index in range(len(self.list_text)):
+            content = self.dict_index_future.pop(index).result()
+            self.submit()
+            content = get_audio_segment_for_concatenation(content, self.response_format, index == 0)
+            yield from iterate_chunk(content, count_byte_chunk)
+
+    def close(self) -> None:
+        for future in self.dict_index_future.values():
+            future.cancel()
+        self.executor.shutdown(wait=False)
+
+
+class SpeechPipelineAsync:
+    # as SpeechPipeline, with the texts synthesized as tasks on the running event loop
+
+    def __init__(
+        self,
+        list_text: List[str],
+        function_speech: Callable[[str], Awaitable[bytes]],
+        response_format: str,
+        *,
+        count_worker: int = 4,
+    ) -> None:
+        if count_worker < 1:
+            raise ValueError("count_worker must be at least 1")
+        if response_format == "flac":
+            raise ValueError("flac segments can not be concatenated, use another response format")
+        self.list_text = list_text
+        self.function_speech = function_speech
+        self.response_format = response_format
+        self.count_worker = count_worker
+        self.dict_index_task: Dict[int, asyncio.Task] = {}
+        self.index_submit = 0
+        self.submit()
+
+    def submit(self) -> None:
+        while self.index_submit < len(self.list_text) and len(self.dict_index_task) < self.count_worker:
+            self.dict_index_task[self.index_submit] = asyncio.ensure_future(
+                self.function_speech(self.list_text[self.index_submit])
+            )
+            self.index_submit += 1
+
+    async def iter_bytes(self, count_byte_chunk: Optional[int] = None) -> AsyncIterator[bytes]:
+        for index in range(len(self.list_text)):
+            content = await self.dict_index_task.pop(index)
+            self.submit()
+            content = get_audio_segment_for_concatenation(content, self.response_format, index == 0)
+            for chunk in iterate_chunk(content, count_byte_chunk):
+                yield chunk
+
+    async def close(self) -> None:
+        for task in self.dict_index_task.values():
+            task.cancel()
+        await asyncio.gather(*self.dict_index_task.values(), return_exceptions=True)
+        self.dict_index_task.clear()
@@ -0,0 +1,131 @@
+import inspect
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+
+class SpeechResponseFile:
+    # an audio file with the iter_bytes and close of a streamed response, for cache hits
+    # iter_bytes is synchronous, a SpeechStream reads it in async iteration as well
+
+    def __init__(self, path_file: str) -> None:
+        self.file = open(path_file, "rb")
+
+    def iter_bytes(self, count_byte_chunk: Optional[int] = None) -> Iterator[bytes]:
+        while True:
+            chunk = self.file.read(count_byte_chunk or 65536)
+            if len(chunk) == 0:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class SpeechStream:
+    # wraps a streamed speech response, iterating it (sync or async) yields the audio chunks as they arrive
+    # chunks are not kept, so memory stays at one chunk however long the audio is
+    # response is a streamed sdk response of which the headers are already in
+    # callback_chunk gets every chunk, callback_complete gets whether the stream was read to the end once it closes
+
+    def __init__(
+        self,
+        response: Any,
+        *,
+        time_start: Optional[float] = None,
+        count_byte_chunk: Optional[int] = None,
+        callback_chunk: Optional[Callable[[bytes], None]] = None,
+        callback_complete: Optional[Callable[[bool], None]] = None,
+    ):
+        self.response = response
+        self.time_start = time.perf_counter() if time_start is None else time_start
+        self.count_byte_chunk = count_byte_chunk
+        self.callback_chunk = callback_chunk
+        self.callback_complete = callback_complete
+        self.time_first_byte: Optional[float] = None
+        self.time_end: Optional[float] = None
+        self.count_byte = 0
+
+    @property
+    def time_to_first_byte(self) -> Optional[float]:
+        # time to the first audio byte, the time to play back starts at the latest
+        if self.time_first_byte is None:
+            return None
+        return self.time_first_byte - self.time_start
+
+    @property
+    def time_total(self) -> Optional[float]:
+        if self.time_end is None:
+            return None
+        return self.time_end - self.time_start
+
+    def add_chunk(self, chunk: bytes) -> None:
+        if self.time_first_byte is None:
+            self.time_first_byte = time.perf_counter()
+        self.count_byte += len(chunk)
+        if self.callback_chunk is not None:
+            self.callback_chunk(chunk)
+
+    def finish(self, is_complete: bool) -> None:
+        if is_complete:
+            self.time_end = time.perf_counter()
+        if self.callback_complete is not None:
+            callback_complete = self.callback_complete
+            self.callback_complete = None
+            callback_complete(is_complete)
+
+    def __iter__(self) -> Iterator[bytes]:
+        is_complete = False
+        try:
+            for chunk in self.response.iter_bytes(self.count_byte_chunk):
+                if 0 < len(chunk):
+                    self.add_chunk(chunk)
+                    yield chunk
+            is_complete = True
+        finally:
+            self.response.close()
+            self.finish(is_complete)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        is_complete = False
+        try:
+            iterable_chunk = self.response.iter_bytes(self.count_byte_chunk)
+            if hasattr(iterable_chunk, "__aiter__"):
+                async for chunk in iterable_chunk:
+                    if 0 < len(chunk):
+                        self.add_chunk(chunk)
+                        yield chunk
+            else:
+                for chunk in iterable_chunk:
+                    if 0 < len(chunk):
+                        self.add_chunk(chunk)
+                        yield chunk
+            is_complete = True
+        finally:
+            result = self.response.close()
+            if inspect.isawaitable(result):
+                await result
+            self.finish(is_complete)
+
+    def close(self) -> Any:
+        # for streams that are not read to the end, awaited for async streams
+        self.finish(False)
+        return self.response.close()
+
+    def write_to(self, sink: Any) -> int:
+        # sink is anything with a write method, like a file, or a callable like socket.sendall
+        # returns the number of bytes written
+        write = sink.write if hasattr(sink, "write") else sink
+        for chunk in self:
+            write(chunk)
+        return self.count_byte
+
+    async def write_to_async(self, sink: Any) -> int:
+        # as write_to, a write that returns an awaitable is awaited, an asyncio.StreamWriter is drained
+        write = sink.write if hasattr(sink, "write") else sink
+        async for chunk in self:
+            result = write(chunk)
+            if inspect.isawaitable(result):
+                await result
+            if hasattr(sink, "drain"):
+                await sink.drain()
+        return self.count_byte
@@ -0,0 +1,42 @@
+from typing import Callable, Dict, Iterator, List, Optional
+
+from srai_openai.model.chatgpt_tool import ChatgptTool, create_chatgpt_tool
+
+
+class ToolRegistry:
+    # a set of compiled tools, the tool offer is built when a tool is added and reused for every prompt
+    # can be passed to the client wherever a dict of tools by name is accepted
+
+    def __init__(self, list_chatgpt_tool: Optional[List[ChatgptTool]] = None) -> None:
+        self.dict_chatgpt_tool: Dict[str, ChatgptTool] = {}
+        self.list_tool_offer: List[dict] = []
+        for chatgpt_tool in list_chatgpt_tool or []:
+            self.add_chatgpt_tool(chatgpt_tool)
+
+    def __len__(self) -> int:
+        return len(self.dict_chatgpt_tool)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.dict_chatgpt_tool
+
+    def __getitem__(self, name: str) -> ChatgptTool:
+        return self.dict_chatgpt_tool[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.dict_chatgpt_tool)
+
+    def values(self) -> List[ChatgptTool]:
+        return list(self.dict_chatgpt_tool.values())
+
+    def add_chatgpt_tool(self, chatgpt_tool: ChatgptTool) -> None:
+        if chatgpt_tool.name in self.dict_chatgpt_tool:
+            raise ValueError(f"tool {chatgpt_tool.name} already exists")
+        self.dict_chatgpt_tool[chatgpt_tool.name] = chatgpt_tool
+        # a new list so that prompt configs holding the previous offer are not changed
+        self.list_tool_offer = self.list_tool_offer + [chatgpt_tool.to_tool_dict()]
+
+    def add_callable(self, callable: Callable, **kwds) -> ChatgptTool:
+        # kwds are passed to create_chatgpt_tool
+        chatgpt_tool = create_chatgpt_tool(callable, **kwds)
+        self.add_chatgpt_tool(chatgpt_tool)
+        return chatgpt_tool
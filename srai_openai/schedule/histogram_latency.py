@@ -0,0 +1,57 @@
+import bisect
+import math
+from collections import deque
+from threading import Lock
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+class HistogramLatency:
+    # rolling latency histogram per key (usually a model id), only the last count_sample_max samples of a key count
+    # bucket bounds grow by factor_bucket, so a percentile is at most that factor above the real value
+
+    def __init__(
+        self,
+        *,
+        count_sample_max: int = 1000,
+        time_bucket_min: float = 0.01,
+        time_bucket_max: float = 600.0,
+        factor_bucket: float = 1.1,
+    ) -> None:
+        self.count_sample_max = count_sample_max
+        self.list_time_bound: List[float] = [time_bucket_min]
+        while self.list_time_bound[-1] < time_bucket_max:
+            self.list_time_bound.append(self.list_time_bound[-1] * factor_bucket)
+        # per key the bucket index of each sample in arrival order and the sample count per bucket
+        self.dict_key_sample: Dict[str, Tuple[Deque[int], List[int]]] = {}
+        self.lock = Lock()
+
+    def add(self, key: str, time_latency: float) -> None:
+        index_bucket = min(bisect.bisect_left(self.list_time_bound, time_latency), len(self.list_time_bound) - 1)
+        with self.lock:
+            if key not in self.dict_key_sample:
+                self.dict_key_sample[key] = (deque(), [0] * len(self.list_time_bound))
+            deque_index_bucket, list_count = self.dict_key_sample[key]
+            if len(deque_index_bucket) == self.count_sample_max:
+                list_count[deque_index_bucket.popleft()] -= 1
+            deque_index_bucket.append(index_bucket)
+            list_count[index_bucket] += 1
+
+    def count_sample(self, key: str) -> int:
+        with self.lock:
+            if key not in self.dict_key_sample:
+                return 0
+            return len(self.dict_key_sample[key][0])
+
+    def get_percentile(self, key: str, percentile: float) -> Optional[float]:
+        # percentile is between 0 and 1, returns the upper bound of the bucket it falls in or None without samples
+        with self.lock:
+            if key not in self.dict_key_sample:
+                return None
+            deque_index_bucket, list_count = self.dict_key_sample[key]
+            count_rank = max(1, math.ceil(percentile * len(deque_index_bucket)))
+            count_cumulative = 0
+            for index_bucket, count in enumerate(list_count):
+                count_cumulative += count
+                if count_rank <= count_cumulative:
+                    return self.list_time_bound[index_bucket]
+            return None
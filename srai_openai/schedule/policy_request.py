@@ -0,0 +1,269 @@
+import asyncio
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Any, Awaitable, Callable, Optional, Set, TypeVar
+
+from openai import APIConnectionError, APIStatusError
+
+from srai_openai.schedule.histogram_latency import HistogramLatency
+
+T = TypeVar("T")
+
+
+class PolicyRequest:
+    # hedging and retries for api requests
+    # when an attempt has not answered within percentile_hedge of the recent latency of its key a duplicate is sent,
+    # the first answer is used and the other attempts are cancelled (async) or abandoned and discarded (sync)
+    # failed requests are retried with full jitter exponential backoff as long as the deadline allows
+
+    def __init__(
+        self,
+        *,
+        percentile_hedge: Optional[float] = 0.95,
+        count_hedge_max: int = 1,
+        count_sample_min: int = 20,
+        time_hedge_min: float = 0.05,
+        count_retry_max: int = 3,
+        time_backoff_base: float = 0.5,
+        time_backoff_max: float = 8.0,
+        time_deadline: Optional[float] = None,
+        histogram_latency: Optional[HistogramLatency] = None,
+        count_thread_max: int = 64,
+    ) -> None:
+        # percentile_hedge None disables hedging, there is no hedging for a key until it has count_sample_min samples
+        # time_deadline is in seconds over all attempts and retries of a request, None is no deadline
+        # count_thread_max bounds the threads that run hedged attempts, they are started as needed and reused
+        # attempts that lost a hedge keep their thread until their call returns, when all threads are taken requests
+        # are not hedged but run on the calling thread, so they never queue behind abandoned attempts
+        self.percentile_hedge = percentile_hedge
+        self.count_hedge_max = count_hedge_max
+        self.count_sample_min = count_sample_min
+        self.time_hedge_min = time_hedge_min
+        self.count_retry_max = count_retry_max
+        self.time_backoff_base = time_backoff_base
+        self.time_backoff_max = time_backoff_max
+        self.time_deadline = time_deadline
+        if histogram_latency is None:
+            histogram_latency = HistogramLatency()
+        self.histogram_latency = histogram_latency
+        # a policy is shared by the threads and tasks of a client, so its counters are guarded
+        self.count_hedge = 0
+        self.count_retry = 0
+        self.lock = Lock()
+        self.count_thread_max = count_thread_max
+        self.count_attempt_running = 0
+        self.is_closed = False
+        self.executor = ThreadPoolExecutor(max_workers=count_thread_max, thread_name_prefix="policy_request")
+
+    def close(self) -> None:
+        # attempts that have not started are cancelled, running ones end with their calls, later requests are not hedged
+        with self.lock:
+            self.is_closed = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __del__(self) -> None:
+        executor = getattr(self, "executor", None)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def is_thread_free(self, count_thread: int) -> bool:
+        with self.lock:
+            return not self.is_closed and self.count_attempt_running + count_thread <= self.count_thread_max
+
+    def submit_attempt(self, callable_attempt: Callable[[Optional[float]], T], time_end: Optional[float]) -> Future:
+        with self.lock:
+            self.count_attempt_running += 1
+        future = self.executor.submit(self.call_attempt, callable_attempt, time_end)
+        future.add_done_callback(self.release_attempt)
+        return future
+
+    def release_attempt(self, future: Future) -> None:
+        with self.lock:
+            self.count_attempt_running -= 1
+
+    def get_time_hedge(self, key: str) -> Optional[float]:
+        if self.percentile_hedge is None or self.count_hedge_max < 1:
+            return None
+        if self.histogram_latency.count_sample(key) < self.count_sample_min:
+            return None
+        time_percentile = self.histogram_latency.get_percentile(key, self.percentile_hedge)
+        return max(self.time_hedge_min, time_percentile)  # type: ignore
+
+    def get_time_backoff(self, index_retry: int, error: BaseException) -> float:
+        time_backoff = random.uniform(0, min(self.time_backoff_max, self.time_backoff_base * 2**index_retry))
+        if isinstance(error, APIStatusError):
+            # the server may know better how long to wait
+            try:
+                time_backoff = max(time_backoff, float(error.response.headers.get("retry-after", 0)))
+            except ValueError:
+                pass
+        return time_backoff
+
+    def is_retryable(self, error: BaseException) -> bool:
+        # connection errors include timeouts
+        if isinstance(error, APIConnectionError):
+            return True
+        if isinstance(error, APIStatusError):
+            return error.status_code in (408, 409, 429) or 500 <= error.status_code
+        return False
+
+    def get_time_end(self, time_deadline: Optional[float]) -> Optional[float]:
+        # time_deadline further limits the deadline of the policy for a single request
+        if self.time_deadline is not None:
+            time_deadline = self.time_deadline if time_deadline is None else min(time_deadline, self.time_deadline)
+        if time_deadline is None:
+            return None
+        return time.monotonic() + time_deadline
+
+    def is_retry_allowed(self, index_retry: int, error: BaseException, time_backoff: float, time_end: Optional[float]):
+        if index_retry == self.count_retry_max or not self.is_retryable(error):
+            return False
+        return time_end is None or time.monotonic() + time_backoff < time_end
+
+    def call(
+        self,
+        key: str,
+        callable_attempt: Callable[[Optional[float]], T],
+        callable_discard: Optional[Callable[[T], Any]] = None,
+        *,
+        time_deadline: Optional[float] = None,
+    ) -> T:
+        # callable_attempt is given the seconds left until the deadline to use as its timeout
+        # callable_discard is called with the results of attempts that finished after another attempt answered
+        time_end = self.get_time_end(time_deadline)
+        index_retry = 0
+        while True:
+            try:
+                return self.call_hedged(key, callable_attempt, callable_discard, time_end)
+            except Exception as error:
+                time_backoff = self.get_time_backoff(index_retry, error)
+                if not self.is_retry_allowed(index_retry, error, time_backoff, time_end):
+                    raise
+            with self.lock:
+                self.count_retry += 1
+            index_retry += 1
+            time.sleep(time_backoff)
+
+    def call_attempt(self, callable_attempt: Callable[[Optional[float]], T], time_end: Optional[float]) -> T:
+        timeout = None if time_end is None else max(0.0, time_end - time.monotonic())
+        return callable_attempt(timeout)
+
+    def call_hedged(
+        self,
+        key: str,
+        callable_attempt: Callable[[Optional[float]], T],
+        callable_discard: Optional[Callable[[T], Any]],
+        time_end: Optional[float],
+    ) -> T:
+        # the latency is timed from the first attempt, when a hedge wins it is the time the first attempt had taken
+        # so far, a lower bound of its latency, timing the winner from its own start would only keep fast samples
+        time_start = time.monotonic()
+        if self.get_time_hedge(key) is None or not self.is_thread_free(2):
+            result = self.call_attempt(callable_attempt, time_end)
+            self.histogram_latency.add(key, time.monotonic() - time_start)
+            return result
+
+        def discard(future: Future) -> None:
+            if callable_discard is not None and not future.cancelled() and future.exception() is None:
+                callable_discard(future.result())
+
+        # a blocked http call can not be interrupted from another thread, attempts that lose run on and are discarded
+        set_future: Set[Future] = {self.submit_attempt(callable_attempt, time_end)}
+        count_attempt = 1
+        try:
+            while True:
+                time_hedge = None
+                if count_attempt <= self.count_hedge_max and self.is_thread_free(1):
+                    time_hedge = self.get_time_hedge(key)
+                set_done, set_future = wait(set_future, timeout=time_hedge, return_when=FIRST_COMPLETED)
+                if len(set_done) == 0:
+                    with self.lock:
+                        self.count_hedge += 1
+                    count_attempt += 1
+                    set_future.add(self.submit_attempt(callable_attempt, time_end))
+                    continue
+                list_future_answered = [future for future in set_done if future.exception() is None]
+                if 0 < len(list_future_answered):
+                    for future in list_future_answered[1:]:
+                        discard(future)
+                    self.histogram_latency.add(key, time.monotonic() - time_start)
+                    return list_future_answered[0].result()
+                if len(set_future) == 0:
+                    raise list(set_done)[0].exception()  # type: ignore
+        finally:
+            for future in set_future:
+                future.cancel()  # only attempts that have not started yet
+                future.add_done_callback(discard)
+
+    async def call_async(
+        self,
+        key: str,
+        callable_attempt: Callable[[Optional[float]], Awaitable[T]],
+        callable_discard: Optional[Callable[[T], Awaitable[Any]]] = None,
+        *,
+        time_deadline: Optional[float] = None,
+    ) -> T:
+        time_end = self.get_time_end(time_deadline)
+        index_retry = 0
+        while True:
+            try:
+                return await self.call_hedged_async(key, callable_attempt, callable_discard, time_end)
+            except Exception as error:
+                time_backoff = self.get_time_backoff(index_retry, error)
+                if not self.is_retry_allowed(index_retry, error, time_backoff, time_end):
+                    raise
+            with self.lock:
+                self.count_retry += 1
+            index_retry += 1
+            await asyncio.sleep(time_backoff)
+
+    async def call_attempt_async(
+        self, callable_attempt: Callable[[Optional[float]], Awaitable[T]], time_end: Optional[float]
+    ) -> T:
+        timeout = None if time_end is None else max(0.0, time_end - time.monotonic())
+        return await callable_attempt(timeout)
+
+    async def call_hedged_async(
+        self,
+        key: str,
+        callable_attempt: Callable[[Optional[float]], Awaitable[T]],
+        callable_discard: Optional[Callable[[T], Awaitable[Any]]],
+        time_end: Optional[float],
+    ) -> T:
+        time_start = time.monotonic()
+        if self.get_time_hedge(key) is None:
+            result = await self.call_attempt_async(callable_attempt, time_end)
+            self.histogram_latency.add(key, time.monotonic() - time_start)
+            return result
+        set_task: Set[asyncio.Future] = {asyncio.ensure_future(self.call_attempt_async(callable_attempt, time_end))}
+        list_result_lost = []
+        count_attempt = 1
+        try:
+            while True:
+                time_hedge = self.get_time_hedge(key) if count_attempt <= self.count_hedge_max else None
+                set_done, set_task = await asyncio.wait(set_task, timeout=time_hedge, return_when=FIRST_COMPLETED)
+                if len(set_done) == 0:
+                    with self.lock:
+                        self.count_hedge += 1
+                    count_attempt += 1
+                    set_task.add(asyncio.ensure_future(self.call_attempt_async(callable_attempt, time_end)))
+                    continue
+                list_task_answered = [task for task in set_done if task.exception() is None]
+                if 0 < len(list_task_answered):
+                    list_result_lost = [task.result() for task in list_task_answered[1:]]
+                    self.histogram_latency.add(key, time.monotonic() - time_start)
+                    return list_task_answered[0].result()
+                if len(set_task) == 0:
+                    raise list(set_done)[0].exception()  # type: ignore
+        finally:
+            # attempts still running are cancelled, which closes their connections
+            for task in set_task:
+                task.cancel()
+            for result_lost in await asyncio.gather(*set_task, return_exceptions=True):
+                if not isinstance(result_lost, BaseException):
+                    list_result_lost.append(result_lost)
+            if callable_discard is not None:
+                for result_lost in list_result_lost:
+                    await callable_discard(result_lost)
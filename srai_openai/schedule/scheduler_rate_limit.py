@@ -0,0 +1,170 @@
+import asyncio
+import heapq
+import itertools
+import time
+from threading import Condition
+from typing import Dict, List, Mapping, Optional, Tuple
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BATCH = 2
+
+TIME_POLL_ASYNC = 0.05
+# waiters behind the first in line are woken when the line moves, this only bounds a missed wakeup
+TIME_WAIT_QUEUED = 1.0
+
+
+class RateLimitBucket:
+    # request and token buckets of one model, both refill continuously up to their per minute limit
+    # waiting requests are served strictly by priority and then in arrival order
+
+    def __init__(self, count_request_per_minute: int, count_token_per_minute: int) -> None:
+        self.count_request_per_minute = count_request_per_minute
+        self.count_token_per_minute = count_token_per_minute
+        self.count_request_available = float(count_request_per_minute)
+        self.count_token_available = float(count_token_per_minute)
+        self.time_refill = time.monotonic()
+        self.list_ticket_waiting: List[Tuple[int, int]] = []
+
+    def refill(self) -> None:
+        time_now = time.monotonic()
+        time_elapsed = time_now - self.time_refill
+        self.time_refill = time_now
+        self.count_request_available = min(
+            float(self.count_request_per_minute),
+            self.count_request_available + time_elapsed * self.count_request_per_minute / 60,
+        )
+        self.count_token_available = min(
+            float(self.count_token_per_minute),
+            self.count_token_available + time_elapsed * self.count_token_per_minute / 60,
+        )
+
+    def get_time_wait(self, count_token: int) -> float:
+        # seconds until both buckets hold enough for this request, zero if they already do
+        count_token = min(count_token, self.count_token_per_minute)
+        count_request_missing = 1 - self.count_request_available
+        count_token_missing = count_token - self.count_token_available
+        return max(
+            0.0,
+            count_request_missing * 60 / self.count_request_per_minute,
+            count_token_missing * 60 / self.count_token_per_minute,
+        )
+
+
+class SchedulerRateLimit:
+    # client side requests and tokens per minute limits per model, shared by all clients that are given it
+    # higher priority requests (lower numbers) go first, so interactive traffic is not stuck behind batch jobs
+    # limits are taken from the x-ratelimit headers of responses once they are seen
+
+    def __init__(
+        self,
+        dict_model_id_limit: Optional[Dict[str, Tuple[int, int]]] = None,
+        *,
+        count_request_per_minute_default: int = 500,
+        count_token_per_minute_default: int = 30000,
+    ) -> None:
+        # dict_model_id_limit maps a model id to its requests per minute and tokens per minute
+        self.dict_model_id_limit = dict(dict_model_id_limit or {})
+        self.count_request_per_minute_default = count_request_per_minute_default
+        self.count_token_per_minute_default = count_token_per_minute_default
+        self.dict_model_id_bucket: Dict[str, RateLimitBucket] = {}
+        self.condition = Condition()
+        self.iterator_sequence = itertools.count()
+
+    def get_bucket(self, model_id: str) -> RateLimitBucket:
+        # callers hold the condition
+        bucket = self.dict_model_id_bucket.get(model_id)
+        if bucket is None:
+            count_request_per_minute, count_token_per_minute = self.dict_model_id_limit.get(
+                model_id, (self.count_request_per_minute_default, self.count_token_per_minute_default)
+            )
+            bucket = RateLimitBucket(count_request_per_minute, count_token_per_minute)
+            self.dict_model_id_bucket[model_id] = bucket
+        return bucket
+
+    def enqueue(self, model_id: str, priority: int) -> Tuple[int, int]:
+        ticket = (priority, next(self.iterator_sequence))
+        with self.condition:
+            heapq.heappush(self.get_bucket(model_id).list_ticket_waiting, ticket)
+        return ticket
+
+    def try_acquire(self, model_id: str, count_token: int, ticket: Tuple[int, int]) -> Optional[float]:
+        # takes the budget and returns None when the ticket is first in line and the budget is there
+        # otherwise returns how long to wait before trying again, callers hold the condition
+        bucket = self.get_bucket(model_id)
+        bucket.refill()
+        if bucket.list_ticket_waiting[0] != ticket:
+            return TIME_WAIT_QUEUED
+        time_wait = bucket.get_time_wait(count_token)
+        if 0 < time_wait:
+            return time_wait
+        heapq.heappop(bucket.list_ticket_waiting)
+        bucket.count_request_available -= 1
+        bucket.count_token_available -= count_token
+        self.condition.notify_all()
+        return None
+
+    def cancel(self, model_id: str, ticket: Tuple[int, int]) -> None:
+        with self.condition:
+            bucket = self.get_bucket(model_id)
+            if ticket in bucket.list_ticket_waiting:
+                bucket.list_ticket_waiting.remove(ticket)
+                heapq.heapify(bucket.list_ticket_waiting)
+                self.condition.notify_all()
+
+    def acquire(self, model_id: str, count_token: int, priority: int = PRIORITY_DEFAULT) -> None:
+        # blocks until the request may be sent, count_token is the estimate of the tokens it will use
+        ticket = self.enqueue(model_id, priority)
+        try:
+            with self.condition:
+                while True:
+                    time_wait = self.try_acquire(model_id, count_token, ticket)
+                    if time_wait is None:
+                        return
+                    self.condition.wait(time_wait)
+        except BaseException:
+            self.cancel(model_id, ticket)
+            raise
+
+    async def acquire_async(self, model_id: str, count_token: int, priority: int = PRIORITY_DEFAULT) -> None:
+        ticket = self.enqueue(model_id, priority)
+        try:
+            while True:
+                with self.condition:
+                    time_wait = self.try_acquire(model_id, count_token, ticket)
+                if time_wait is None:
+                    return
+                # polled so that a request that moves to the front of the line does not wait for its full delay
+                await asyncio.sleep(min(time_wait, TIME_POLL_ASYNC))
+        except BaseException:
+            self.cancel(model_id, ticket)
+            raise
+
+    def settle(self, model_id: str, count_token_estimated: int, count_token_used: int) -> None:
+        # corrects the token bucket once the real usage of a request is known, a refund never overfills the bucket
+        with self.condition:
+            bucket = self.get_bucket(model_id)
+            bucket.count_token_available = min(
+                bucket.count_token_available + count_token_estimated - count_token_used, bucket.count_token_per_minute
+            )
+            self.condition.notify_all()
+
+    def update_from_headers(self, model_id: str, headers: Mapping[str, str]) -> None:
+        with self.condition:
+            bucket = self.get_bucket(model_id)
+            bucket.refill()
+            if "x-ratelimit-limit-requests" in headers:
+                bucket.count_request_per_minute = int(headers["x-ratelimit-limit-requests"])
+            if "x-ratelimit-limit-tokens" in headers:
+                bucket.count_token_per_minute = int(headers["x-ratelimit-limit-tokens"])
+            bucket.count_request_available = min(bucket.count_request_available, bucket.count_request_per_minute)
+            bucket.count_token_available = min(bucket.count_token_available, bucket.count_token_per_minute)
+            # the server does not know about requests still in flight here, so only ever lower the local budget
+            if "x-ratelimit-remaining-requests" in headers:
+                count_request_remaining = float(headers["x-ratelimit-remaining-requests"])
+                bucket.count_request_available = min(bucket.count_request_available, count_request_remaining)
+            if "x-ratelimit-remaining-tokens" in headers:
+                count_token_remaining = float(headers["x-ratelimit-remaining-tokens"])
+                bucket.count_token_available = min(bucket.count_token_available, count_token_remaining)
+            self.dict_model_id_limit[model_id] = (bucket.count_request_per_minute, bucket.count_token_per_minute)
+            self.condition.notify_all()
@@ -0,0 +1,66 @@
+import os
+import sqlite3
+from threading import Lock
+from typing import Dict, List, Optional
+
+from srai_core.store.bytes_store_base import BytesStoreBase
+
+
+class BytesStoreSqlite(BytesStoreBase):
+    # bytes store in a single sqlite file, safe to share between threads
+
+    def __init__(self, path_file_sqlite: str) -> None:
+        path_dir = os.path.dirname(path_file_sqlite)
+        if path_dir != "" and not os.path.exists(path_dir):
+            os.makedirs(path_dir)
+        self.path_file_sqlite = path_file_sqlite
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path_file_sqlite, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS bytes (bytes_id TEXT PRIMARY KEY, bytes BLOB NOT NULL)")
+        self.connection.commit()
+
+    def exists_bytes(self, bytes_id: str) -> bool:
+        with self.lock:
+            row = self.connection.execute("SELECT 1 FROM bytes WHERE bytes_id = ?", (bytes_id,)).fetchone()
+        return row is not None
+
+    def count_bytes(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM bytes").fetchone()[0]
+
+    def load_bytes(self, bytes_id: str) -> bytes:
+        with self.lock:
+            row = self.connection.execute("SELECT bytes FROM bytes WHERE bytes_id = ?", (bytes_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Document not found: {bytes_id}")
+        return row[0]
+
+    def try_load_bytes(self, bytes_id: str) -> Optional[bytes]:
+        with self.lock:
+            row = self.connection.execute("SELECT bytes FROM bytes WHERE bytes_id = ?", (bytes_id,)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def load_list_bytes_id(self) -> List[str]:
+        with self.lock:
+            return [row[0] for row in self.connection.execute("SELECT bytes_id FROM bytes")]
+
+    def load_bytes_all(self) -> Dict[str, bytes]:
+        with self.lock:
+            return {row[0]: row[1] for row in self.connection.execute("SELECT bytes_id, bytes FROM bytes")}
+
+    def delete_bytes(self, bytes_id: str) -> None:
+        with self.lock:
+            self.connection.execute("DELETE FROM bytes WHERE bytes_id = ?", (bytes_id,))
+            self.connection.commit()
+
+    def save_bytes(self, bytes_id: str, bytes: bytes) -> None:
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO bytes (bytes_id, bytes) VALUES (?, ?)", (bytes_id, bytes))
+            self.connection.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
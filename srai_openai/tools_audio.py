@@ -0,0 +1,270 @@
+import io
+import os
+import re
+import wave
+from typing import Any, List, Tuple
+
+import numpy as np
+
+DICT_SAMPLE_WIDTH_DTYPE = {1: np.uint8, 2: np.int16, 3: np.int32, 4: np.int32}
+COUNT_BYTE_UPLOAD_MAX = 25 * 1024 * 1024
+COUNT_CHAR_SPEECH_MAX = 4096
+TIME_WINDOW_ENERGY = 0.1
+
+
+def open_audio_wav(source: Any) -> wave.Wave_read:
+    # source is a path, a bytes like buffer, a memory mapped file or a binary file object
+    # buffers and files are read in place, only the frames that are asked for are copied
+    if isinstance(source, str):
+        return wave.open(source, "rb")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return wave.open(io.BytesIO(source), "rb")
+    source.seek(0)
+    return wave.open(source, "rb")
+
+
+def is_audio_wav(source: Any) -> bool:
+    if isinstance(source, str):
+        with open(source, "rb") as file:
+            header = file.read(12)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        header = bytes(source[:12])
+    else:
+        source.seek(0)
+        header = source.read(12)
+        source.seek(0)
+    return header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+
+
+def read_audio_bytes(source: Any) -> bytes:
+    if isinstance(source, str):
+        with open(source, "rb") as file:
+            return file.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    source.seek(0)
+    return source.read()
+
+
+def get_file_name_audio(source: Any) -> str:
+    # the name the api gets the audio under, its extension tells the api the format
+    # the name of a path or a file object, buffers without a name are wav or else assumed to be mp3
+    if isinstance(source, str):
+        return os.path.basename(source)
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and os.path.splitext(name)[1] != "":
+        return os.path.basename(name)
+    if is_audio_wav(source):
+        return "audio.wav"
+    return "audio.mp3"
+
+
+def is_split_audio_wav(wave_read: wave.Wave_read, time_segment_max: float, count_byte_upload_max: int) -> bool:
+    # a wav file is only split when it is longer than time_segment_max or over the upload limit
+    count_byte = wave_read.getnframes() * wave_read.getnchannels() * wave_read.getsampwidth()
+    time_audio = wave_read.getnframes() / wave_read.getframerate()
+    return time_segment_max < time_audio or count_byte_upload_max - 1024 < count_byte
+
+
+def get_array_energy(wave_read: wave.Wave_read, time_window: float, *, time_block: float = 60.0) -> np.ndarray:
+    # rms per window over all channels, the audio is read a block at a time so long files are never all in memory
+    sample_width = wave_read.getsampwidth()
+    if sample_width not in DICT_SAMPLE_WIDTH_DTYPE:
+        raise Exception(f"wav files with {sample_width} bytes per sample are not supported")
+    count_channel = wave_read.getnchannels()
+    count_frame_window = max(1, int(time_window * wave_read.getframerate()))
+    count_frame_block = count_frame_window * max(1, int(time_block / time_window))
+    list_energy: List[np.ndarray] = []
+    wave_read.rewind()
+    while True:
+        content = wave_read.readframes(count_frame_block)
+        if len(content) == 0:
+            break
+        if sample_width == 3:
+            # 24 bit samples get a low zero byte, which scales them by 256 and leaves the quietest window in place
+            content = np.pad(np.frombuffer(content, dtype=np.uint8).reshape(-1, 3), ((0, 0), (1, 0))).tobytes()
+        array_sample = np.frombuffer(content, dtype=DICT_SAMPLE_WIDTH_DTYPE[sample_width]).astype(np.float64)
+        if sample_width == 1:
+            array_sample -= 128
+        array_sample = array_sample.reshape(-1, count_channel)
+        count_window = -(-array_sample.shape[0] // count_frame_window)
+        array_sample = np.pad(array_sample, ((0, count_window * count_frame_window - array_sample.shape[0]), (0, 0)))
+        array_window = array_sample.reshape(count_window, -1)
+        list_energy.append(np.sqrt(np.mean(array_window**2, axis=1)))
+    if len(list_energy) == 0:
+        return np.zeros(0)
+    return np.concatenate(list_energy)
+
+
+def get_list_time_cut(
+    array_energy: np.ndarray, time_window: float, time_audio: float, time_segment_max: float, time_overlap: float
+) -> List[float]:
+    # cuts at the quietest window in the second half of every segment, so words are rarely cut, the last cut is the end
+    # with the overlap on both sides a segment is never longer than time_segment_max
+    if time_segment_max <= 4 * time_overlap:
+        raise ValueError("time_segment_max must be more than four times time_overlap")
+    list_time_cut = []
+    time_start = 0.0
+    while time_segment_max - 2 * time_overlap < time_audio - time_start:
+        index_start = int((time_start + time_segment_max / 2 - time_overlap) / time_window)
+        index_end = max(index_start + 1, int((time_start + time_segment_max - 2 * time_overlap) / time_window))
+        index_quiet = index_start + int(np.argmin(array_energy[index_start:index_end]))
+        time_start = (index_quiet + 0.5) * time_window
+        list_time_cut.append(time_start)
+    list_time_cut.append(time_audio)
+    return list_time_cut
+
+
+def get_list_segment(list_time_cut: List[float], time_overlap: float) -> List[Tuple[float, float]]:
+    # start and end of every segment, each reaches time_overlap past its cuts
+    list_segment = []
+    time_cut_previous = 0.0
+    for time_cut in list_time_cut:
+        list_segment.append(
+            (max(0.0, time_cut_previous - time_overlap), min(list_time_cut[-1], time_cut + time_overlap))
+        )
+        time_cut_previous = time_cut
+    return list_segment
+
+
+def get_list_segment_for_audio_wav(
+    wave_read: wave.Wave_read, time_segment_max: float, time_overlap: float, count_byte_upload_max: int
+) -> Tuple[List[Tuple[float, float]], List[float]]:
+    # segments and cuts of a wav file, segments are shortened to stay under the upload limit
+    count_byte_second = wave_read.getframerate() * wave_read.getnchannels() * wave_read.getsampwidth()
+    time_segment_max = min(time_segment_max, (count_byte_upload_max - 1024) / count_byte_second)
+    time_audio = wave_read.getnframes() / wave_read.getframerate()
+    array_energy = get_array_energy(wave_read, TIME_WINDOW_ENERGY)
+    list_time_cut = get_list_time_cut(array_energy, TIME_WINDOW_ENERGY, time_audio, time_segment_max, time_overlap)
+    return get_list_segment(list_time_cut, time_overlap), list_time_cut
+
+
+def create_audio_wav_segment(wave_read: wave.Wave_read, time_start: float, time_end: float) -> bytes:
+    # a wav file of the frames between time_start and time_end, with the parameters of the source
+    sample_rate = wave_read.getframerate()
+    index_frame_start = int(time_start * sample_rate)
+    index_frame_end = min(wave_read.getnframes(), int(time_end * sample_rate))
+    wave_read.setpos(index_frame_start)
+    content = wave_read.readframes(index_frame_end - index_frame_start)
+    bytes_io = io.BytesIO()
+    with wave.open(bytes_io, "wb") as wave_write:
+        wave_write.setnchannels(wave_read.getnchannels())
+        wave_write.setsampwidth(wave_read.getsampwidth())
+        wave_write.setframerate(sample_rate)
+        wave_write.writeframes(content)
+    return bytes_io.getvalue()
+
+
+def stitch_transcription(
+    list_transcription: List[dict], list_segment: List[Tuple[float, float]], list_time_cut: List[float]
+) -> dict:
+    # shifts the words and segments of every verbose_json transcription by the start of its audio segment
+    # in the overlaps a word or segment is kept by the audio segment whose cuts hold its middle, so none is doubled
+    list_word: List[dict] = []
+    list_segment_text: List[dict] = []
+    time_cut_previous = 0.0
+    for index, (transcription, (time_offset, _)) in enumerate(zip(list_transcription, list_segment)):
+        time_cut = list_time_cut[index] if index < len(list_time_cut) - 1 else float("inf")
+        for key, list_item in [("words", list_word), ("segments", list_segment_text)]:
+            for item in transcription.get(key) or []:
+                start = item["start"] + time_offset
+                end = item["end"] + time_offset
+                if time_cut_previous <= (start + end) / 2 < time_cut:
+                    list_item.append(dict(item, start=start, end=end))
+        time_cut_previous = time_cut
+    for index, segment_text in enumerate(list_segment_text):
+        segment_text["id"] = index
+    if 0 < len(list_segment_text):
+        text = " ".join(segment_text["text"].strip() for segment_text in list_segment_text)
+    else:
+        text = " ".join(word["word"].strip() for word in list_word)
+    return {
+        "task": "transcribe",
+        "language": list_transcription[0].get("language") if 0 < len(list_transcription) else None,
+        "duration": list_time_cut[-1] if 0 < len(list_time_cut) else 0.0,
+        "text": text,
+        "words": list_word,
+        "segments": list_segment_text,
+    }
+
+
+def split_text_sentence(text: str, count_char_max: int) -> List[str]:
+    # sentences, with the ones longer than count_char_max split at the last space that fits
+    list_sentence = []
+    for sentence in re.split(r"(?<=[.!?])\s+|\n\s*\n", text.strip()):
+        sentence = sentence.strip()
+        while count_char_max < len(sentence):
+            index_split = sentence.rfind(" ", 0, count_char_max + 1)
+            if index_split <= 0:
+                index_split = count_char_max
+            list_sentence.append(sentence[:index_split].strip())
+            sentence = sentence[index_split:].strip()
+        if sentence != "":
+            list_sentence.append(sentence)
+    return list_sentence
+
+
+def split_text_speech(text: str, count_char_max: int) -> List[str]:
+    # the first chunk is the first sentence alone so its audio is there after one short request
+    # the other sentences are packed into chunks of at most count_char_max characters
+    list_sentence = split_text_sentence(text, count_char_max)
+    list_text = list_sentence[:1]
+    for sentence in list_sentence[1:]:
+        if 1 < len(list_text) and len(list_text[-1]) + 1 + len(sentence) <= count_char_max:
+            list_text[-1] += " " + sentence
+        else:
+            list_text.append(sentence)
+    return list_text
+
+
+def get_index_data_wav(content: bytes) -> Tuple[int, int]:
+    # offset and length of the samples in a wav file, the length is unknown (0xffffffff) in a streamed wav
+    index = 12
+    while index + 8 <= len(content):
+        chunk_id = content[index : index + 4]
+        count_byte_chunk = int.from_bytes(content[index + 4 : index + 8], "little")
+        if chunk_id == b"data":
+            return index + 8, min(count_byte_chunk, len(content) - index - 8)
+        index += 8 + count_byte_chunk + count_byte_chunk % 2
+    raise Exception("wav audio has no data chunk")
+
+
+def get_audio_segment_for_concatenation(content: bytes, response_format: str, is_first: bool) -> bytes:
+    # the part of a synthesized segment that goes into the concatenation of all segments
+    # - mp3 frames concatenate, only the id3 tags are dropped from all segments but the first
+    # - wav keeps the header of the first segment with unknown sizes, as in a streamed wav, and the samples of the rest
+    # - pcm, aac (adts frames) and opus (a chain of ogg streams) concatenate as they are
+    # - flac can not be concatenated because its header holds the totals of the whole stream
+    if response_format == "mp3":
+        if content[-128:-125] == b"TAG":
+            content = content[:-128]
+        if not is_first and content[:3] == b"ID3":
+            count_byte_tag = 10 + sum(byte << (7 * (3 - index)) for index, byte in enumerate(content[6:10]))
+            if content[5] & 0x10:
+                count_byte_tag += 10
+            content = content[count_byte_tag:]
+        return content
+    if response_format == "wav":
+        index_data, count_byte_data = get_index_data_wav(content)
+        content_data = content[index_data : index_data + count_byte_data]
+        if not is_first:
+            return content_data
+        header = bytearray(content[:index_data])
+        header[4:8] = b"\xff\xff\xff\xff"
+        header[index_data - 4 : index_data] = b"\xff\xff\xff\xff"
+        return bytes(header) + content_data
+    if response_format == "flac":
+        raise ValueError("flac segments can not be concatenated, use another response format")
+    return content
+
+
+def update_header_wav(file: Any) -> None:
+    # sets the sizes in the header of a wav file that was written as a stream, file is open for reading and writing
+    file.seek(0, io.SEEK_END)
+    count_byte = file.tell()
+    file.seek(0)
+    index_data, _ = get_index_data_wav(file.read(4096))
+    file.seek(4)
+    file.write((count_byte - 8).to_bytes(4, "little"))
+    file.seek(index_data - 4)
+    file.write((count_byte - index_data).to_bytes(4, "little"))
@@ -0,0 +1,104 @@
+import asyncio
+import weakref
+from functools import lru_cache
+from threading import Lock
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+from srai_openai.model.http_client_config import HttpClientConfig
+
+
+class TransportAsyncPerLoop(httpx.AsyncBaseTransport):
+    # async connections belong to the event loop that opened them, so the shared async pool is one pool per loop
+    # pools of loops that are gone are dropped with their loop
+
+    def __init__(self, http_client_config: HttpClientConfig) -> None:
+        self.http_client_config = http_client_config
+        self.dict_loop_transport: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self.lock = Lock()
+
+    def get_transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            transport = self.dict_loop_transport.get(loop)
+            if transport is None:
+                transport = httpx.AsyncHTTPTransport(
+                    limits=self.http_client_config.create_limits(), http2=self.http_client_config.is_http2
+                )
+                self.dict_loop_transport[loop] = transport
+            return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.get_transport().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        # only the pool of the running loop can be closed from here
+        with self.lock:
+            transport = self.dict_loop_transport.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+class HttpClientShared(DefaultHttpxClient):
+    # the pool of all clients of one config, closing one of them (client.close() or with OpenAI(...)) must not close
+    # the pool for the others, so closing it does nothing and it lives as long as the process
+
+    def close(self) -> None:
+        pass
+
+    def __exit__(self, *args) -> None:
+        pass
+
+
+class HttpClientSharedAsync(DefaultAsyncHttpxClient):
+
+    async def aclose(self) -> None:
+        pass
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+
+@lru_cache(maxsize=None)
+def get_http_client(http_client_config: HttpClientConfig) -> httpx.Client:
+    # one client per config for the whole process, so connections and tls sessions are reused across clients
+    return HttpClientShared(
+        limits=http_client_config.create_limits(),
+        timeout=http_client_config.create_timeout(),
+        http2=http_client_config.is_http2,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_http_client_async(http_client_config: HttpClientConfig) -> httpx.AsyncClient:
+    return HttpClientSharedAsync(
+        transport=TransportAsyncPerLoop(http_client_config),
+        timeout=http_client_config.create_timeout(),
+    )
+
+
+def create_client_openai(api_key: str, http_client_config: Optional[HttpClientConfig] = None, **kwds) -> OpenAI:
+    # kwds are passed to OpenAI, the timeout of the config is set on the client as it overrides the one of the pool
+    if http_client_config is None:
+        http_client_config = HttpClientConfig()
+    return OpenAI(
+        api_key=api_key,
+        http_client=get_http_client(http_client_config),
+        timeout=http_client_config.create_timeout(),
+        **kwds,
+    )
+
+
+def create_client_openai_async(
+    api_key: str, http_client_config: Optional[HttpClientConfig] = None, **kwds
+) -> AsyncOpenAI:
+    if http_client_config is None:
+        http_client_config = HttpClientConfig()
+    return AsyncOpenAI(
+        api_key=api_key,
+        http_client=get_http_client_async(http_client_config),
+        timeout=http_client_config.create_timeout(),
+        **kwds,
+    )
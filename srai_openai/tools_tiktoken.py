@@ -0,0 +1,78 @@
+import base64
+import math
+import struct
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import tiktoken
+
+TOKEN_COUNT_PER_MESSAGE = 3
+TOKEN_COUNT_PER_NAME = 1
+TOKEN_COUNT_REPLY_PRIMING = 3
+TOKEN_COUNT_PER_TOOL_CALL = 3
+TOKEN_COUNT_IMAGE_BASE = 85
+TOKEN_COUNT_IMAGE_TILE = 170
+TOKEN_COUNT_IMAGE_UNKNOWN = 765  # a 1024 by 1024 image in high detail
+
+DICT_MODEL_ID_PREFIX_ENCODING_NAME = {
+    "gpt-4o": "cl100k_base",
+    "gpt-4": "cl100k_base",
+    "gpt-3.5-turbo": "cl100k_base",
+    "text-embedding-3": "cl100k_base",
+    "text-embedding-ada-002": "cl100k_base",
+}
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str) -> tiktoken.Encoding:
+    return tiktoken.get_encoding(encoding_name)
+
+
+@lru_cache(maxsize=None)
+def get_encoding_name_for_model_id(model_id: str) -> str:
+    # longest prefix wins so that for example gpt-4o is not resolved as gpt-4
+    for prefix in sorted(DICT_MODEL_ID_PREFIX_ENCODING_NAME, key=len, reverse=True):
+        if model_id.startswith(prefix):
+            return DICT_MODEL_ID_PREFIX_ENCODING_NAME[prefix]
+    try:
+        return tiktoken.encoding_name_for_model(model_id)
+    except KeyError:
+        raise Exception(f"model {model_id} not supported")
+
+
+def get_encoding_for_model_id(model_id: str) -> tiktoken.Encoding:
+    return get_encoding(get_encoding_name_for_model_id(model_id))
+
+
+def count_token_batch(model_id: str, list_text: List[str], *, count_thread: int = 8) -> List[int]:
+    encoding = get_encoding_for_model_id(model_id)
+    return [len(list_token) for list_token in encoding.encode_ordinary_batch(list_text, num_threads=count_thread)]
+
+
+def get_image_size_for_url(url: str) -> Optional[Tuple[int, int]]:
+    # only inline png data urls are measured, the width and height are in the first 24 bytes of the file
+    if not url.startswith("data:image/png;base64,"):
+        return None
+    header = base64.b64decode(url[len("data:image/png;base64,") :][:32] + "==")
+    if len(header) < 24 or header[:8] != b"\x89PNG\r\n\x1a\n":
+        return None
+    width, height = struct.unpack(">II", header[16:24])
+    return width, height
+
+
+def count_token_image_url(url: str, detail: str = "auto") -> int:
+    if detail == "low":
+        return TOKEN_COUNT_IMAGE_BASE
+    image_size = get_image_size_for_url(url)
+    if image_size is None:
+        return TOKEN_COUNT_IMAGE_UNKNOWN
+    width, height = image_size
+    if width == 0 or height == 0:
+        return TOKEN_COUNT_IMAGE_BASE
+    # the image is scaled to fit in 2048 by 2048 and then so that its shortest side is 768
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    count_tile = math.ceil(width / 512) * math.ceil(height / 512)
+    return TOKEN_COUNT_IMAGE_BASE + TOKEN_COUNT_IMAGE_TILE * count_tile
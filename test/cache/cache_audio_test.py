@@ -0,0 +1,86 @@
+import asyncio
+import os
+import tempfile
+
+from srai_openai.cache.cache_audio import CacheAudio
+from srai_openai.client_openai_audio import ClientOpenaiAudio
+from srai_openai.client_openai_audio_async import ClientOpenaiAudioAsync
+from srai_openai.mock.server_openai_mock import ServerOpenaiMock
+
+
+def test_cache_audio_speech():
+    text = "This is a test of the speech cache."
+    with tempfile.TemporaryDirectory() as path_dir, ServerOpenaiMock() as server_openai_mock:
+        dict_path_count_request = server_openai_mock.dict_path_count_request
+        cache_audio = CacheAudio(path_dir)
+        client = ClientOpenaiAudio("no key needed", base_url=server_openai_mock.base_url, cache_audio=cache_audio)
+        content = client.text_to_speech_for_bytes(text, response_format="wav")
+        assert cache_audio.count_miss == 1
+        assert cache_audio.count_entry == 1
+        speech_stream = client.stream_text_to_speech(text, response_format="wav")
+        assert b"".join(speech_stream) == content
+        assert speech_stream.time_to_first_byte is not None
+        assert cache_audio.count_hit == 1
+        assert dict_path_count_request["/v1/audio/speech"] == 1
+
+        # a stream that is not read to the end is not cached
+        speech_stream = client.stream_text_to_speech(text, response_format="mp3")
+        next(iter(speech_stream))
+        speech_stream.close()
+        assert cache_audio.count_entry == 1
+        assert client.text_to_speech_for_bytes(text, response_format="wav", bypass_cache=True) == content
+        assert dict_path_count_request["/v1/audio/speech"] == 3
+
+        client_async = ClientOpenaiAudioAsync(
+            "no key needed", base_url=server_openai_mock.base_url, cache_audio=CacheAudio(path_dir)
+        )
+        assert asyncio.run(client_async.text_to_speech_for_bytes(text, response_format="wav")) == content
+        assert dict_path_count_request["/v1/audio/speech"] == 3
+        assert not any(file_name.endswith(".tmp") for file_name in os.listdir(os.path.join(path_dir, "speech")))
+
+
+def test_cache_audio_transcription():
+    with tempfile.TemporaryDirectory() as path_dir, ServerOpenaiMock() as server_openai_mock:
+        dict_path_count_request = server_openai_mock.dict_path_count_request
+        cache_audio = CacheAudio(path_dir)
+        client = ClientOpenaiAudio("no key needed", base_url=server_openai_mock.base_url, cache_audio=cache_audio)
+        content = client.text_to_speech_for_bytes("Transcribe this.", response_format="wav")
+        transcription = client.transcription_for_bytes(content, "audio.wav")
+        assert client.transcription_for_bytes(content, "other.wav") == transcription
+        assert cache_audio.count_hit == 1
+        assert dict_path_count_request["/v1/audio/transcriptions"] == 1
+        client.transcription_for_bytes(content, "audio.wav", language="en")
+        assert dict_path_count_request["/v1/audio/transcriptions"] == 2
+
+        client_async = ClientOpenaiAudioAsync(
+            "no key needed", base_url=server_openai_mock.base_url, cache_audio=cache_audio
+        )
+        assert asyncio.run(client_async.transcription_for_bytes(content, "audio.wav")) == transcription
+        assert dict_path_count_request["/v1/audio/transcriptions"] == 2
+
+
+def test_cache_audio_evict():
+    with tempfile.TemporaryDirectory() as path_dir:
+        cache_audio = CacheAudio(path_dir, count_byte_max=2500)
+        for index in range(3):
+            cache_audio.save_transcription(bytes([index]), "model", {}, {"text": "a" * 1000})
+        assert cache_audio.count_entry == 2
+        assert cache_audio.count_evict == 1
+        assert cache_audio.load_transcription(bytes([0]), "model", {}) is None
+        assert cache_audio.load_transcription(bytes([1]), "model", {}) == {"text": "a" * 1000}
+
+        # entry 1 was used last, so entry 2 goes first
+        cache_audio.save_transcription(bytes([3]), "model", {}, {"text": "a" * 1000})
+        assert cache_audio.load_transcription(bytes([2]), "model", {}) is None
+        cache_audio = CacheAudio(path_dir, count_byte_max=2500)
+        assert cache_audio.count_entry == 2
+        assert cache_audio.load_transcription(bytes([1]), "model", {}) is not None
+        cache_audio.clear()
+        assert cache_audio.count_entry == 0
+        assert cache_audio.count_byte == 0
+
+
+if __name__ == "__main__":
+    test_cache_audio_speech()
+    test_cache_audio_transcription()
+    test_cache_audio_evict()
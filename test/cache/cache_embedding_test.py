@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+import numpy as np
+
+from srai_openai.cache.cache_embedding import CacheEmbedding
+from srai_openai.cache.cache_lru import CacheLru
+
+
+def test_cache_lru():
+    cache_lru = CacheLru(2)
+    cache_lru.set("a", 1)
+    cache_lru.set("b", 2)
+    assert cache_lru.get("a") == 1
+    cache_lru.set("c", 3)
+    assert cache_lru.get("b") is None
+    assert cache_lru.get("a") == 1
+    assert len(cache_lru) == 2
+
+
+def test_cache_embedding():
+    with tempfile.TemporaryDirectory() as path_dir:
+        path_file_sqlite = os.path.join(path_dir, "embedding.sqlite")
+        cache_embedding = CacheEmbedding(path_file_sqlite, count_item_memory_max=2)
+        list_text = ["a", "b", "c"]
+        matrix = np.arange(12, dtype=np.float32).reshape(3, 4)
+        assert cache_embedding.load_list_vector("model", None, list_text) == [None, None, None]
+        assert cache_embedding.count_miss == 3
+        cache_embedding.save_list_vector("model", None, list_text, matrix)
+        list_vector = cache_embedding.load_list_vector("model", None, list_text)
+        assert np.array_equal(np.stack(list_vector), matrix)  # type: ignore
+        assert cache_embedding.count_hit_memory == 2
+        assert cache_embedding.count_hit_disk == 1
+        assert cache_embedding.load_vector("model", 256, "a") is None
+        cache_embedding.close()
+
+        cache_embedding = CacheEmbedding(path_file_sqlite)
+        assert cache_embedding.count_vector_disk() == 3
+        assert np.array_equal(cache_embedding.load_vector("model", None, "c"), matrix[2])  # type: ignore
+        assert cache_embedding.rate_hit == 1.0
+        cache_embedding.close()
+
+
+if __name__ == "__main__":
+    test_cache_lru()
+    test_cache_embedding()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import time
+
+from srai_openai.cache.cache_prompt_config import CachePromptConfig
+from srai_openai.model.prompt_config import PromptConfig
+from srai_openai.store.bytes_store_sqlite import BytesStoreSqlite
+
+
+def test_cache_prompt_config():
+    message = {"role": "assistant", "content": "Hello", "tool_calls": None, "function_call": None}
+    prompt_config = PromptConfig.create("gpt-4o", "You are a helpfull assistent").append_user_message("Hi")
+    prompt_config_other = PromptConfig.create("gpt-4o", "You are a helpfull assistent").append_user_message("Hey")
+    with tempfile.TemporaryDirectory() as path_dir:
+        bytes_store = BytesStoreSqlite(os.path.join(path_dir, "prompt.sqlite"))
+        cache_prompt_config = CachePromptConfig(bytes_store)
+        assert cache_prompt_config.load_response(prompt_config) is None
+        cache_prompt_config.save_response(prompt_config, "stop", message)
+        assert cache_prompt_config.load_response(prompt_config) == ("stop", message)
+        assert cache_prompt_config.load_response(prompt_config_other) is None
+        assert cache_prompt_config.count_hit == 1
+        assert cache_prompt_config.count_miss == 2
+
+        # a new cache on the same store only has the persistent tier
+        cache_prompt_config = CachePromptConfig(bytes_store)
+        assert cache_prompt_config.load_response(prompt_config) == ("stop", message)
+        bytes_store.close()
+
+
+def test_cache_prompt_config_time_to_live():
+    message = {"role": "assistant", "content": "Hello", "tool_calls": None, "function_call": None}
+    prompt_config = PromptConfig.create("gpt-4o", "You are a helpfull assistent").append_user_message("Hi")
+    cache_prompt_config = CachePromptConfig(time_to_live=0.05)
+    cache_prompt_config.save_response(prompt_config, "stop", message)
+    assert cache_prompt_config.load_response(prompt_config) is not None
+    time.sleep(0.1)
+    assert cache_prompt_config.load_response(prompt_config) is None
+
+
+if __name__ == "__main__":
+    test_cache_prompt_config()
+    test_cache_prompt_config_time_to_live()
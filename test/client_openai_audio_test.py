@@ -0,0 +1,152 @@
+import asyncio
+import io
+import mmap
+import os
+import tempfile
+import wave
+
+import numpy as np
+
+from srai_openai.client_openai_audio import ClientOpenaiAudio
+from srai_openai.client_openai_audio_async import ClientOpenaiAudioAsync
+from srai_openai.mock.server_openai_mock import ServerOpenaiMock
+from srai_openai.tools_audio import COUNT_CHAR_SPEECH_MAX, get_file_name_audio, split_text_speech
+
+
+def test_stream_text_to_speech():
+    text = "This is a test of the streaming speech api, it should arrive in chunks."
+    with ServerOpenaiMock(time_latency=0.02, time_chunk=0.005) as server_openai_mock:
+        client = ClientOpenaiAudio("no key needed", base_url=server_openai_mock.base_url)
+        speech_stream = client.stream_text_to_speech(text, response_format="wav")
+        list_chunk = list(speech_stream)
+        assert 1 < len(list_chunk)
+        assert 0.02 <= speech_stream.time_to_first_byte < speech_stream.time_total  # type: ignore
+        assert speech_stream.count_byte == sum(len(chunk) for chunk in list_chunk)
+
+        content = client.text_to_speech_for_bytes(text, response_format="wav")
+        assert content == b"".join(list_chunk)
+        list_chunk_sink = []
+        client.stream_text_to_speech(text, response_format="wav").write_to(list_chunk_sink.append)
+        assert b"".join(list_chunk_sink) == content
+        with tempfile.TemporaryDirectory() as path_dir:
+            path_file_audio = os.path.join(path_dir, "speech.wav")
+            client.text_to_speech_for_file(text, path_file_audio, response_format="wav")
+            with open(path_file_audio, "rb") as file:
+                assert file.read() == content
+
+        client_async = ClientOpenaiAudioAsync("no key needed", base_url=server_openai_mock.base_url)
+        assert asyncio.run(client_async.text_to_speech_for_bytes(text, response_format="wav")) == content
+
+
+def create_audio_wav_burst(time_audio: float, *, sample_rate: int = 16000, sample_width: int = 2) -> bytes:
+    # tone bursts of 0.1 to 0.3 seconds every 0.8 seconds, with silence in between
+    array_time = np.arange(int(time_audio * sample_rate)) / sample_rate
+    array_sample = np.zeros(array_time.shape[0])
+    for index in range(int(time_audio / 0.8)):
+        time_start = index * 0.8 + 0.2
+        time_end = time_start + 0.1 + 0.05 * (index % 5)
+        array_is_burst = (time_start <= array_time) & (array_time < time_end)
+        array_sample[array_is_burst] = 8000 * np.sin(2 * np.pi * 440 * array_time[array_is_burst])
+    bytes_io = io.BytesIO()
+    with wave.open(bytes_io, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(sample_width)
+        file.setframerate(sample_rate)
+        if sample_width == 3:
+            # the int16 samples as the high bytes of 24 bit samples
+            array_byte = np.frombuffer(array_sample.astype("<i2").tobytes(), dtype=np.uint8).reshape(-1, 2)
+            file.writeframes(np.pad(array_byte, ((0, 0), (1, 0))).tobytes())
+        else:
+            file.writeframes(array_sample.astype(np.int16).tobytes())
+    return bytes_io.getvalue()
+
+
+def assert_equal_words(list_word: list, list_word_expected: list) -> None:
+    assert [word["word"] for word in list_word] == [word["word"] for word in list_word_expected]
+    for word, word_expected in zip(list_word, list_word_expected):
+        assert abs(word["start"] - word_expected["start"]) < 0.015
+        assert abs(word["end"] - word_expected["end"]) < 0.015
+
+
+def test_transcription_long():
+    content = create_audio_wav_burst(30.0)
+    with ServerOpenaiMock() as server_openai_mock:
+        client = ClientOpenaiAudio("no key needed", base_url=server_openai_mock.base_url)
+        transcription_expected = client.transcription_for_bytes(content, "audio.wav")
+        assert len(transcription_expected["words"]) == 37
+        transcription = client.transcription_long(content, time_segment_max=6.0, time_overlap=0.5)
+        assert 5 < server_openai_mock.dict_path_count_request["/v1/audio/transcriptions"]
+        assert_equal_words(transcription["words"], transcription_expected["words"])
+        assert transcription["text"] == transcription_expected["text"]
+        assert transcription["duration"] == 30.0
+
+        with tempfile.TemporaryDirectory() as path_dir:
+            path_file_audio = os.path.join(path_dir, "audio.wav")
+            with open(path_file_audio, "wb") as file:
+                file.write(content)
+            with open(path_file_audio, "rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mmap_audio:
+                    transcription = client.transcription_long(mmap_audio, time_segment_max=6.0, time_overlap=0.5)
+        assert_equal_words(transcription["words"], transcription_expected["words"])
+
+        client_async = ClientOpenaiAudioAsync("no key needed", base_url=server_openai_mock.base_url)
+        transcription = asyncio.run(client_async.transcription_long(content, time_segment_max=6.0, time_overlap=0.5))
+        assert_equal_words(transcription["words"], transcription_expected["words"])
+
+    # wav audio that fits one request goes as it is, 24 bit wav can also be split
+    content_24 = create_audio_wav_burst(30.0, sample_width=3)
+    with ServerOpenaiMock() as server_openai_mock:
+        client = ClientOpenaiAudio("no key needed", base_url=server_openai_mock.base_url)
+        client.transcription_long(content_24)
+        assert server_openai_mock.dict_path_count_request["/v1/audio/transcriptions"] == 1
+        transcription = client.transcription_long(content_24, time_segment_max=6.0, time_overlap=0.5)
+        assert 6 < server_openai_mock.dict_path_count_request["/v1/audio/transcriptions"]
+        assert transcription["duration"] == 30.0
+    assert get_file_name_audio(content) == "audio.wav"
+
+    # audio that is not wav goes as it is, under the name of its path or file object
+    assert get_file_name_audio("/data/meeting.m4a") == "meeting.m4a"
+    assert get_file_name_audio(io.BytesIO(b"")) == "audio.mp3"
+    with tempfile.TemporaryDirectory() as path_dir:
+        path_file_audio = os.path.join(path_dir, "voice.ogg")
+        with open(path_file_audio, "wb") as file:
+            file.write(b"OggS")
+        with open(path_file_audio, "rb") as file:
+            assert get_file_name_audio(file) == "voice.ogg"
+
+
+def test_stream_text_to_speech_pipelined():
+    text = " ".join(f"This is sentence number {index} of a long text." for index in range(12))
+    with ServerOpenaiMock(time_latency=0.1) as server_openai_mock:
+        client = ClientOpenaiAudio("no key needed", base_url=server_openai_mock.base_url)
+        speech_stream = client.stream_text_to_speech_pipelined(
+            text, response_format="mp3", count_worker=2, count_char_max=100
+        )
+        content = b"".join(speech_stream)
+        assert content.count(b"ID3") == 1
+        # the first sentence is synthesized alone, its audio is there long before the rest
+        assert speech_stream.time_to_first_byte < speech_stream.time_total / 2  # type: ignore
+        count_request = server_openai_mock.dict_path_count_request["/v1/audio/speech"]
+        assert count_request == len(split_text_speech(text, 100))
+
+        with tempfile.TemporaryDirectory() as path_dir:
+            path_file_audio = os.path.join(path_dir, "speech.wav")
+            client.text_to_speech_for_file(text * 10, path_file_audio, response_format="wav")
+            with wave.open(path_file_audio, "rb") as file:
+                time_audio = file.getnframes() / file.getframerate()
+        list_text = split_text_speech(text * 10, COUNT_CHAR_SPEECH_MAX)
+        assert 1 < len(list_text)
+        assert abs(time_audio - sum(len(text_chunk) / 15 for text_chunk in list_text)) < 0.01
+        count_request = server_openai_mock.dict_path_count_request["/v1/audio/speech"]
+        try:
+            client.text_to_speech_for_bytes(text * 10, response_format="flac")
+            assert False, "long texts can not be synthesized as flac"
+        except ValueError:
+            pass
+        assert server_openai_mock.dict_path_count_request["/v1/audio/speech"] == count_request
+
+
+if __name__ == "__main__":
+    test_stream_text_to_speech()
+    test_transcription_long()
+    test_stream_text_to_speech_pipelined()
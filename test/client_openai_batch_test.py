@@ -0,0 +1,62 @@
+import tempfile
+
+import numpy as np
+
+from srai_openai.client_openai_batch import ClientOpenaiBatch
+from srai_openai.mock.server_openai_mock import ServerOpenaiMock
+from srai_openai.model.batch_job import BatchJob
+from srai_openai.model.chatgpt_tool import create_chatgpt_tool
+from srai_openai.model.prompt_config import PromptConfig
+
+
+def get_weather(location: str) -> str:
+    """Get the current weather in a given location.
+
+    Args:
+        location (str): Location to get the weather for.
+    Returns:
+        str: weather for the location
+    """
+    return f"The weather in {location} is sunny."
+
+
+def test_run_prompt_config():
+    list_tool_offer = [create_chatgpt_tool(get_weather).to_tool_dict()]
+    prompt_config = PromptConfig.create("gpt-4o-mini", "You are a helpfull assistent")
+    list_prompt_config = [
+        prompt_config.append_user_message("first"),
+        prompt_config.append_user_message("second"),
+        prompt_config.append_user_message("weather in Paris?", list_tool_offer=list_tool_offer),
+        PromptConfig.create("fail", "You are a helpfull assistent").append_user_message("third"),
+    ]
+    with ServerOpenaiMock(time_batch=0.2) as server_openai_mock, tempfile.TemporaryDirectory() as path_dir:
+        client = ClientOpenaiBatch(
+            "no key needed", base_url=server_openai_mock.base_url, count_line_max=3, time_poll=0.1
+        )
+        list_prompt_config_result = client.run_prompt_config(path_dir, list_prompt_config, time_max=10)
+        assert list_prompt_config_result[0].last_message_text == "echo: first"  # type: ignore
+        assert list_prompt_config_result[1].last_message_text == "echo: second"  # type: ignore
+        assert list_prompt_config_result[2].tool_calls[0]["function"]["name"] == "get_weather"  # type: ignore
+        assert list_prompt_config_result[3] is None
+        batch_job = BatchJob.load(path_dir)
+        assert len(batch_job.list_part) == 2  # type: ignore
+        assert list(client.load_dict_index_error(batch_job)) == [3]  # type: ignore
+
+        # running the job again resumes it from disk instead of submitting it again
+        count_batch = server_openai_mock.dict_path_count_request["/v1/batches"]
+        list_prompt_config_result = client.run_prompt_config(path_dir, list_prompt_config)
+        assert list_prompt_config_result[0].last_message_text == "echo: first"  # type: ignore
+        assert server_openai_mock.dict_path_count_request["/v1/batches"] == count_batch
+
+
+def test_run_embedding():
+    with ServerOpenaiMock() as server_openai_mock, tempfile.TemporaryDirectory() as path_dir:
+        client = ClientOpenaiBatch("no key needed", base_url=server_openai_mock.base_url, time_poll=0.1)
+        matrix = client.run_embedding(path_dir, ["first document", "second document"], dimensions=8)
+        assert matrix.shape == (2, 8)
+        assert np.allclose(np.linalg.norm(matrix, axis=1), 1)
+
+
+if __name__ == "__main__":
+    test_run_prompt_config()
+    test_run_embedding()
@@ -0,0 +1,46 @@
+import asyncio
+import json
+
+from srai_openai.client_openai_chatgpt_async import ClientOpenaiChatgptAsync
+
+
+def test_prompt_default_async():
+    print("test_prompt_default_async")
+    system_message_content = "You are a helpfull assitent"
+    user_message_content = "This is a test"
+    client = ClientOpenaiChatgptAsync()
+    print(asyncio.run(client.prompt_default(system_message_content, user_message_content)))
+
+
+def test_prompt_default_json_async():
+    client = ClientOpenaiChatgptAsync()
+    result = asyncio.run(
+        client.prompt_default_json(
+            "You are a helpfull assistent", "I'm fine, thank you. How are you? only respond in json"
+        )
+    )
+    print(json.dumps(result, indent=4))
+
+
+def test_prompt_default_gather_async():
+    print("test_prompt_default_gather_async")
+    system_message_content = "You are a helpfull assitent"
+    list_user_message_content = ["Name a color", "Name an animal", "Name a city"]
+    client = ClientOpenaiChatgptAsync()
+
+    async def prompt_all() -> list:
+        return await asyncio.gather(
+            *[
+                client.prompt_default(system_message_content, user_message_content)
+                for user_message_content in list_user_message_content
+            ]
+        )
+
+    for response in asyncio.run(prompt_all()):
+        print(response)
+
+
+if __name__ == "__main__":
+    test_prompt_default_async()
+    # test_prompt_default_json_async()
+    # test_prompt_default_gather_async()
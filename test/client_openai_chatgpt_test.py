@@ -1,9 +1,13 @@
+import asyncio
 import base64
 import json
 import os
+import time
 from enum import Enum
 from typing import List, Literal
 
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+
 from srai_openai.client_openai_chatgpt import ClientOpenaiChatgpt, PromptConfig
 from srai_openai.model.chatgpt_tool import ChatgptTool, create_chatgpt_tool
 
@@ -102,6 +106,138 @@ def test_prompt_config():
     print(client.prompt_for_prompt_config(prompt_config))
 
 
+def test_prompt_many():
+    print("test_prompt_many")
+    system_message_content = "You are a helpfull assitent"
+    list_prompt = [(system_message_content, f"What is {i} + {i}?") for i in range(5)]
+    client = ClientOpenaiChatgpt()
+    for index, prompt_config_result, error in client.prompt_many(list_prompt, count_worker=3):
+        assert error is None
+        print(index, prompt_config_result.last_message_text)  # type: ignore
+
+
+def test_stream_for_prompt_config():
+    client = ClientOpenaiChatgpt()
+    prompt_config = PromptConfig.create("gpt-4o", "You are a helpfull assistent")
+    prompt_config = prompt_config.append_user_message("Count from one to ten in words")
+    stream = client.stream_for_prompt_config(prompt_config)
+    for delta in stream:
+        print(delta.text, end="", flush=True)
+    print()
+    print("time to first token", stream.time_to_first_token)
+    assert stream.prompt_config_result.last_message_text == stream.text  # type: ignore
+
+
+def test_complete_tool_call_requests():
+    def get_population(city: str) -> str:
+        """
+        Get the population of a city
+
+        Args:
+            city (str): the city
+        """
+        time.sleep(0.5)
+        if city == "Atlantis":
+            raise ValueError("unknown city")
+        return f"{city} has a million inhabitants"
+
+    async def get_area(city: str) -> str:
+        """
+        Get the area of a city
+
+        Args:
+            city (str): the city
+        """
+        await asyncio.sleep(0.5)
+        return f"{city} is 100 square kilometers"
+
+    def get_history(city: str) -> str:
+        """
+        Get the history of a city
+
+        Args:
+            city (str): the city
+        """
+        time.sleep(5)
+        return f"{city} is old"
+
+    list_tool = [create_chatgpt_tool(get_population), create_chatgpt_tool(get_area), create_chatgpt_tool(get_history)]
+    dict_chatgpt_tool = {chatgpt_tool.name: chatgpt_tool for chatgpt_tool in list_tool}
+    list_call = [
+        ("get_population", "Sofia"),
+        ("get_area", "Sofia"),
+        ("get_population", "Atlantis"),
+        ("get_history", "Sofia"),
+    ]
+    message = ChatCompletionMessage.model_validate(
+        {
+            "role": "assistant",
+            "tool_calls": [
+                {
+                    "id": f"call_{index}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps({"city": city})},
+                }
+                for index, (name, city) in enumerate(list_call)
+            ],
+        }
+    )
+    prompt_config = PromptConfig.create("gpt-4o", "You are a helpfull assistent").append_user_message("Tell me")
+    prompt_config = prompt_config.append_tool_call_request(message)
+
+    client = ClientOpenaiChatgpt("no key needed", tool_timeout=1.0)
+    time_start = time.time()
+    prompt_config_result = client.complete_tool_call_requests(dict_chatgpt_tool, prompt_config)
+    assert time.time() - time_start < 2.0
+    list_event_result = prompt_config_result.list_event[-4:]
+    assert [event.event_message["tool_call_id"] for event in list_event_result] == [
+        "call_0",
+        "call_1",
+        "call_2",
+        "call_3",
+    ]
+    assert list_event_result[0].event_message["content"] == "Sofia has a million inhabitants"
+    assert list_event_result[1].event_message["content"] == "Sofia is 100 square kilometers"
+    assert list_event_result[2].event_message["content"] == "error: ValueError: unknown city"
+    assert list_event_result[3].event_message["content"] == "error: tool call timed out"
+
+    message_empty = ChatCompletionMessage.model_validate({"role": "assistant", "tool_calls": []})
+    prompt_config_empty = prompt_config.append_tool_call_request(message_empty)
+    prompt_config_result = client.complete_tool_call_requests(dict_chatgpt_tool, prompt_config_empty)
+    assert prompt_config_result.count_event == prompt_config_empty.count_event
+
+
+def test_run_agent():
+    def get_capital(country: str) -> str:
+        """
+        Get the capital of a country
+
+        Args:
+            country (str): the country
+        """
+        return {"Bulgaria": "Sofia", "France": "Paris"}.get(country, "unknown")
+
+    def get_weather(city: str) -> str:
+        """
+        Get the weather in a city
+
+        Args:
+            city (str): the city
+        """
+        return f"It is sunny in {city}"
+
+    client = ClientOpenaiChatgpt()
+    dict_chatgpt_tool = {
+        tool.name: tool for tool in [create_chatgpt_tool(get_capital), create_chatgpt_tool(get_weather)]
+    }
+    prompt_config = PromptConfig.create("gpt-4o", "You are a helpfull assistent, use the tools")
+    prompt_config = prompt_config.append_user_message("What is the weather in the capital of Bulgaria?")
+    agent_run = client.run_agent(dict_chatgpt_tool, prompt_config, count_round_max=4, token_count_max=10000)
+    print(json.dumps(agent_run.to_dict(), indent=4))
+    print(agent_run.prompt_config_result.last_message_text)
+    assert agent_run.is_answered
+
+
 if __name__ == "__main__":
     # test_list_model_id()
     # test_prompt_default()
@@ -110,3 +246,7 @@ if __name__ == "__main__":
     test_prompt_default_tool_enum()
     # test_prompt_default_tool_literal()
     # test_prompt_config()
+    # test_prompt_many()
+    # test_stream_for_prompt_config()
+    # test_complete_tool_call_requests()
+    # test_run_agent()
@@ -0,0 +1,37 @@
+import pytest
+
+from srai_openai.client_openai_embedding import ClientOpenaiEmbedding, create_list_batch_range
+
+
+def test_create_list_batch_range():
+    list_count_token = [10, 10, 10, 50, 10, 10]
+    list_batch_range = create_list_batch_range(list_count_token, count_input_max=2, count_token_max=60)
+    assert list_batch_range == [(0, 2), (2, 4), (4, 6)]
+    list_batch_range = create_list_batch_range(list_count_token, count_input_max=10, count_token_max=60)
+    assert list_batch_range == [(0, 3), (3, 5), (5, 6)]
+    assert create_list_batch_range([], count_input_max=10, count_token_max=60) == []
+    with pytest.raises(ValueError):
+        create_list_batch_range([61], count_input_max=10, count_token_max=60)
+
+
+def test_get_embedding():
+    print("test_get_embedding")
+    client = ClientOpenaiEmbedding()
+    embedding = client.get_embedding("This is a test")
+    print(len(embedding))
+
+
+def test_get_embedding_batch():
+    print("test_get_embedding_batch")
+    client = ClientOpenaiEmbedding()
+    list_text = [f"This is test number {i}" for i in range(5000)]
+    matrix = client.get_embedding_batch(list_text, count_input_max=1000)
+    assert matrix.shape[0] == len(list_text)
+    assert matrix.dtype == "float32"
+    assert matrix.flags["C_CONTIGUOUS"]
+
+
+if __name__ == "__main__":
+    test_create_list_batch_range()
+    # test_get_embedding()
+    # test_get_embedding_batch()
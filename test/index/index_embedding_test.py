@@ -0,0 +1,83 @@
+import tempfile
+
+import numpy as np
+
+from srai_openai.cache.cache_embedding import CacheEmbedding
+from srai_openai.index.index_embedding import IndexEmbedding
+
+
+def create_matrix(count_row: int, count_dimension: int = 16) -> np.ndarray:
+    return np.random.default_rng(1).standard_normal((count_row, count_dimension)).astype(np.float32)
+
+
+def test_index_embedding():
+    matrix = create_matrix(100)
+    list_id = [f"id_{index}" for index in range(100)]
+    index_embedding = IndexEmbedding(16)
+    index_embedding.add(list_id, matrix)
+    assert len(index_embedding) == 100
+
+    list_result = index_embedding.query(matrix[7], 3)
+    assert list_result[0][0] == "id_7"
+    assert abs(list_result[0][1] - 1.0) < 1e-5
+    assert list_result[0][1] >= list_result[1][1] >= list_result[2][1]
+
+    index_embedding.delete(["id_7"])
+    assert "id_7" not in index_embedding
+    assert index_embedding.query(matrix[7], 1)[0][0] != "id_7"
+
+    list_list_result = index_embedding.query_batch(matrix[10:20], 1)
+    assert [list_result[0][0] for list_result in list_list_result] == list_id[10:20]
+
+    index_embedding.add(["id_3"], matrix[50:51])
+    assert index_embedding.query(matrix[50], 2)[1][0] in ["id_3", "id_50"]
+    assert len(index_embedding) == 99
+
+
+def test_index_embedding_ivf():
+    matrix = create_matrix(2000)
+    list_id = [f"id_{index}" for index in range(2000)]
+    index_embedding = IndexEmbedding(16)
+    index_embedding.add(list_id, matrix)
+    index_embedding.build_ivf(16)
+    count_found = 0
+    for index in range(0, 2000, 50):
+        if index_embedding.query(matrix[index], 1, count_probe=4)[0][0] == list_id[index]:
+            count_found += 1
+    assert count_found == 40
+    index_embedding.add(["id_new"], matrix[3:4] * 2)
+    assert index_embedding.query(matrix[3], 2, count_probe=16)[1][0] in ["id_3", "id_new"]
+
+
+def test_index_embedding_save_load():
+    matrix = create_matrix(100)
+    list_id = [f"id_{index}" for index in range(100)]
+    index_embedding = IndexEmbedding(16)
+    index_embedding.add(list_id, matrix)
+    index_embedding.delete(["id_0"])
+    with tempfile.TemporaryDirectory() as path_dir:
+        index_embedding.save(path_dir)
+        index_embedding_loaded = IndexEmbedding.load(path_dir)
+        assert isinstance(index_embedding_loaded.matrix, np.memmap)
+        assert len(index_embedding_loaded) == 99
+        assert index_embedding_loaded.query(matrix[5], 1)[0][0] == "id_5"
+        index_embedding_loaded.add(["id_0"], matrix[0:1])
+        assert index_embedding_loaded.query(matrix[0], 1)[0][0] == "id_0"
+        del index_embedding_loaded
+
+
+def test_index_embedding_add_from_cache():
+    cache_embedding = CacheEmbedding()
+    matrix = create_matrix(3)
+    cache_embedding.save_list_vector("model", None, ["a", "b", "c"], matrix)
+    index_embedding = IndexEmbedding(16)
+    list_id_missing = index_embedding.add_from_cache(cache_embedding, "model", None, ["1", "2", "4"], ["a", "b", "d"])
+    assert list_id_missing == ["4"]
+    assert len(index_embedding) == 2
+
+
+if __name__ == "__main__":
+    test_index_embedding()
+    test_index_embedding_ivf()
+    test_index_embedding_save_load()
+    test_index_embedding_add_from_cache()
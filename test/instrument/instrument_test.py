@@ -0,0 +1,87 @@
+from typing import List
+
+from srai_openai.client_openai_chatgpt import ClientOpenaiChatgpt
+from srai_openai.client_openai_embedding import ClientOpenaiEmbedding
+from srai_openai.instrument.instrument import Instrument
+from srai_openai.instrument.sink_call_event import SinkCallEventCallback
+from srai_openai.instrument.sink_call_event_aggregator import SinkCallEventAggregator
+from srai_openai.instrument.sink_call_event_span import SinkCallEventSpan
+from srai_openai.mock.server_openai_mock import ServerOpenaiMock
+from srai_openai.model.call_event import ENDPOINT_CHAT_COMPLETION, CallEvent, get_cost
+from srai_openai.model.prompt_config import PromptConfig
+
+
+class Span:
+    def __init__(self, name: str, start_time: int, attributes: dict) -> None:
+        self.name = name
+        self.start_time = start_time
+        self.attributes = attributes
+        self.end_time = None
+
+    def end(self, end_time: int) -> None:
+        self.end_time = end_time  # type: ignore
+
+
+class Tracer:
+    # the part of the opentelemetry tracer interface that the span sink uses
+    def __init__(self) -> None:
+        self.list_span: List[Span] = []
+
+    def start_span(self, name: str, start_time: int, attributes: dict) -> Span:
+        self.list_span.append(Span(name, start_time, attributes))
+        return self.list_span[-1]
+
+
+def test_get_cost():
+    assert get_cost("gpt-4o-mini-2024-07-18", 1000000, 0, 1000000) == 0.75
+    assert get_cost("gpt-4o-2024-08-06", 1000000, 500000, 0) == 1.875
+    assert get_cost("unknown", 1000, 0, 1000) is None
+
+
+def test_instrument():
+    list_call_event: List[CallEvent] = []
+    sink_call_event_aggregator = SinkCallEventAggregator()
+    tracer = Tracer()
+    instrument = Instrument(
+        [SinkCallEventCallback(list_call_event.append), sink_call_event_aggregator, SinkCallEventSpan(tracer)]
+    )
+    with ServerOpenaiMock(time_latency=0.05) as server_openai_mock:
+        client_chatgpt = ClientOpenaiChatgpt(
+            "no key needed", base_url=server_openai_mock.base_url, instrument=instrument
+        )
+        client_embedding = ClientOpenaiEmbedding(
+            "no key needed", base_url=server_openai_mock.base_url, instrument=instrument
+        )
+        prompt_config = PromptConfig.create("gpt-4o-mini", "You are a helpfull assistent").append_user_message("hi")
+        for _ in range(3):
+            client_chatgpt.prompt_for_prompt_config(prompt_config)
+        client_embedding.get_embedding("first document")
+        try:
+            client_chatgpt.prompt_for_prompt_config(PromptConfig.create("fail", "fail").append_user_message("hi"))
+            assert False
+        except Exception:
+            pass
+
+    assert len(list_call_event) == 5
+    call_event = list_call_event[0]
+    assert call_event.endpoint == ENDPOINT_CHAT_COMPLETION
+    assert 0 < call_event.token_count_prompt and 0 < call_event.token_count_completion
+    assert 0.05 <= call_event.time_to_first_byte <= call_event.time_wall  # type: ignore
+    assert call_event.request_id is not None
+    assert 0 < call_event.cost  # type: ignore
+    assert list_call_event[-1].error is not None
+
+    dict_summary = sink_call_event_aggregator.get_summary()
+    dict_summary_chatgpt = dict_summary[f"{ENDPOINT_CHAT_COMPLETION} gpt-4o-mini"]
+    assert dict_summary_chatgpt["count_call"] == 3
+    assert 0.05 <= dict_summary_chatgpt["time_wall_p50"] <= dict_summary_chatgpt["time_wall_p99"]
+    assert dict_summary[f"{ENDPOINT_CHAT_COMPLETION} fail"]["count_error"] == 1
+
+    assert len(tracer.list_span) == 5
+    assert tracer.list_span[0].attributes["gen_ai.request.model"] == "gpt-4o-mini"
+    assert tracer.list_span[0].start_time < tracer.list_span[0].end_time  # type: ignore
+
+
+if __name__ == "__main__":
+    test_get_cost()
+    test_instrument()
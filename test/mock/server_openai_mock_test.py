@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+from srai_openai.client_openai_audio import ClientOpenaiAudio
+from srai_openai.client_openai_chatgpt import ClientOpenaiChatgpt
+from srai_openai.mock.server_openai_mock import ServerOpenaiMock, create_audio_wav
+from srai_openai.model.prompt_config import PromptConfig
+
+
+def test_server_openai_mock_stream():
+    with ServerOpenaiMock(time_chunk=0.01) as server_openai_mock:
+        client = ClientOpenaiChatgpt("no key needed", base_url=server_openai_mock.base_url)
+        prompt_config = PromptConfig.create("gpt-4o-mini", "You are a helpfull assistent").append_user_message("hi you")
+        stream = client.stream_for_prompt_config(prompt_config)
+        list_text = [delta.text for delta in stream]
+        assert list_text == ["echo:", " hi", " you"]
+        assert stream.prompt_config_result.last_message_text == "echo: hi you"
+        assert stream.usage is not None
+        assert stream.time_to_first_token < stream.time_total  # type: ignore
+
+
+def test_server_openai_mock_logprobs():
+    with ServerOpenaiMock() as server_openai_mock:
+        client = ClientOpenaiChatgpt("no key needed", base_url=server_openai_mock.base_url)
+        completion = client.client_openai.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": "hi you"}],
+            logprobs=True,
+            top_logprobs=3,
+            max_tokens=2,
+        )
+        assert completion.choices[0].finish_reason == "length"
+        assert completion.choices[0].message.content == "echo: hi"
+        list_top_logprob = completion.choices[0].logprobs.content[1].top_logprobs  # type: ignore
+        assert [top_logprob.token for top_logprob in list_top_logprob] == [" hi", " hi_1", " hi_2"]
+
+
+def test_server_openai_mock_audio():
+    with ServerOpenaiMock() as server_openai_mock:
+        client = ClientOpenaiAudio("no key needed", base_url=server_openai_mock.base_url)
+        assert client.text_to_speech_for_bytes("This is a test", response_format="wav")[:4] == b"RIFF"
+        with tempfile.TemporaryDirectory() as path_dir:
+            path_file_audio = os.path.join(path_dir, "audio.wav")
+            with open(path_file_audio, "wb") as file:
+                file.write(create_audio_wav(2.0))
+            transcription = client.transcription(path_file_audio)
+        assert transcription["words"] == [{"word": "w200", "start": 0.0, "end": 2.0}]
+
+
+def test_server_openai_mock_error():
+    with ServerOpenaiMock(dict_status_code_rate={500: 1.0}) as server_openai_mock:
+        client = ClientOpenaiChatgpt("no key needed", base_url=server_openai_mock.base_url)
+        client.client_openai = client.client_openai.with_options(max_retries=0)
+        try:
+            client.prompt_default("You are a helpfull assistent", "hi")
+            assert False
+        except Exception as error:
+            assert "injected error 500" in str(error)
+
+
+if __name__ == "__main__":
+    test_server_openai_mock_stream()
+    test_server_openai_mock_logprobs()
+    test_server_openai_mock_audio()
+    test_server_openai_mock_error()
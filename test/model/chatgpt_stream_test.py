@@ -0,0 +1,97 @@
+from openai.types.chat.chat_completion_chunk import ChatCompletionChunk
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+
+from srai_openai.model.chatgpt_stream import ChatgptDelta, ChatgptStream
+from srai_openai.model.prompt_config import ChatgptEvent, PromptConfig
+
+
+def create_chunk(delta: dict, finish_reason=None) -> ChatCompletionChunk:
+    return ChatCompletionChunk.model_validate(
+        {
+            "id": "chunk",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+    )
+
+
+def test_chatgpt_stream_text():
+    prompt_config = PromptConfig.create("gpt-4o", "You are a helpfull assistent").append_user_message("Hello")
+    list_chunk = [
+        create_chunk({"role": "assistant", "content": ""}),
+        create_chunk({"content": "Hello"}),
+        create_chunk({"content": " there"}),
+        create_chunk({}, "stop"),
+    ]
+    stream = ChatgptStream(prompt_config, list_chunk)
+    list_delta = list(stream)
+    assert [delta.text for delta in list_delta] == ["Hello", " there"]
+    assert stream.time_to_first_token is not None
+    assert stream.prompt_config_result.last_message_text == "Hello there"  # type: ignore
+    assert stream.prompt_config_result.count_event == 3  # type: ignore
+
+
+def test_chatgpt_stream_tool_call():
+    prompt_config = PromptConfig.create("gpt-4o", "You are a helpfull assistent").append_user_message("Hello")
+    list_chunk = [
+        create_chunk({"tool_calls": [{"index": 0, "id": "call_0", "type": "function", "function": {"name": "add"}}]}),
+        create_chunk(
+            {
+                "tool_calls": [
+                    {"index": 1, "id": "call_1", "type": "function", "function": {"name": "add", "arguments": "{"}}
+                ]
+            }
+        ),
+        create_chunk({"tool_calls": [{"index": 0, "function": {"arguments": '{"a": 1}'}}]}),
+        create_chunk({"tool_calls": [{"index": 1, "function": {"arguments": '"a": 2}'}}]}),
+        create_chunk({}, "tool_calls"),
+    ]
+    stream = ChatgptStream(prompt_config, list_chunk)
+    list_delta = list(stream)
+    assert all(delta.delta_type == ChatgptDelta.TOOL_CALL for delta in list_delta)
+    prompt_config_result = stream.prompt_config_result
+    assert prompt_config_result.last_event.event_type == ChatgptEvent.TOOL_CALL_REQUEST  # type: ignore
+    list_tool_call = prompt_config_result.last_event.event_message["tool_calls"]  # type: ignore
+    assert [tool_call["id"] for tool_call in list_tool_call] == ["call_0", "call_1"]
+    assert [tool_call["function"]["arguments"] for tool_call in list_tool_call] == ['{"a": 1}', '{"a": 2}']
+
+    # a complete message replays as a stream with the same result
+    message = ChatCompletionMessage.model_validate(prompt_config_result.last_event.event_message)  # type: ignore
+    stream_replay = ChatgptStream.create_for_message(prompt_config, "tool_calls", message)
+    assert stream_replay.until_done().messages == prompt_config_result.messages  # type: ignore
+
+
+def test_chatgpt_stream_close():
+    prompt_config = PromptConfig.create("gpt-4o", "You are a helpfull assistent").append_user_message("Hello")
+    list_chunk = [
+        create_chunk({"role": "assistant", "content": ""}),
+        create_chunk({"content": "Hello"}),
+        create_chunk({"content": " there"}),
+        create_chunk({}, "stop"),
+    ]
+    list_count_delta = []
+    stream = ChatgptStream(
+        prompt_config, list_chunk, callback_close=lambda stream: list_count_delta.append(stream.count_delta)
+    )
+    stream.until_done()
+    stream.close()
+    assert list_count_delta == [2]
+
+    # an abandoned stream closes once with the deltas read so far
+    list_count_delta = []
+    stream = ChatgptStream(
+        prompt_config, list_chunk, callback_close=lambda stream: list_count_delta.append(stream.count_delta)
+    )
+    iterator_delta = iter(stream)
+    next(iterator_delta)
+    iterator_delta.close()
+    assert list_count_delta == [1]
+    assert stream.prompt_config_result is None
+
+
+if __name__ == "__main__":
+    test_chatgpt_stream_text()
+    test_chatgpt_stream_tool_call()
+    test_chatgpt_stream_close()
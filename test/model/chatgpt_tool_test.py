@@ -0,0 +1,100 @@
+import asyncio
+import gc
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from srai_openai.model.chatgpt_tool import DICT_CALLABLE_COMPILED, create_chatgpt_tool
+
+
+def test_chatgpt_tool_memo():
+    list_city_called = []
+
+    def get_population(city: str) -> str:
+        """
+        Get the population of a city
+
+        Args:
+            city (str): the city
+        """
+        list_city_called.append(city)
+        time.sleep(0.2)
+        if city == "Atlantis":
+            raise ValueError("unknown city")
+        return f"{city} has a million inhabitants"
+
+    chatgpt_tool = create_chatgpt_tool(get_population, count_item_memo_max=16, time_to_live_memo=0.5)
+    # concurrent identical calls share one execution
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list_result = list(executor.map(lambda _: chatgpt_tool.call(city="Sofia"), range(8)))
+    assert list_result == ["Sofia has a million inhabitants"] * 8
+    assert list_city_called == ["Sofia"]
+    assert chatgpt_tool.call(city="Sofia") == "Sofia has a million inhabitants"
+    assert list_city_called == ["Sofia"]
+
+    # results expire and errors are not memoized
+    time.sleep(0.6)
+    chatgpt_tool.call(city="Sofia")
+    assert list_city_called == ["Sofia", "Sofia"]
+    for _ in range(2):
+        try:
+            chatgpt_tool.call(city="Atlantis")
+            assert False
+        except ValueError:
+            pass
+    assert list_city_called == ["Sofia", "Sofia", "Atlantis", "Atlantis"]
+
+
+def test_chatgpt_tool_memo_async():
+    list_city_called = []
+
+    async def get_area(city: str) -> str:
+        """
+        Get the area of a city
+
+        Args:
+            city (str): the city
+        """
+        list_city_called.append(city)
+        await asyncio.sleep(0.2)
+        return f"{city} is 100 square kilometers"
+
+    chatgpt_tool = create_chatgpt_tool(get_area, count_item_memo_max=16)
+
+    async def call_many() -> list:
+        return await asyncio.gather(*[chatgpt_tool.call_async(city="Sofia") for _ in range(8)])
+
+    assert asyncio.run(call_many()) == ["Sofia is 100 square kilometers"] * 8
+    assert chatgpt_tool.call(city="Sofia") == "Sofia is 100 square kilometers"
+    assert list_city_called == ["Sofia"]
+    assert chatgpt_tool.count_miss == 1
+
+
+def test_compile_callable_cache():
+    # a closure made per request is compiled once while it lives and freed with its tool
+    def create_get_greeting(greeting: str):
+        def get_greeting(name: str) -> str:
+            """
+            Get the greeting for a name
+
+            Args:
+                name (str): the name
+            """
+            return f"{greeting} {name}"
+
+        return get_greeting
+
+    get_greeting = create_get_greeting("Hello")
+    chatgpt_tool = create_chatgpt_tool(get_greeting)
+    assert get_greeting in DICT_CALLABLE_COMPILED
+    assert create_chatgpt_tool(get_greeting).list_parameter[0] is chatgpt_tool.list_parameter[0]
+    reference = weakref.ref(get_greeting)
+    del get_greeting, chatgpt_tool
+    gc.collect()
+    assert reference() is None
+
+
+if __name__ == "__main__":
+    test_chatgpt_tool_memo()
+    test_chatgpt_tool_memo_async()
+    test_compile_callable_cache()
@@ -0,0 +1,84 @@
+import asyncio
+import math
+
+from srai_openai.client_openai_chatgpt import ClientOpenaiChatgpt
+from srai_openai.client_openai_chatgpt_async import ClientOpenaiChatgptAsync
+from srai_openai.mock.server_openai_mock import ServerOpenaiMock
+from srai_openai.model.continuation_ranker import create_list_continuation_for_choice, rank_list_continuation
+from srai_openai.model.prompt_config import PromptConfig
+
+
+def create_logprob(token: str, logprob: float, list_alternative: list) -> dict:
+    list_top_logprob = [{"token": token, "logprob": logprob}]
+    list_top_logprob += [
+        {"token": token_other, "logprob": logprob_other} for token_other, logprob_other in list_alternative
+    ]
+    return {"token": token, "logprob": logprob, "top_logprobs": list_top_logprob}
+
+
+def test_rank_list_continuation():
+    prompt_config = PromptConfig.create("gpt-4o", "Classify").append_user_message("The movie was great")
+    choice = {
+        "finish_reason": "stop",
+        "logprobs": {
+            "content": [
+                create_logprob("Pos", -0.2, [("Neg", -1.8)]),
+                create_logprob("itive", -0.1, [("ed", -3.0)]),
+            ]
+        },
+    }
+    list_continuation = create_list_continuation_for_choice(prompt_config, choice)
+    assert [(continuation.text, continuation.count_token) for continuation in list_continuation] == [
+        ("Neg", 1),
+        ("Positive", 2),
+        ("Posed", 2),
+    ]
+    assert math.isclose(list_continuation[1].logprob, -0.3)
+    assert list_continuation[1].prompt_config.count_event == prompt_config.count_event + 1
+
+    list_result = rank_list_continuation(list_continuation, count_result=2)
+    assert [continuation.text for continuation in list_result] == ["Positive", "Neg"]
+    list_result = rank_list_continuation(list_continuation, list_text_allowed=["Positive", "Negative"])
+    assert [continuation.text for continuation in list_result] == ["Positive"]
+    list_result = rank_list_continuation(list_continuation, logprob_margin=1)
+    assert [continuation.text for continuation in list_result] == ["Positive"]
+
+
+def test_rank_for_prompt_config():
+    # the mock answers with the most likely tokens at -0.1 each and numbered alternatives at -1.1, -2.1, ...
+    prompt_config = PromptConfig.create("gpt-4o", "Answer").append_user_message("a b")
+    with ServerOpenaiMock() as server_openai_mock:
+        client = ClientOpenaiChatgpt("no key needed", base_url=server_openai_mock.base_url)
+        list_option = client.options_for_prompt_config(prompt_config, max_tokens=3)
+        assert len(list_option) == 19 + 19 + 20
+        assert list_option[0][1].last_message_text == "echo:_1"
+        logprob, prompt_config_best = max(list_option, key=lambda option: option[0])
+        assert math.isclose(logprob, -0.3)
+        assert prompt_config_best.last_message_text == "echo: a b"
+
+        # one request, an alternative ends where it leaves the most likely continuation
+        count_request = server_openai_mock.dict_path_count_request["/v1/chat/completions"]
+        list_result = client.rank_for_prompt_config(prompt_config, count_result=2, count_token_max=3)
+        assert [(round(logprob, 6), prompt_config.last_message_text) for logprob, prompt_config in list_result] == [
+            (-0.3, "echo: a b"),
+            (-1.1, "echo:_1"),
+        ]
+        assert server_openai_mock.dict_path_count_request["/v1/chat/completions"] - count_request == 1
+
+        list_text_allowed = ["echo:_2", "echo: a_3", "echo:_3echo:_1"]
+        list_result = client.rank_for_prompt_config(prompt_config, count_result=3, list_text_allowed=list_text_allowed)
+        assert [(round(logprob, 6), prompt_config.last_message_text) for logprob, prompt_config in list_result] == [
+            (-2.1, "echo:_2"),
+            (-3.2, "echo: a_3"),
+        ]
+
+        client_async = ClientOpenaiChatgptAsync("no key needed", base_url=server_openai_mock.base_url)
+        list_result_async = asyncio.run(
+            client_async.rank_for_prompt_config(prompt_config, count_result=3, list_text_allowed=list_text_allowed)
+        )
+        assert [logprob for logprob, _ in list_result_async] == [logprob for logprob, _ in list_result]
+
+
+if __name__ == "__main__":
+    test_rank_list_continuation()
+    test_rank_for_prompt_config()
@@ -0,0 +1,87 @@
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+
+from srai_openai.model.prompt_config import ChatgptEvent, PromptConfig
+from srai_openai.model.prompt_config_packer import PromptConfigPacker
+
+
+def create_prompt_config_conversation(count_round: int) -> PromptConfig:
+    prompt_config = PromptConfig.create("gpt-4o", "You are a helpfull assistent")
+    for index in range(count_round):
+        prompt_config = prompt_config.append_user_message(f"Look up item {index}")
+        message = ChatCompletionMessage.model_validate(
+            {
+                "role": "assistant",
+                "tool_calls": [
+                    {
+                        "id": f"call_{index}",
+                        "type": "function",
+                        "function": {"name": "look_up", "arguments": f'{{"index": {index}}}'},
+                    }
+                ],
+            }
+        )
+        prompt_config = prompt_config.append_tool_call_request(message)
+        result = f"item {index} " + "is a very long description " * 50
+        prompt_config = prompt_config.append_tool_call_result(
+            [{"id": f"call_{index}", "name": "look_up", "result": result}]
+        )
+    return prompt_config.append_user_message("Summarize the items")
+
+
+def test_prompt_config_packer():
+    prompt_config = create_prompt_config_conversation(10)
+    packer = PromptConfigPacker(token_count_completion_reserved=0)
+    assert packer.pack(prompt_config, prompt_config.token_count()) is prompt_config
+
+    # stubbing stale tool results keeps every event and every tool call id
+    prompt_config_stubbed = packer.pack(prompt_config, prompt_config.token_count() - 1)
+    assert prompt_config_stubbed.count_event == prompt_config.count_event
+    list_event_result = [
+        event for event in prompt_config_stubbed.list_event if event.event_type == ChatgptEvent.TOOL_CALL_RESULT
+    ]
+    assert list_event_result[0].event_message["content"] == packer.text_tool_result_omitted
+    assert list_event_result[-1].event_message["content"].startswith("item 9")
+
+    # dropping removes whole tool rounds, the system message and the last message stay
+    token_count_budget = prompt_config_stubbed.token_count() // 2
+    prompt_config_packed = packer.pack(prompt_config, token_count_budget)
+    assert prompt_config_packed.token_count() <= token_count_budget
+    assert prompt_config_packed.list_event[0].event_type == ChatgptEvent.SYSTEM_MESSAGE
+    assert prompt_config_packed.last_message_text == "Summarize the items"
+    set_id_request = set()
+    for event in prompt_config_packed.list_event:
+        if event.event_type == ChatgptEvent.TOOL_CALL_REQUEST:
+            set_id_request.update(tool_call["id"] for tool_call in event.event_message["tool_calls"])
+        if event.event_type == ChatgptEvent.TOOL_CALL_RESULT:
+            assert event.event_message["tool_call_id"] in set_id_request
+
+    # dropped events are replaced by a summary after the system message
+    list_count_event_dropped = []
+
+    def summarize(list_event_dropped):
+        list_count_event_dropped.append(len(list_event_dropped))
+        return "The user looked up some items"
+
+    packer = PromptConfigPacker(token_count_completion_reserved=0, summarize=summarize, token_count_summary_max=64)
+    prompt_config_summarized = packer.pack(prompt_config, token_count_budget)
+    assert prompt_config_summarized.token_count() <= token_count_budget
+    assert prompt_config_summarized.list_event[1].event_type == ChatgptEvent.SYSTEM_MESSAGE
+    assert prompt_config_summarized.list_event[1].event_message["content"][0]["text"] == "The user looked up some items"
+    assert 0 < list_count_event_dropped[0]
+
+    try:
+        packer.pack(prompt_config, 10)
+        assert False
+    except Exception as exception:
+        assert "budget" in str(exception)
+
+
+def test_prompt_config_token_count_max():
+    assert PromptConfig.create("gpt-4o-mini", "").token_count_max() == 128000
+    assert PromptConfig.create("gpt-4-0613", "").token_count_max() == 8192
+    assert PromptConfig.create("gpt-4-turbo-2024-04-09", "").token_count_max() == 128000
+
+
+if __name__ == "__main__":
+    test_prompt_config_packer()
+    test_prompt_config_token_count_max()
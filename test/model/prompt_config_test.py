@@ -16,5 +16,62 @@ def test_prompt_config():
     assert prompt_config.last_message_text == "Hello"
 
 
+def test_prompt_config_structural_sharing():
+    prompt_config_base = PromptConfig.create("gpt-4o", "You are a helpfull assistent")
+    prompt_config_base = prompt_config_base.append_user_message("Hello")
+    assert len(prompt_config_base.messages) == 2
+    prompt_config_a = prompt_config_base.append_user_message("A")
+    prompt_config_b = prompt_config_base.append_user_message("B")
+    assert prompt_config_a.last_message_text == "A"
+    assert prompt_config_b.last_message_text == "B"
+    assert prompt_config_base.last_message_text == "Hello"
+    assert [message["content"][0]["text"] for message in prompt_config_a.messages] == [
+        "You are a helpfull assistent",
+        "Hello",
+        "A",
+    ]
+    assert len(prompt_config_base.messages) == 2
+    assert len(prompt_config_b.list_event) == 3
+    assert prompt_config_a.list_event[:2] == prompt_config_b.list_event[:2]
+    assert prompt_config_a.count_event == 3
+
+    prompt_config_tool = prompt_config_a.append_tool_call_result([{"id": "1", "name": "tool", "result": "done"}])
+    assert prompt_config_tool.last_event.event_type == "tool_call_result"
+    assert prompt_config_tool.last_message_text == "A"
+
+    prompt_config_long = prompt_config_base
+    for index in range(1000):
+        prompt_config_long = prompt_config_long.append_user_message(str(index))
+        assert prompt_config_long.last_message_text == str(index)
+    assert len(prompt_config_long.messages) == 1002
+
+    # a shared history keeps its views once it has several continuations, so each only materializes its own event
+    list_prompt_config_branch = [prompt_config_long.append_user_message(f"branch {index}") for index in range(3)]
+    for index, prompt_config_branch in enumerate(list_prompt_config_branch):
+        assert len(prompt_config_branch.messages) == 1003
+        assert prompt_config_branch.last_message_text == f"branch {index}"
+    node_event_long = prompt_config_long.node_event_last
+    assert node_event_long.tuple_message is not None  # type: ignore
+    assert list_prompt_config_branch[2].list_event[:1002] == node_event_long.tuple_event  # type: ignore
+    assert len(prompt_config_long.messages) == 1002
+
+
+def test_prompt_config_token_count():
+    prompt_config = PromptConfig.create("gpt-4o", "Hello")
+    # 3 per message, 1 for the role, 1 for the text and 3 to prime the reply
+    assert prompt_config.token_count() == 8
+    prompt_config_user = prompt_config.append_user_message("How are you doing today?")
+    token_count_event = prompt_config_user.last_event.token_count("cl100k_base")
+    assert prompt_config_user.token_count() == prompt_config.token_count() + token_count_event
+
+    list_prompt_config = [prompt_config.append_user_message(f"Message number {index}") for index in range(100)]
+    list_token_count = [
+        PromptConfig.from_dict(prompt_config.to_dict()).token_count() for prompt_config in list_prompt_config
+    ]
+    assert PromptConfig.token_count_batch(list_prompt_config) == list_token_count
+
+
 if __name__ == "__main__":
     test_prompt_config()
+    test_prompt_config_structural_sharing()
+    test_prompt_config_token_count()
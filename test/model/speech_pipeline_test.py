@@ -0,0 +1,52 @@
+import asyncio
+import random
+import threading
+import time
+
+from srai_openai.model.speech_pipeline import SpeechPipeline, SpeechPipelineAsync
+from srai_openai.model.speech_stream import SpeechStream
+from srai_openai.tools_audio import split_text_speech
+
+
+def test_split_text_speech():
+    text = "First. Second sentence here! Third one? " + "word " * 30
+    list_text = split_text_speech(text, 40)
+    assert list_text[0] == "First."
+    assert list_text[1] == "Second sentence here! Third one?"
+    assert all(len(text_chunk) <= 40 for text_chunk in list_text)
+    assert " ".join(list_text).split() == text.split()
+
+
+def test_speech_pipeline():
+    list_text = [f"text {index}" for index in range(12)]
+    lock = threading.Lock()
+    list_count_running = [0, 0]
+
+    def function_speech(text: str) -> bytes:
+        with lock:
+            list_count_running[0] += 1
+            list_count_running[1] = max(list_count_running)
+        time.sleep(random.uniform(0, 0.02))
+        with lock:
+            list_count_running[0] -= 1
+        return text.encode("utf-8")
+
+    speech_stream = SpeechStream(SpeechPipeline(list_text, function_speech, "pcm", count_worker=3))
+    assert list(speech_stream) == [text.encode("utf-8") for text in list_text]
+    assert 1 < list_count_running[1] <= 3
+    assert speech_stream.time_to_first_byte is not None
+
+    async def function_speech_async(text: str) -> bytes:
+        await asyncio.sleep(random.uniform(0, 0.02))
+        return text.encode("utf-8")
+
+    async def read_all() -> list:
+        speech_stream = SpeechStream(SpeechPipelineAsync(list_text, function_speech_async, "pcm", count_worker=3))
+        return [chunk async for chunk in speech_stream]
+
+    assert asyncio.run(read_all()) == [text.encode("utf-8") for text in list_text]
+
+
+if __name__ == "__main__":
+    test_split_text_speech()
+    test_speech_pipeline()
@@ -0,0 +1,74 @@
+import dataclasses
+from enum import Enum
+from typing import List, Optional, TypedDict
+
+from srai_openai.model.tool_registry import ToolRegistry
+
+
+class UnitEnum(Enum):
+    celsius = "celsius"
+    fahrenheit = "fahrenheit"
+
+
+class Location(TypedDict):
+    city: str
+    country: str
+
+
+@dataclasses.dataclass
+class Forecast:
+    list_location: List[Location]
+    count_day: int = 1
+
+
+def get_forecast(forecast: Forecast, unit: UnitEnum, list_hour: Optional[List[int]] = None) -> str:
+    """
+    Get the weather forecast
+
+    Args:
+        forecast (Forecast): the locations and the number of days
+        unit (UnitEnum): the unit of the temperature
+        list_hour (Optional[List[int]]): the hours of the day to include
+    """
+    return f"{len(forecast.list_location)} locations for {forecast.count_day} days in {unit}"
+
+
+def test_tool_registry():
+    tool_registry = ToolRegistry()
+    chatgpt_tool = tool_registry.add_callable(get_forecast)
+    assert "get_forecast" in tool_registry
+    assert tool_registry.list_tool_offer == [chatgpt_tool.to_tool_dict()]
+    dict_parameter = tool_registry.list_tool_offer[0]["function"]["parameters"]
+    assert dict_parameter["required"] == ["forecast", "unit"]
+    assert dict_parameter["properties"]["forecast"]["properties"]["list_location"]["items"]["required"] == [
+        "city",
+        "country",
+    ]
+    assert dict_parameter["properties"]["list_hour"] == {
+        "type": "array",
+        "items": {"type": "integer"},
+        "description": "the hours of the day to include",
+    }
+
+    arguments = '{"forecast": {"list_location": [{"city": "Sofia", "country": "Bulgaria"}]}, "unit": "celsius"}'
+    dict_argument = chatgpt_tool.parse_arguments(arguments)
+    assert dict_argument["unit"] == "celsius"
+    assert dict_argument["forecast"] == Forecast([{"city": "Sofia", "country": "Bulgaria"}])
+    assert chatgpt_tool.call(**dict_argument) == "1 locations for 1 days in celsius"
+
+    list_arguments_invalid = [
+        '{"forecast": {"list_location": []}, "unit": "kelvin"}',
+        '{"forecast": {"list_location": [{"city": "Sofia"}]}, "unit": "celsius"}',
+        '{"forecast": {"list_location": []}, "unit": "celsius", "list_hour": [1.5]}',
+        '{"unit": "celsius"}',
+    ]
+    for arguments_invalid in list_arguments_invalid:
+        try:
+            chatgpt_tool.parse_arguments(arguments_invalid)
+            assert False
+        except ValueError:
+            pass
+
+
+if __name__ == "__main__":
+    test_tool_registry()
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from typing import List, Optional
+
+import httpx
+from openai import APIConnectionError
+
+from srai_openai.schedule.histogram_latency import HistogramLatency
+from srai_openai.schedule.policy_request import PolicyRequest
+
+
+def test_histogram_latency():
+    histogram_latency = HistogramLatency(count_sample_max=100)
+    for index in range(200):
+        histogram_latency.add("gpt-4o", 10.0 if index < 100 else (index - 99) / 100)
+    # the first hundred samples were rolled out
+    assert histogram_latency.count_sample("gpt-4o") == 100
+    assert 0.5 <= histogram_latency.get_percentile("gpt-4o", 0.5) < 0.5 * 1.1  # type: ignore
+    assert 0.95 <= histogram_latency.get_percentile("gpt-4o", 0.95) < 0.95 * 1.1  # type: ignore
+    assert histogram_latency.get_percentile("gpt-4o-mini", 0.5) is None
+
+
+def create_policy_request() -> PolicyRequest:
+    policy_request = PolicyRequest(percentile_hedge=0.9, count_sample_min=10, time_backoff_base=0.01)
+    for _ in range(10):
+        policy_request.histogram_latency.add("gpt-4o", 0.1)
+    return policy_request
+
+
+def test_policy_request_hedge():
+    policy_request = create_policy_request()
+    list_discarded: List[str] = []
+    list_timeout: List[Optional[float]] = []
+
+    def attempt(timeout: Optional[float]) -> str:
+        # the first attempt hangs, the hedged duplicate answers
+        list_timeout.append(timeout)
+        if len(list_timeout) == 1:
+            time.sleep(1.0)
+            return "slow"
+        return "fast"
+
+    time_start = time.monotonic()
+    assert policy_request.call("gpt-4o", attempt, list_discarded.append, time_deadline=5) == "fast"
+    assert time.monotonic() - time_start < 0.5
+    assert policy_request.count_hedge == 1
+    assert all(timeout is not None and timeout <= 5 for timeout in list_timeout)
+    # the sample is the time the first attempt had taken when the hedge answered, not the latency of the hedge
+    assert 0.1 <= policy_request.histogram_latency.get_percentile("gpt-4o", 0.0)  # type: ignore
+    time.sleep(1.0)
+    assert list_discarded == ["slow"]
+
+
+def test_policy_request_hedge_thread():
+    # without a thread for a hedge requests run on the calling thread, as they do once the policy is closed
+    policy_request = PolicyRequest(percentile_hedge=0.9, count_sample_min=10, count_thread_max=1)
+    for _ in range(10):
+        policy_request.histogram_latency.add("gpt-4o", 0.01)
+
+    def attempt(timeout: Optional[float]) -> str:
+        time.sleep(0.1)
+        return threading.current_thread().name
+
+    assert policy_request.call("gpt-4o", attempt) == threading.current_thread().name
+    assert policy_request.count_hedge == 0
+    policy_request = PolicyRequest(percentile_hedge=0.9, count_sample_min=10)
+    for _ in range(10):
+        policy_request.histogram_latency.add("gpt-4o", 0.01)
+    policy_request.close()
+    assert policy_request.call("gpt-4o", attempt) == threading.current_thread().name
+    assert policy_request.count_hedge == 0
+
+
+def test_policy_request_hedge_async():
+    policy_request = create_policy_request()
+    list_cancelled = []
+
+    async def attempt(timeout: Optional[float]) -> str:
+        try:
+            await asyncio.sleep(1.0 if policy_request.count_hedge == 0 else 0.0)
+        except asyncio.CancelledError:
+            list_cancelled.append(True)
+            raise
+        return "answer"
+
+    time_start = time.monotonic()
+    assert asyncio.run(policy_request.call_async("gpt-4o", attempt)) == "answer"
+    assert time.monotonic() - time_start < 0.5
+    assert list_cancelled == [True]
+
+
+def test_policy_request_retry():
+    policy_request = PolicyRequest(count_retry_max=3, time_backoff_base=0.01)
+    list_attempt = []
+
+    def attempt(timeout: Optional[float]) -> str:
+        list_attempt.append(timeout)
+        if len(list_attempt) < 3:
+            raise APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        return "answer"
+
+    assert policy_request.call("gpt-4o", attempt) == "answer"
+    assert policy_request.count_retry == 2
+
+    def attempt_invalid(timeout: Optional[float]) -> str:
+        raise ValueError("not retried")
+
+    try:
+        policy_request.call("gpt-4o", attempt_invalid)
+        assert False
+    except ValueError:
+        pass
+    assert policy_request.count_retry == 2
+
+
+if __name__ == "__main__":
+    test_histogram_latency()
+    test_policy_request_hedge()
+    test_policy_request_hedge_thread()
+    test_policy_request_hedge_async()
+    test_policy_request_retry()
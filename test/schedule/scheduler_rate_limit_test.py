@@ -0,0 +1,66 @@
+import threading
+import time
+
+from srai_openai.schedule.scheduler_rate_limit import PRIORITY_BATCH, PRIORITY_INTERACTIVE, SchedulerRateLimit
+
+
+def test_scheduler_rate_limit_priority():
+    # ten requests per second, starting with an empty bucket
+    scheduler_rate_limit = SchedulerRateLimit({"gpt-4o": (600, 100000)})
+    with scheduler_rate_limit.condition:
+        scheduler_rate_limit.get_bucket("gpt-4o").count_request_available = 0
+    list_name = []
+
+    def send(name: str, priority: int) -> None:
+        scheduler_rate_limit.acquire("gpt-4o", 10, priority)
+        list_name.append(name)
+
+    time_start = time.monotonic()
+    list_thread = [threading.Thread(target=send, args=(f"batch_{index}", PRIORITY_BATCH)) for index in range(3)]
+    for thread in list_thread:
+        thread.start()
+    time.sleep(0.05)
+    list_thread.append(threading.Thread(target=send, args=("interactive", PRIORITY_INTERACTIVE)))
+    list_thread[-1].start()
+    for thread in list_thread:
+        thread.join()
+    assert list_name == ["interactive", "batch_0", "batch_1", "batch_2"]
+    assert 0.35 < time.monotonic() - time_start
+
+
+def test_scheduler_rate_limit_headers():
+    scheduler_rate_limit = SchedulerRateLimit({"gpt-4o": (600, 600)})
+    time_start = time.monotonic()
+    scheduler_rate_limit.acquire("gpt-4o", 600)
+    scheduler_rate_limit.acquire("gpt-4o", 5)
+    assert 0.4 < time.monotonic() - time_start
+
+    headers = {
+        "x-ratelimit-limit-requests": "5000",
+        "x-ratelimit-limit-tokens": "80000",
+        "x-ratelimit-remaining-requests": "4999",
+        "x-ratelimit-remaining-tokens": "100",
+    }
+    scheduler_rate_limit.update_from_headers("gpt-4o", headers)
+    assert scheduler_rate_limit.dict_model_id_limit["gpt-4o"] == (5000, 80000)
+    bucket = scheduler_rate_limit.get_bucket("gpt-4o")
+    assert bucket.count_token_available <= 100
+    scheduler_rate_limit.settle("gpt-4o", 1000, 400)
+    assert 600 <= bucket.count_token_available
+
+
+def test_scheduler_rate_limit_settle():
+    # a request settled on a full bucket, for example after a bucket refill, does not push it past its capacity
+    scheduler_rate_limit = SchedulerRateLimit({"gpt-4o": (600, 1000)})
+    scheduler_rate_limit.acquire("gpt-4o", 500)
+    bucket = scheduler_rate_limit.get_bucket("gpt-4o")
+    with scheduler_rate_limit.condition:
+        bucket.count_token_available = 1000
+    scheduler_rate_limit.settle("gpt-4o", 500, 10)
+    assert bucket.count_token_available == 1000
+
+
+if __name__ == "__main__":
+    test_scheduler_rate_limit_priority()
+    test_scheduler_rate_limit_headers()
+    test_scheduler_rate_limit_settle()
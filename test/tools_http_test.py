@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from srai_openai.client_openai_chatgpt import ClientOpenaiChatgpt
+from srai_openai.client_openai_embedding import ClientOpenaiEmbedding
+from srai_openai.model.http_client_config import HttpClientConfig
+from srai_openai.tools_http import create_client_openai, create_client_openai_async, get_http_client_async
+
+
+class HandlerOk(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def test_http_client_shared():
+    client_chatgpt = ClientOpenaiChatgpt("no key needed")
+    client_embedding = ClientOpenaiEmbedding("no key needed")
+    assert client_chatgpt.client_openai._client is client_embedding.client_openai._client
+    http_client_config = HttpClientConfig(count_connection_max=10, time_timeout_read=30)
+    client_openai = create_client_openai("no key needed", http_client_config)
+    assert client_openai._client is not client_chatgpt.client_openai._client
+    client_openai_other = create_client_openai(
+        "no key needed", HttpClientConfig(count_connection_max=10, time_timeout_read=30)
+    )
+    assert client_openai._client is client_openai_other._client
+    assert client_openai.timeout.read == 30  # type: ignore
+
+    # closing one client leaves the pool to the others
+    with create_client_openai("no key needed", http_client_config):
+        pass
+    client_openai.close()
+    assert not client_openai_other.is_closed()
+
+
+def test_http_client_async_loops():
+    # the shared async client keeps working when used from more than one event loop
+    server = ThreadingHTTPServer(("127.0.0.1", 0), HandlerOk)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    http_client = get_http_client_async(HttpClientConfig())
+
+    async def get() -> str:
+        response = await http_client.get(f"http://127.0.0.1:{server.server_port}/")
+        return response.text
+
+    async def get_closed() -> str:
+        async with create_client_openai_async("no key needed"):
+            pass
+        return await get()
+
+    try:
+        assert asyncio.run(get()) == "ok"
+        assert asyncio.run(get_closed()) == "ok"
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_http_client_shared()
+    test_http_client_async_loops()